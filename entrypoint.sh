@@ -6,7 +6,7 @@ SERVICE_NAME="$1"
 if [ -z "$SERVICE_NAME" ]; then
     echo "Error: Service name is required"
     echo "Usage: $0 <service-name>"
-    echo "Available services: file-downloader, audio-mixer, publish-to-dropbox, publish-podcast-to-s3, update-rss-feed"
+    echo "Available services: file-downloader, audio-mixer, index-voice-memos, publish-to-dropbox, publish-podcast-to-s3, update-rss-feed"
     exit 1
 fi
 
@@ -19,13 +19,17 @@ case "$SERVICE_NAME" in
         echo "Starting audio-mixer service..."
         exec uv run --no-dev python src/mixer/generate_audio.py
         ;;
+    "index-voice-memos")
+        echo "Starting index-voice-memos service..."
+        exec uv run --no-dev python src/mixer/index_memos.py
+        ;;
     "publish-to-dropbox")
         echo "Starting publish-to-dropbox service..."
         exec bash src/publish-podcast-to-dropbox/publish.sh
         ;;
     "publish-podcast-to-s3")
         echo "Starting publish-podcast-to-s3 service..."
-        exec bash src/publish-podcast-to-s3/publish.sh
+        exec uv run --no-dev python src/publish_podcast_to_s3/publish.py
         ;;
     "update-rss-feed")
         echo "Starting update-rss-feed service..."
@@ -33,7 +37,7 @@ case "$SERVICE_NAME" in
         ;;
     *)
         echo "Error: Unknown service '$SERVICE_NAME'"
-        echo "Available services: file-downloader, audio-mixer, publish-to-dropbox, publish-podcast-to-s3, update-rss-feed"
+        echo "Available services: file-downloader, audio-mixer, index-voice-memos, publish-to-dropbox, publish-podcast-to-s3, update-rss-feed"
         exit 1
         ;;
 esac
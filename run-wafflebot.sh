@@ -66,6 +66,14 @@ fi
 # Build Docker images
 ./build.sh
 
+# State kept between runs lives on external volumes, which `down -v` at the
+# end of the run doesn't remove. Creating an existing volume is a no-op.
+export WAFFLEBOT_ENV="$ENVIRONMENT"
+PERSISTENT_VOLUMES=(downloader-state mixer-cache rss-output)
+for volume in "${PERSISTENT_VOLUMES[@]}"; do
+    docker volume create "wafflebot-$ENVIRONMENT-$volume" >/dev/null
+done
+
 # Set up Docker Compose file arguments based on environment.
 # We export environment variables for substitution in docker-compose.yml files.
 if [ "$ENVIRONMENT" = "staging" ]; then
@@ -95,7 +103,7 @@ docker compose "${COMPOSE_FILES[@]}" run --rm publish-podcast-to-s3
 # echo "Updating RSS feed..."
 # docker compose "${COMPOSE_FILES[@]}" run --rm update-rss-feed
 
-echo "Cleaning up intermediate volumes..."
+echo "Cleaning up intermediate volumes (persistent external volumes are kept)..."
 docker compose "${COMPOSE_FILES[@]}" down -v
 
 echo "✅ WaffleBot pipeline completed successfully in $ENVIRONMENT environment!"
@@ -1,9 +1,24 @@
+import asyncio
+import collections
+import contextlib
+import hashlib
 import os
+from http import HTTPStatus
 from pathlib import Path
 
+import aiohttp
 import discord
 
+from src.file_downloader.ingest import (
+    ORIGINALS_DIR_NAME,
+    Ingester,
+    get_ingest_settings,
+)
+from src.file_downloader.state import get_download_state
+from src.utils.env import get_positive_int_env
+from src.utils.hashing import file_sha256, hash_file
 from src.utils.logging import setup_logger
+from src.utils.new_audio import get_new_audio_flag, signal_new_audio
 
 logger = setup_logger(__name__)
 
@@ -19,6 +34,19 @@ client = discord.Client(intents=intents)
 
 MESSAGES_TO_PROCESS = 30
 
+# batch: process the channel history and exit (default)
+# daemon: stay connected and download new memos as they arrive
+DOWNLOADER_MODES = ("batch", "daemon")
+DEFAULT_DOWNLOADER_MODE = "batch"
+
+# Attachments downloaded at once, overridable with DOWNLOAD_CONCURRENCY
+DEFAULT_DOWNLOAD_CONCURRENCY = 4
+
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# Discord allows roughly one reaction per 0.25s per channel
+REACTION_INTERVAL_S = 0.25
+
 # COMPLETED_EMOJI is used by this bot to signal that a file has been processed
 COMPLETED_EMOJI = "✅"
 
@@ -77,80 +105,628 @@ async def add_white_check_mark(message):
     logger.info(f"Adding {COMPLETED_EMOJI} to {message}")
 
 
-async def perform_download(message):
+def get_download_concurrency():
+    """
+    Returns how many attachments may be downloaded at once
+    """
+    return get_positive_int_env("DOWNLOAD_CONCURRENCY", DEFAULT_DOWNLOAD_CONCURRENCY)
+
+
+def get_downloader_mode():
+    """
+    Returns the DOWNLOADER_MODE, batch or daemon
+    """
+    mode = os.getenv("DOWNLOADER_MODE", DEFAULT_DOWNLOADER_MODE)
+    if mode not in DOWNLOADER_MODES:
+        raise ValueError(
+            f"DOWNLOADER_MODE must be one of {', '.join(DOWNLOADER_MODES)}, got: {mode}"
+        )
+    return mode
+
+
+class AttachmentSizeMismatchError(Exception):
+    """Exception raised when a download's size differs from attachment.size."""
+
+
+def partial_path(save_path):
+    """
+    Where an attachment is written while downloading. The leading dot and
+    suffix keep it out of the mixer's view until it's complete.
+    """
+    return save_path.with_name(f".{save_path.name}.partial")
+
+
+async def stream_attachment(session, attachment, save_path):
+    """
+    Stream an attachment to disk in chunks, hashing it along the way.
+
+    Data goes to a partial file that is renamed into place only once its
+    size matches attachment.size. If a previous run left a partial file
+    behind, the download resumes where it stopped.
+
+    Returns the SHA-256 hex digest of the content.
+    """
+    tmp_path = partial_path(save_path)
+    offset = tmp_path.stat().st_size if tmp_path.exists() else 0
+    if offset >= attachment.size:
+        offset = 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    async with session.get(attachment.url, headers=headers) as response:
+        response.raise_for_status()
+        if offset and response.status == HTTPStatus.PARTIAL_CONTENT:
+            logger.info(f"Resuming {attachment.filename} at byte {offset}")
+            digest = await asyncio.to_thread(hash_file, tmp_path)
+            mode = "ab"
+        else:
+            digest = hashlib.sha256()
+            mode = "wb"
+        with open(tmp_path, mode) as f:
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                f.write(chunk)
+                digest.update(chunk)
+
+    size = tmp_path.stat().st_size
+    if size != attachment.size:
+        tmp_path.unlink()
+        raise AttachmentSizeMismatchError(
+            f"{attachment.filename}: expected {attachment.size} bytes, got {size}"
+        )
+    os.replace(tmp_path, save_path)
+    return digest.hexdigest()
+
+
+async def save_attachment(session, attachment, save_path, semaphore, known_sha256):
+    """
+    Download an attachment and return a record of it for the state store.
+
+    If the file on disk already has the hash recorded for this attachment
+    (e.g. a 🔁 reprocess of an unchanged memo), the download is skipped.
+    """
+    if known_sha256 is not None and save_path.exists():
+        unchanged = await asyncio.to_thread(file_sha256, save_path) == known_sha256
+    else:
+        unchanged = False
+
+    if unchanged:
+        logger.info(f"Skipping {attachment.filename}, already downloaded")
+        sha256 = known_sha256
+    else:
+        async with semaphore:
+            sha256 = await stream_attachment(session, attachment, save_path)
+        logger.info(f"Downloaded {attachment.filename}")
+
+    return {
+        "attachment_id": attachment.id,
+        "filename": attachment.filename,
+        "path": save_path,
+        "size": attachment.size,
+        "sha256": sha256,
+    }
+
+
+async def perform_download(
+    message, semaphore=None, session=None, known_hashes=None, directory=None
+):
+    """
+    Download all audio attachments of a message in parallel.
+
+    Returns only once every attachment is saved, and raises if any failed.
+    The semaphore bounds how many downloads run at once across messages.
+    known_hashes maps attachment IDs to the SHA-256 of earlier downloads.
+    Files are saved to directory (default VOICE_MEMOS_DIR).
+
+    Returns a record (ID, filename, path, size, SHA-256) per saved attachment.
+    """
     message = EnhancedMessage(message)
     if not message.attachments:
         logger.warning("No attachments found")
-        return
+        return []
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            return await perform_download(
+                message, semaphore, session, known_hashes, directory
+            )
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(get_download_concurrency())
+    known_hashes = known_hashes or {}
+    directory = directory or VOICE_MEMOS_DIR
+
+    downloads = []
     for attachment in message.attachments:
         if attachment.filename.endswith((".mp3", ".wav", ".m4a", ".ogg")):
             # prefix with a sortable timestamp
             created_at_utc_str = message.created_at.strftime("%Y-%m-%d_%H-%M-%S")
-            save_path = VOICE_MEMOS_DIR / f"{created_at_utc_str}-{attachment.filename}"
-            await attachment.save(str(save_path))
-            logger.info(f"Downloaded {attachment.filename}")
+            save_path = directory / f"{created_at_utc_str}-{attachment.filename}"
+            downloads.append(
+                save_attachment(
+                    session,
+                    attachment,
+                    save_path,
+                    semaphore,
+                    known_hashes.get(attachment.id),
+                )
+            )
         else:
             logger.warning(
                 f"Skipping {attachment.filename} because it's not an audio file"
             )
+    return list(await asyncio.gather(*downloads))
+
+
+async def add_reactions(queue):
+    """
+    Add checkmarks to messages from the queue until it yields None.
+
+    Reactions go out one at a time, spaced REACTION_INTERVAL_S apart, so a
+    large backlog doesn't run into Discord's reaction rate limit.
+    """
+    loop = asyncio.get_running_loop()
+    next_allowed = loop.time()
+    while (message := await queue.get()) is not None:
+        await asyncio.sleep(max(0.0, next_allowed - loop.time()))
+        try:
+            await add_white_check_mark(message)
+        except discord.HTTPException as e:
+            logger.error(f"Failed to add {COMPLETED_EMOJI} to {message}: {e}")
+        next_allowed = loop.time() + REACTION_INTERVAL_S
+
+
+async def should_download(message, channel_id, state):
+    """
+    Decide whether a message's attachments need downloading.
+
+    The state store is the primary record of what was processed. The bot's
+    checkmark only counts for messages handled before the store existed,
+    and a repeat emoji always asks for a re-download.
+    """
+    if await has_repeat_emoji(message):
+        logger.info(f"Reprocessing message with repeat emoji {message}")
+        return True
+    if state.is_processed(message.id):
+        logger.info(f"Skipping already processed message {message}")
+        return False
+    if await has_white_check_mark(message):
+        logger.info(f"Skipping message {message}")
+        state.mark_processed(channel_id, message.id)
+        return False
+    logger.info(f"Processing new message {message}")
+    return True
+
+
+def histories_to_scan(channel, last_seen):
+    """
+    Returns the message histories to scan, given the last processed message
+    """
+    if last_seen is None:
+        logger.info(
+            f"No download state yet, scanning last {MESSAGES_TO_PROCESS} messages"
+        )
+        return [channel.history(limit=MESSAGES_TO_PROCESS)]
+
+    logger.info(f"Fetching messages after {last_seen}")
+    return [
+        channel.history(
+            limit=None, after=discord.Object(id=last_seen), oldest_first=True
+        ),
+        # Older messages are only checked for repeat emojis
+        channel.history(limit=MESSAGES_TO_PROCESS),
+    ]
+
+
+def advance_last_seen(state, channel_id, succeeded):
+    """
+    Moves the channel's last seen message forward over handled messages.
+
+    Stops at the oldest failed message, so it is fetched again next run.
+    """
+    last_handled = None
+    for message_id in sorted(succeeded):
+        if not succeeded[message_id]:
+            break
+        last_handled = message_id
+    if last_handled is not None:
+        state.set_last_seen(channel_id, last_handled)
+
+
+class ChannelDownloads:
+    """
+    Downloads of one channel: where its memos are saved, how many of its
+    attachments download at once, its paced checkmarks, and counters of
+    what was done for the logs.
 
+    With an ingester that transcodes, attachments are downloaded to the
+    originals directory and transcoded into the memo directory.
 
-async def process_messages(channel):
+    start() must be called before downloading and close() afterwards.
     """
-    Process MESSAGES_TO_PROCESS messages in the channel.
+
+    def __init__(self, config, state, session, ingester=None):
+        self.channel_id = config["channel_id"]
+        self.directory = config["directory"]
+        self.state = state
+        self.session = session
+        self.ingester = ingester
+        transcoding = ingester is not None and ingester.settings["format"]
+        self.download_dir = (
+            self.directory / ORIGINALS_DIR_NAME if transcoding else self.directory
+        )
+        self.semaphore = asyncio.Semaphore(config["concurrency"])
+        self.reactions = asyncio.Queue()
+        self.reaction_worker = None
+        self.counters = collections.Counter()
+        # Messages being downloaded, by a history scan or a live event
+        self.in_flight = set()
+        # Live messages whose download failed; last seen stays before them
+        self.failed = set()
+
+    def start(self):
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        self.reaction_worker = asyncio.create_task(add_reactions(self.reactions))
+
+    async def close(self):
+        await self.reactions.put(None)
+        await self.reaction_worker
+        self.log_counters()
+
+    def log_counters(self):
+        counters = ", ".join(
+            f"{name}={self.counters[name]}" for name in sorted(self.counters)
+        )
+        logger.info(f"Channel {self.channel_id} ({self.directory}): {counters}")
+
+    async def download(self, message):
+        """
+        Download a message's attachments, record it and queue its checkmark.
+
+        New audio is announced through the new audio flag so a watching mixer
+        can start right away. Returns False if the download failed or the
+        message is already being downloaded.
+        """
+        if message.id in self.in_flight:
+            return False
+        self.in_flight.add(message.id)
+        try:
+            attachments = await perform_download(
+                message,
+                self.semaphore,
+                self.session,
+                self.state.attachment_hashes(message.id),
+                self.download_dir,
+            )
+        except Exception:
+            logger.exception(f"Failed to download {message}")
+            self.counters["failed"] += 1
+            return False
+        finally:
+            self.in_flight.discard(message.id)
+
+        self.state.mark_processed(self.channel_id, message.id, attachments)
+        self.counters["downloaded"] += 1
+        self.counters["attachments"] += len(attachments)
+        self.counters["bytes"] += sum(attachment["size"] for attachment in attachments)
+        if attachments:
+            await self.publish([attachment["path"] for attachment in attachments])
+        await self.reactions.put(message)
+        return True
+
+    async def publish(self, paths):
+        """
+        Makes downloaded files available to the mixer and announces them
+        """
+        if self.ingester is not None:
+            paths = await self.ingester.ingest(paths, self.directory)
+            self.counters["ingested"] += len(paths)
+        signal_new_audio(paths, get_new_audio_flag(self.directory))
+
+    async def scan(self, channel):
+        """
+        Scan the channel history and download what needs downloading.
+        """
+        histories = histories_to_scan(channel, self.state.last_seen(self.channel_id))
+        succeeded = {}
+
+        async def download(message):
+            succeeded[message.id] = await self.download(message)
+
+        downloads = []
+        try:
+            for history in histories:
+                async for message in history:
+                    if message.id in succeeded or message.id in self.in_flight:
+                        continue
+                    message = EnhancedMessage(message)
+                    succeeded[message.id] = True
+                    self.counters["scanned"] += 1
+                    if await should_download(message, self.channel_id, self.state):
+                        downloads.append(asyncio.create_task(download(message)))
+        finally:
+            # Let started downloads finish and get their checkmarks regardless
+            await asyncio.gather(*downloads)
+            advance_last_seen(self.state, self.channel_id, succeeded)
+        self.failed.clear()
+
+    async def on_message(self, message):
+        if not message.attachments or self.state.is_processed(message.id):
+            return
+        message = EnhancedMessage(message)
+        logger.info(f"New message {message}")
+        if await self.download(message):
+            if not any(failed < message.id for failed in self.failed):
+                self.state.set_last_seen(self.channel_id, message.id)
+        else:
+            self.failed.add(message.id)
+
+
+async def process_messages(channel, state=None, session=None, config=None):
+    """
+    Process the messages in the channel that arrived since the last run.
 
     Download audio files if they either:
-    1. Don't have a checkmark, or
+    1. Haven't been processed yet, or
     2. Have a repeat emoji (regardless of checkmark)
+
+    On the first run (no state yet) the last MESSAGES_TO_PROCESS messages
+    are scanned. After that, only messages after the last fully processed
+    one are fetched, without a limit, plus the last MESSAGES_TO_PROCESS
+    messages to pick up repeat emojis.
+
+    Messages are downloaded concurrently (see DOWNLOAD_CONCURRENCY). A
+    message gets its checkmark only after all its attachments are saved; a
+    message whose download fails is left unmarked and retried next run.
+
+    config is the channel's entry from get_channel_configs(); by default
+    memos are saved to VOICE_MEMOS_DIR.
     """
-    async for message in channel.history(limit=MESSAGES_TO_PROCESS):
-        message = EnhancedMessage(message)
-        should_process = False
+    await process_channels([(channel, config)], state, session)
 
-        if not await has_white_check_mark(message):
-            should_process = True
-            logger.info(f"Processing new message {message}")
-        elif await has_repeat_emoji(message):
-            should_process = True
-            logger.info(f"Reprocessing message with repeat emoji {message}")
 
-        if should_process:
-            await perform_download(message)
-            await add_white_check_mark(message)
+def open_ingester():
+    """
+    Returns an Ingester if ingest is on (INGEST_FORMAT, INGEST_INDEX), else None
+    """
+    settings = get_ingest_settings()
+    if settings is None:
+        return None
+    if settings["format"] is None:
+        logger.info("Indexing attachments")
+    else:
+        logger.info(
+            f"Transcoding attachments to {settings['format']} at "
+            f"{settings['sample_rate']}Hz, {settings['channels']} channel(s)"
+        )
+    return Ingester(settings)
+
+
+async def process_channels(channels, state=None, session=None):
+    """
+    Process the history of several channels concurrently.
+
+    channels holds (channel, config) pairs; see process_messages().
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if state is None:
+            state = get_download_state()
+            stack.callback(state.close)
+        if session is None:
+            session = await stack.enter_async_context(aiohttp.ClientSession())
+        ingester = open_ingester()
+        if ingester is not None:
+            stack.callback(ingester.close)
+        scans = []
+        for channel, config in channels:
+            downloads = ChannelDownloads(
+                config or default_channel_config(channel.id), state, session, ingester
+            )
+            downloads.start()
+            stack.push_async_callback(downloads.close)
+            scans.append(downloads.scan(channel))
+        await asyncio.gather(*scans)
+
+
+class GatewayDownloader:
+    """
+    Downloads memos as they are posted while staying connected to Discord.
+
+    Handles new messages and 🔁 reactions as gateway events, and catches up
+    on the channel histories whenever the connection is (re)established.
+    Each channel keeps its own download slots and reaction pacing; the state
+    store and HTTP session are shared.
+    """
+
+    def __init__(self, configs, state, session, ingester=None):
+        self.channels = {
+            config["channel_id"]: ChannelDownloads(config, state, session, ingester)
+            for config in configs
+        }
+        for downloads in self.channels.values():
+            downloads.start()
+
+    async def catch_up(self, channels):
+        await asyncio.gather(
+            *(self.channels[channel.id].scan(channel) for channel in channels)
+        )
+        for downloads in self.channels.values():
+            downloads.log_counters()
+
+    async def on_message(self, message, bot_user):
+        downloads = self.channels.get(message.channel.id)
+        if downloads is None or message.author == bot_user:
+            return
+        await downloads.on_message(message)
+
+    async def on_raw_reaction_add(self, payload, channel, bot_user):
+        downloads = self.channels.get(payload.channel_id)
+        if downloads is None or payload.user_id == bot_user.id:
+            return
+        if str(payload.emoji) != REPEAT_EMOJI:
+            return
+        message = EnhancedMessage(await channel.fetch_message(payload.message_id))
+        logger.info(f"Reprocessing message with repeat emoji {message}")
+        await downloads.download(message)
+
+    async def close(self):
+        await asyncio.gather(
+            *(downloads.close() for downloads in self.channels.values())
+        )
+
+
+# Set once the daemon connects; None in batch mode
+gateway = None
+
+# The channels to download from; set by main()
+CHANNEL_CONFIGS = []
+
+
+def find_channels():
+    """
+    Returns (channel, config) pairs of the configured channels the bot can see
+    """
+    channels = []
+    for config in CHANNEL_CONFIGS:
+        channel = client.get_channel(config["channel_id"])
+        if channel is None:
+            logger.error(f"Channel {config['channel_id']} not found!")
         else:
-            logger.info(f"Skipping message {message}")
+            channels.append((channel, config))
+    return channels
 
 
 @client.event
 async def on_ready():
     logger.info(f"Logged in as {client.user}")
-    channel = client.get_channel(CHANNEL_ID)
+    channels = find_channels()
 
-    if channel is None:
-        logger.error("Channel not found!")
+    if not channels:
         await client.close()
         return
 
-    await process_messages(channel)
+    if get_downloader_mode() == "daemon":
+        # Fires again after a reconnect, to pick up messages sent meanwhile
+        await gateway.catch_up([channel for channel, _ in channels])
+        return
+
+    await process_channels(channels)
     await client.close()
 
 
+@client.event
+async def on_message(message):
+    if gateway is not None:
+        await gateway.on_message(message, client.user)
+
+
+@client.event
+async def on_raw_reaction_add(payload):
+    if gateway is not None:
+        channel = client.get_channel(payload.channel_id)
+        if channel is not None:
+            await gateway.on_raw_reaction_add(payload, channel, client.user)
+
+
+async def run_daemon(token):
+    """
+    Stay connected to the gateway and download memos as they arrive
+    """
+    global gateway
+    discord.utils.setup_logging()
+    async with contextlib.AsyncExitStack() as stack:
+        state = get_download_state()
+        stack.callback(state.close)
+        ingester = open_ingester()
+        if ingester is not None:
+            stack.callback(ingester.close)
+        session = await stack.enter_async_context(aiohttp.ClientSession())
+        await stack.enter_async_context(client)
+        gateway = GatewayDownloader(CHANNEL_CONFIGS, state, session, ingester)
+        stack.push_async_callback(gateway.close)
+        await client.start(token)
+
+
+def default_channel_config(channel_id):
+    """
+    Config of a channel whose memos go straight into VOICE_MEMOS_DIR
+    """
+    return {
+        "channel_id": channel_id,
+        "directory": VOICE_MEMOS_DIR,
+        "concurrency": get_download_concurrency(),
+    }
+
+
+def parse_channel_configs(channel_ids_str):
+    """
+    Parses CHANNEL_IDS: comma-separated entries of channel_id[:name[:concurrency]].
+
+    Each channel's memos are saved to VOICE_MEMOS_DIR/<name> (the channel ID
+    by default) and up to concurrency of its attachments (default
+    DOWNLOAD_CONCURRENCY) are downloaded at once.
+    """
+    configs = []
+    for entry in channel_ids_str.split(","):
+        if not entry.strip():
+            continue
+        parts = entry.strip().split(":")
+        if len(parts) > 3:
+            raise ValueError(f"Invalid CHANNEL_IDS entry: {entry}")
+        channel_id_str, name, concurrency_str = parts + [""] * (3 - len(parts))
+        if name in (".", "..") or "/" in name:
+            raise ValueError(f"Invalid directory name in CHANNEL_IDS: {entry}")
+        try:
+            channel_id = int(channel_id_str)
+            concurrency = int(concurrency_str) if concurrency_str else None
+        except ValueError as e:
+            raise ValueError(f"Invalid CHANNEL_IDS entry: {entry}") from e
+        if concurrency is not None and concurrency <= 0:
+            raise ValueError(f"Invalid CHANNEL_IDS entry: {entry}")
+        configs.append(
+            {
+                "channel_id": channel_id,
+                "directory": VOICE_MEMOS_DIR / (name or str(channel_id)),
+                "concurrency": concurrency or get_download_concurrency(),
+            }
+        )
+    if not configs:
+        raise ValueError("CHANNEL_IDS lists no channels")
+    if len({config["channel_id"] for config in configs}) != len(configs):
+        raise ValueError(f"CHANNEL_IDS lists a channel twice: {channel_ids_str}")
+    return configs
+
+
+def get_channel_configs():
+    """
+    Returns the channels to download from.
+
+    CHANNEL_IDS lists several channels, each with its own directory under
+    VOICE_MEMOS_DIR. A single CHANNEL_ID keeps saving into VOICE_MEMOS_DIR.
+    """
+    channel_ids_str = os.getenv("CHANNEL_IDS")
+    if channel_ids_str:
+        return parse_channel_configs(channel_ids_str)
+
+    channel_id_str = os.getenv("CHANNEL_ID")
+    if channel_id_str is None:
+        raise ValueError("CHANNEL_ID or CHANNEL_IDS environment variable is not set")
+    try:
+        channel_id = int(channel_id_str)
+    except ValueError as e:
+        raise ValueError(f"CHANNEL_ID must be an integer, got: {channel_id_str}") from e
+    return [default_channel_config(channel_id)]
+
+
 def main():
     TOKEN = os.getenv("DISCORD_TOKEN")
-    CHANNEL_ID_STR = os.getenv("CHANNEL_ID")
 
     if TOKEN is None:
         raise ValueError("DISCORD_TOKEN environment variable is not set")
-    if CHANNEL_ID_STR is None:
-        raise ValueError("CHANNEL_ID environment variable is not set")
 
-    try:
-        global CHANNEL_ID
-        CHANNEL_ID = int(CHANNEL_ID_STR)
-    except ValueError as e:
-        raise ValueError(f"CHANNEL_ID must be an integer, got: {CHANNEL_ID_STR}") from e
+    global CHANNEL_CONFIGS
+    CHANNEL_CONFIGS = get_channel_configs()
 
-    client.run(TOKEN)
+    if get_downloader_mode() == "daemon":
+        asyncio.run(run_daemon(TOKEN))
+    else:
+        client.run(TOKEN)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.utils.audio_metadata import index_file, measure_samples, write_sidecar
+from src.utils.env import get_positive_int_env
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+FFMPEG_BINARY = "ffmpeg"
+
+# INGEST_FORMAT: "" (default) keeps attachments as they arrive; "flac" or
+# "wav" (16-bit PCM) transcodes them to a canonical format. INGEST_INDEX=1
+# writes duration and loudness sidecars without transcoding.
+INGEST_FORMATS = ("flac", "wav")
+DEFAULT_INGEST_SAMPLE_RATE = 44100
+DEFAULT_INGEST_CHANNELS = 1
+DEFAULT_INGEST_WORKERS = os.cpu_count() or 1
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+# With ingest on, downloads are kept here, below the memo directory, so the
+# mixer only sees the canonical files
+ORIGINALS_DIR_NAME = "originals"
+
+
+class IngestError(Exception):
+    """Exception raised when an attachment can't be transcoded."""
+
+
+def get_ingest_settings():
+    """
+    Returns the ingest settings, or None if ingest is off.
+
+    format is None when attachments are only indexed, not transcoded.
+    """
+    output_format = os.getenv("INGEST_FORMAT", "").lower() or None
+    if output_format is None and os.getenv("INGEST_INDEX", "0") == "0":
+        return None
+    if output_format is not None and output_format not in INGEST_FORMATS:
+        raise ValueError(
+            f"INGEST_FORMAT must be one of {', '.join(INGEST_FORMATS)}, "
+            f"got: {output_format}"
+        )
+    return {
+        "format": output_format,
+        "sample_rate": get_positive_int_env(
+            "INGEST_SAMPLE_RATE", DEFAULT_INGEST_SAMPLE_RATE
+        ),
+        "channels": get_positive_int_env("INGEST_CHANNELS", DEFAULT_INGEST_CHANNELS),
+        "workers": get_positive_int_env("INGEST_WORKERS", DEFAULT_INGEST_WORKERS),
+    }
+
+
+def decode_pcm(path, sample_rate, channels):
+    """
+    Decodes a file to interleaved 16-bit PCM at the given rate and channels
+    """
+    result = subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-v",
+            "error",
+            "-nostdin",
+            "-i",
+            str(path),
+            "-f",
+            "s16le",
+            "-ac",
+            str(channels),
+            "-ar",
+            str(sample_rate),
+            "-",
+        ],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise IngestError(
+            f"Decoding {path} failed: {result.stderr.decode(errors='replace')}"
+        )
+    return result.stdout
+
+
+def write_wav(pcm, output_path, sample_rate, channels):
+    with wave.open(str(output_path), "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(SAMPLE_WIDTH)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm)
+
+
+def write_flac(pcm, output_path, sample_rate, channels):
+    result = subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-v",
+            "error",
+            "-y",
+            "-f",
+            "s16le",
+            "-ar",
+            str(sample_rate),
+            "-ac",
+            str(channels),
+            "-i",
+            "-",
+            "-f",
+            "flac",
+            str(output_path),
+        ],
+        input=pcm,
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise IngestError(
+            f"Encoding {output_path} failed: {result.stderr.decode(errors='replace')}"
+        )
+
+
+def transcode(source, output_dir, settings):
+    """
+    Transcodes a file to the canonical format and writes its sidecar.
+
+    The file is decoded once, and the same samples give the duration, peak
+    and loudness for the sidecar, so nothing has to decode it again to plan
+    the episode.
+
+    Returns the path of the canonical file.
+    """
+    sample_rate = settings["sample_rate"]
+    channels = settings["channels"]
+    pcm = decode_pcm(source, sample_rate, channels)
+    frames = len(pcm) // (SAMPLE_WIDTH * channels)
+
+    output_path = output_dir / f"{source.stem}.{settings['format']}"
+    # The partial name has no audio suffix, so the mixer ignores it
+    tmp_path = output_path.with_name(f".{output_path.name}.partial")
+    if settings["format"] == "wav":
+        write_wav(pcm, tmp_path, sample_rate, channels)
+    else:
+        write_flac(pcm, tmp_path, sample_rate, channels)
+    os.replace(tmp_path, output_path)
+
+    samples = np.frombuffer(pcm[: frames * SAMPLE_WIDTH * channels], dtype="<i2")
+    write_sidecar(
+        output_path,
+        {
+            "source": source.name,
+            **measure_samples(
+                samples.reshape(-1, channels) / float(2**15), sample_rate
+            ),
+            "sample_width": SAMPLE_WIDTH,
+        },
+    )
+    return output_path
+
+
+def ingest_file(source, output_dir, settings):
+    """
+    Transcodes a file into output_dir, or only indexes it where it is.
+
+    Returns the path of the file the mixer should read.
+    """
+    if settings["format"] is None:
+        index_file(source)
+        return source
+    return transcode(source, output_dir, settings)
+
+
+def copy_original(source, output_dir):
+    """
+    Puts an original file where the mixer reads memos, as a fallback
+    """
+    output_path = output_dir / source.name
+    tmp_path = output_path.with_name(f".{output_path.name}.partial")
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class Ingester:
+    """
+    Transcodes or indexes downloaded attachments in a pool of background
+    workers.
+
+    Decoding happens in ffmpeg processes, so threads are enough to run
+    several at once without blocking the event loop.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings["workers"], thread_name_prefix="ingest"
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def ingest(self, paths, output_dir):
+        """
+        Ingests files into output_dir; returns the paths of the results.
+
+        A file that fails to transcode is copied over as it is, so the memo
+        still makes it into the episode; one that fails to index is left
+        without a sidecar.
+        """
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.executor, ingest_file, path, output_dir, self.settings
+                )
+                for path in paths
+            ),
+            return_exceptions=True,
+        )
+        output_paths = []
+        for path, result in zip(paths, results, strict=True):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to ingest {path.name}, keeping it: {result}")
+                if self.settings["format"] is not None:
+                    result = await asyncio.to_thread(copy_original, path, output_dir)
+                else:
+                    result = path
+            else:
+                logger.info(f"Ingested {path.name} as {result.name}")
+            output_paths.append(result)
+        return output_paths
@@ -0,0 +1,127 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+STATE_DB_PATH = Path("data/downloader-state/state.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id INTEGER PRIMARY KEY,
+    last_message_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    processed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    attachment_id INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL REFERENCES messages (message_id),
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attachments_sha256 ON attachments (sha256);
+"""
+
+
+class DownloadState:
+    """
+    Persistent index of processed Discord messages.
+
+    Records, per channel, the newest message that has been fully handled, so
+    the next run only asks Discord for messages after it, and per message,
+    the attachments that were saved and their content hashes.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def last_seen(self, channel_id):
+        """
+        Returns the ID of the newest fully processed message, or None
+        """
+        row = self._db.execute(
+            "SELECT last_message_id FROM channels WHERE channel_id = ?",
+            (channel_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_last_seen(self, channel_id, message_id):
+        """
+        Advances the channel's last seen message; never moves it backwards
+        """
+        with self._db:
+            self._db.execute(
+                "INSERT INTO channels (channel_id, last_message_id) VALUES (?, ?) "
+                "ON CONFLICT (channel_id) DO UPDATE SET last_message_id = "
+                "MAX(last_message_id, excluded.last_message_id)",
+                (channel_id, message_id),
+            )
+
+    def is_processed(self, message_id):
+        row = self._db.execute(
+            "SELECT 1 FROM messages WHERE message_id = ?", (message_id,)
+        ).fetchone()
+        return row is not None
+
+    def mark_processed(self, channel_id, message_id, attachments=()):
+        """
+        Records a message as processed along with its saved attachments.
+
+        attachments holds dicts with attachment_id, filename, path, size and
+        sha256 keys. Reprocessing a message replaces its attachment records.
+        """
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO messages "
+                "(message_id, channel_id, processed_at) VALUES (?, ?, ?)",
+                (message_id, channel_id, datetime.now(timezone.utc).isoformat()),
+            )
+            self._db.execute(
+                "DELETE FROM attachments WHERE message_id = ?", (message_id,)
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO attachments "
+                "(attachment_id, message_id, filename, path, size, sha256) "
+                "VALUES (:attachment_id, :message_id, :filename, :path, :size, "
+                ":sha256)",
+                [
+                    {
+                        **attachment,
+                        "message_id": message_id,
+                        "path": str(attachment["path"]),
+                    }
+                    for attachment in attachments
+                ],
+            )
+
+    def attachment_hashes(self, message_id):
+        """
+        Returns {attachment_id: sha256} of a processed message
+        """
+        return dict(
+            self._db.execute(
+                "SELECT attachment_id, sha256 FROM attachments WHERE message_id = ?",
+                (message_id,),
+            ).fetchall()
+        )
+
+
+def get_download_state():
+    """
+    Opens the state store at DOWNLOADER_STATE_DB (default data/ directory)
+    """
+    return DownloadState(os.getenv("DOWNLOADER_STATE_DB", str(STATE_DB_PATH)))
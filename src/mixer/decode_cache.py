@@ -0,0 +1,281 @@
+"""Content-addressed on-disk cache of decoded audio.
+
+Decoding a file costs a full ffmpeg pass, and the mixer sees the same voice
+memos (re-downloaded on 🔁) and background music on every run. Entries are
+keyed by a hash of the file content plus the decode parameters and hold the
+decoded PCM behind a small header. The cache is size-bounded: the least
+recently used entries are evicted once it grows past its limit.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import struct
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from pydub import AudioSegment  # type: ignore[import]
+
+from src.mixer.engine import SAMPLE_DTYPES
+from src.mixer.ffmpeg import decode_to_array
+from src.mixer.instrumentation import count
+from src.utils.env import get_int_env
+from src.utils.hashing import file_sha256
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+DECODE_CACHE_DIR = pathlib.Path("data/mixer-cache/decoded")
+STEM_CACHE_DIR = pathlib.Path("data/mixer-cache/stems")
+DEFAULT_DECODE_CACHE_MAX_MB = 2048  # 0 disables the cache
+CACHE_FORMAT_VERSION = 1
+
+# magic, frame rate, channels, numpy dtype code (e.g. "<i2"), padded to 16 bytes
+HEADER = struct.Struct("<4sIH3s3x")
+MAGIC = b"WBPC"
+
+# Bytes this process believes each cache directory holds, so a store only
+# scans the directory when the cache may have outgrown its limit. Other
+# worker processes' writes are only seen at the next scan.
+CACHE_SIZES: Dict[pathlib.Path, int] = {}
+
+
+class DecodeCacheError(Exception):
+    """Exception raised when a cache entry is corrupt."""
+
+
+def cache_key(content_digest: str, params: Dict[str, Any]) -> str:
+    """Combine a content digest and decode parameters into a cache key."""
+    payload = json.dumps(
+        {"content": content_digest, "params": params, "version": CACHE_FORMAT_VERSION},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_entry(data: bytes) -> Tuple[np.ndarray, int]:
+    """Parse a cache entry into (samples, frame_rate).
+
+    Raises:
+        DecodeCacheError: If the entry is corrupt or truncated
+    """
+    try:
+        magic, frame_rate, channels, dtype_code = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise DecodeCacheError("bad magic")
+        samples = np.frombuffer(
+            data, dtype=np.dtype(dtype_code.decode("ascii")), offset=HEADER.size
+        ).reshape(-1, channels)
+    except (struct.error, TypeError, ValueError) as e:
+        raise DecodeCacheError(f"unreadable entry: {e}") from e
+    return samples, frame_rate
+
+
+class DecodeCache:
+    """Size-bounded LRU cache of decoded PCM arrays on disk."""
+
+    def __init__(self, cache_dir: pathlib.Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key: str) -> pathlib.Path:
+        return self.cache_dir / key[:2] / f"{key}.pcm"
+
+    def _info_path(self, key: str) -> pathlib.Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def load(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        """Return (samples, frame_rate) for a key, or None on a miss.
+
+        A corrupt or truncated entry counts as a miss and is deleted, so the
+        caller decodes the file again and replaces it.
+        """
+        path = self._entry_path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        try:
+            samples, frame_rate = parse_entry(data)
+        except DecodeCacheError as e:
+            logger.warning(f"Discarding decode cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+        # Refresh the access time so eviction sees this entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another process since it was read
+        return samples, frame_rate
+
+    def load_info(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the info stored with an entry, or None if there is none."""
+        try:
+            info = json.loads(self._info_path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return info if isinstance(info, dict) else None
+
+    def store(
+        self,
+        key: str,
+        samples: np.ndarray,
+        frame_rate: int,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Write an entry atomically, then evict down to the size limit.
+
+        Args:
+            info: JSON-serializable facts about the entry to keep alongside
+                it, e.g. how much silence was trimmed to produce it
+        """
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if info is not None:
+            # Written first, so an entry is never visible without its info
+            self._write_atomically(
+                self._info_path(key), json.dumps(info).encode("utf-8")
+            )
+        samples = np.ascontiguousarray(samples)
+        dtype_code = samples.dtype.newbyteorder("<").str.encode("ascii")
+        header = HEADER.pack(MAGIC, frame_rate, samples.shape[1], dtype_code)
+
+        data = header + samples.astype(samples.dtype.newbyteorder("<")).tobytes()
+        self._write_atomically(path, data)
+
+        known_bytes = CACHE_SIZES.get(self.cache_dir)
+        if known_bytes is None or known_bytes + len(data) > self.max_bytes:
+            self.evict()
+        else:
+            CACHE_SIZES[self.cache_dir] = known_bytes + len(data)
+
+    def _write_atomically(self, path: pathlib.Path, data: bytes) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            pathlib.Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def load_segment(self, key: str) -> Optional[AudioSegment]:
+        """Return a cached entry as an AudioSegment, or None on a miss."""
+        cached = self.load(key)
+        if cached is None:
+            return None
+        samples, frame_rate = cached
+        return AudioSegment(
+            data=samples.tobytes(),
+            sample_width=samples.dtype.itemsize,
+            frame_rate=frame_rate,
+            channels=samples.shape[1],
+        )
+
+    def store_segment(
+        self, key: str, segment: AudioSegment, info: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Store an AudioSegment's samples (and optional info) under a key."""
+        samples = np.frombuffer(
+            segment.raw_data, dtype=SAMPLE_DTYPES[segment.sample_width]
+        ).reshape(-1, segment.channels)
+        self.store(key, samples, segment.frame_rate, info)
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits its limit.
+
+        Scans the whole cache directory and resets the running size that
+        store() keeps.
+
+        Returns:
+            The number of bytes freed
+        """
+        entries = []
+        total_bytes = 0
+        for path in self.cache_dir.glob("*/*.pcm"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # evicted by another worker since the listing
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total_bytes - freed <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)  # another worker may have got there first
+            path.with_suffix(".json").unlink(missing_ok=True)
+            freed += size
+
+        CACHE_SIZES[self.cache_dir] = total_bytes - freed
+        if freed:
+            logger.info(f"Evicted {freed} bytes from the decode cache")
+        return freed
+
+
+def get_decode_cache(
+    dir_env: str = "MIXER_DECODE_CACHE_DIR",
+    default_dir: pathlib.Path = DECODE_CACHE_DIR,
+) -> Optional[DecodeCache]:
+    """Return the decode cache configured by environment, or None if disabled.
+
+    Each cache lives in its own directory, read from dir_env, and keeps
+    itself under MIXER_DECODE_CACHE_MAX_MB on its own, so the decode and
+    stem caches together use up to twice that.
+    """
+    max_mb = get_int_env("MIXER_DECODE_CACHE_MAX_MB", DEFAULT_DECODE_CACHE_MAX_MB)
+    if max_mb <= 0:
+        return None
+    cache_dir = pathlib.Path(os.getenv(dir_env, str(default_dir)))
+    return DecodeCache(cache_dir, max_mb * 1024 * 1024)
+
+
+def get_stem_cache() -> Optional[DecodeCache]:
+    """Return the cache of processed voice memo stems, or None if disabled."""
+    return get_decode_cache("MIXER_STEM_CACHE_DIR", STEM_CACHE_DIR)
+
+
+def decode_segment(path: pathlib.Path) -> AudioSegment:
+    """Decode a file with pydub, reusing a cached decode when available."""
+    cache = get_decode_cache()
+    key = None
+    if cache is not None:
+        key = cache_key(file_sha256(path), {"decoder": "pydub"})
+        cached = cache.load_segment(key)
+        if cached is not None:
+            logger.info(f"Decode cache hit: {path.name}")
+            count("decode_cache_hit_bytes", len(cached.raw_data))
+            return cached
+
+    segment = AudioSegment.from_file(str(path))
+    count("decoded_bytes", len(segment.raw_data))
+    if cache is not None and key is not None:
+        cache.store_segment(key, segment)
+    return segment
+
+
+def decode_array(path: pathlib.Path, frame_rate: int, channels: int) -> np.ndarray:
+    """Decode a file to float32 with ffmpeg, reusing a cached decode."""
+    cache = get_decode_cache()
+    key = None
+    if cache is not None:
+        key = cache_key(
+            file_sha256(path),
+            {"decoder": "ffmpeg", "frame_rate": frame_rate, "channels": channels},
+        )
+        cached = cache.load(key)
+        if cached is not None:
+            logger.info(f"Decode cache hit: {path.name}")
+            count("decode_cache_hit_bytes", cached[0].nbytes)
+            return cached[0]
+
+    samples = decode_to_array(path, frame_rate, channels)
+    count("decoded_bytes", samples.nbytes)
+    if cache is not None and key is not None:
+        cache.store(key, samples, frame_rate)
+    return samples
@@ -0,0 +1,483 @@
+"""NumPy mixing engine.
+
+Decodes each source once into a float32 array and renders the whole mix in a
+single vectorized pass, instead of chaining ``AudioSegment.overlay`` calls
+that each copy the full episode.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydub import AudioSegment  # type: ignore[import]
+
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# pydub keeps 8-bit audio signed and widens 24-bit audio to 32-bit on load
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+# Voice activity (for ducking and silence trimming) is analysed in hops
+ACTIVITY_HOP_MS = 10
+
+
+def db_to_gain(db: float) -> float:
+    """Convert a dB change to a linear amplitude factor (same as pydub)."""
+    return float(10 ** (db / 20))
+
+
+def ms_to_frames(ms: float, frame_rate: int) -> int:
+    """Convert a position in milliseconds to a frame index."""
+    return int(ms * frame_rate / 1000.0)
+
+
+def segment_to_array(segment: AudioSegment) -> np.ndarray:
+    """Decode an AudioSegment into a float32 array of shape (frames, channels).
+
+    Samples are scaled to the range [-1.0, 1.0).
+    """
+    dtype = SAMPLE_DTYPES[segment.sample_width]
+    samples = np.frombuffer(segment.raw_data, dtype=dtype).astype(np.float32)
+    samples /= float(2 ** (8 * segment.sample_width - 1))
+    return samples.reshape(-1, segment.channels)
+
+
+def float_to_pcm(samples: np.ndarray, sample_width: int = 2) -> np.ndarray:
+    """Convert float samples to clipped integer PCM of the given width."""
+    dtype = SAMPLE_DTYPES[sample_width]
+    info = np.iinfo(dtype)
+    scaled = np.clip(samples * float(2 ** (8 * sample_width - 1)), info.min, info.max)
+    return scaled.astype(dtype)
+
+
+def array_to_segment(
+    samples: np.ndarray, frame_rate: int, sample_width: int = 2
+) -> AudioSegment:
+    """Encode a float array of shape (frames, channels) as an AudioSegment.
+
+    Samples outside [-1.0, 1.0) are clipped, like pydub does on overflow.
+    """
+    return AudioSegment(
+        data=float_to_pcm(samples, sample_width).tobytes(),
+        sample_width=sample_width,
+        frame_rate=frame_rate,
+        channels=samples.shape[1],
+    )
+
+
+def sync_segments(*segments: AudioSegment) -> Tuple[AudioSegment, ...]:
+    """Convert segments to a shared frame rate and sample width.
+
+    Uses the highest value of each, like ``AudioSegment.overlay``. Channel
+    counts are left alone: mono arrays broadcast against stereo ones.
+    """
+    frame_rate = max(seg.frame_rate for seg in segments)
+    sample_width = max(seg.sample_width for seg in segments)
+    return tuple(
+        seg.set_frame_rate(frame_rate).set_sample_width(sample_width)
+        for seg in segments
+    )
+
+
+def concatenate_segments(segments: List[AudioSegment]) -> AudioSegment:
+    """Join segments end to end with a single copy of the sample data.
+
+    Segments are first converted to the highest frame rate, channel count
+    and sample width among them, as ``AudioSegment.__add__`` would.
+    """
+    channels = max(seg.channels for seg in segments)
+    frame_rate = max(seg.frame_rate for seg in segments)
+    sample_width = max(seg.sample_width for seg in segments)
+    synced = [
+        seg.set_channels(channels)
+        .set_frame_rate(frame_rate)
+        .set_sample_width(sample_width)
+        for seg in segments
+    ]
+    return AudioSegment(
+        data=b"".join(seg.raw_data for seg in synced),
+        sample_width=sample_width,
+        frame_rate=frame_rate,
+        channels=channels,
+    )
+
+
+def fit_to_length(samples: np.ndarray, num_frames: int) -> np.ndarray:
+    """Truncate or zero-pad samples to exactly num_frames frames."""
+    if len(samples) >= num_frames:
+        return samples[:num_frames]
+    padding = np.zeros((num_frames - len(samples), samples.shape[1]), samples.dtype)
+    return np.concatenate([samples, padding])
+
+
+def loop_to_length(samples: np.ndarray, num_frames: int) -> np.ndarray:
+    """Repeat samples end-to-end until they cover num_frames frames.
+
+    Copies into a preallocated output one track length at a time, so the
+    only full-length array is the result itself.
+    """
+    if len(samples) >= num_frames:
+        return samples[:num_frames]
+    looped = np.empty((num_frames, samples.shape[1]), dtype=samples.dtype)
+    for start in range(0, num_frames, len(samples)):
+        end = min(start + len(samples), num_frames)
+        looped[start:end] = samples[: end - start]
+    return looped
+
+
+def fade_envelope(
+    length: int,
+    fade_in_frames: int,
+    fade_out_frames: int,
+    start: int = 0,
+    total: int | None = None,
+) -> np.ndarray:
+    """Build a linear fade-in/fade-out gain envelope.
+
+    The envelope covers frames ``start`` to ``start + length`` of a sound
+    that is ``total`` frames long (defaults to ``length``), so it can be
+    computed one block at a time.
+    """
+    total = length if total is None else total
+    positions = np.arange(start, start + length, dtype=np.float32)
+    envelope = np.ones(length, dtype=np.float32)
+    if fade_in_frames > 0:
+        envelope *= np.minimum(positions / fade_in_frames, 1.0)
+    if fade_out_frames > 0:
+        envelope *= np.minimum((total - positions) / fade_out_frames, 1.0)
+    return envelope
+
+
+def build_music_envelope(
+    num_frames: int,
+    frame_rate: int,
+    gap_ranges: List[Tuple[int, int]],
+    gap_fade_ms: int,
+    music_without_voice_db: float,
+    music_under_voice_db: float,
+    start_frame: int = 0,
+    total_frames: int | None = None,
+) -> np.ndarray:
+    """Build the per-frame music gain curve for a window of the episode.
+
+    Music plays at ``music_under_voice_db`` everywhere, plus a faded
+    ``music_without_voice_db`` layer over each gap (extended by the fade
+    length on both sides), matching the layering of the pydub path. The
+    window starts at ``start_frame`` and is ``num_frames`` long, within an
+    episode of ``total_frames`` (defaults to the end of the window).
+    """
+    envelope = np.full(num_frames, db_to_gain(music_under_voice_db), dtype=np.float32)
+    gap_gain = db_to_gain(music_without_voice_db)
+    fade_frames = ms_to_frames(gap_fade_ms, frame_rate)
+    end_frame = start_frame + num_frames
+    total_frames = end_frame if total_frames is None else total_frames
+
+    for start_ms, end_ms in gap_ranges:
+        gap_start = max(0, ms_to_frames(start_ms - gap_fade_ms, frame_rate))
+        gap_end = min(total_frames, ms_to_frames(end_ms + gap_fade_ms, frame_rate))
+        start = max(gap_start, start_frame)
+        end = min(gap_end, end_frame)
+        if end <= start:
+            continue
+        envelope[start - start_frame : end - start_frame] += gap_gain * fade_envelope(
+            end - start,
+            fade_frames,
+            fade_frames,
+            start=start - gap_start,
+            total=gap_end - gap_start,
+        )
+
+    return envelope
+
+
+def activity_hop_frames(frame_rate: int) -> int:
+    """Return the number of frames in one voice activity hop."""
+    return max(1, ms_to_frames(ACTIVITY_HOP_MS, frame_rate))
+
+
+def voice_activity(
+    samples: np.ndarray, frame_rate: int, threshold_db: float, full_scale: float = 1.0
+) -> np.ndarray:
+    """Return whether each hop of the samples holds voice.
+
+    A hop is voiced when its RMS, over all channels, is above threshold_db
+    relative to full scale.
+
+    Args:
+        full_scale: The value of a full-scale sample, e.g. 2**15 for 16-bit
+            integer PCM
+    """
+    hop = activity_hop_frames(frame_rate)
+    full_hops = len(samples) // hop
+    energy = np.zeros(-(-len(samples) // hop), dtype=np.float64)
+    hops = np.asarray(samples[: full_hops * hop], dtype=np.float32).reshape(
+        full_hops, hop, -1
+    )
+    energy[:full_hops] = np.einsum("ijk,ijk->i", hops, hops)
+    if len(energy) > full_hops:
+        tail = np.asarray(samples[full_hops * hop :], dtype=np.float32)
+        energy[full_hops] = np.sum(np.square(tail))
+    mean_square = energy / (hop * samples.shape[1])
+    return mean_square > (db_to_gain(threshold_db) * full_scale) ** 2
+
+
+def place_voice_activity(
+    activities: Sequence[np.ndarray],
+    start_frames: Sequence[int],
+    total_frames: int,
+    frame_rate: int,
+) -> np.ndarray:
+    """Combine the voice activity of memos placed on the episode timeline."""
+    hop = activity_hop_frames(frame_rate)
+    activity = np.zeros(-(-total_frames // hop), dtype=bool)
+    for memo_activity, start_frame in zip(activities, start_frames, strict=True):
+        start = start_frame // hop
+        placed = memo_activity[: len(activity) - start]
+        activity[start : start + len(placed)] |= placed
+    return activity
+
+
+def fill_short_pauses(activity: np.ndarray, max_pause_hops: int) -> np.ndarray:
+    """Mark pauses shorter than max_pause_hops between voiced hops as voiced."""
+    voiced = np.flatnonzero(activity)
+    pauses = np.diff(voiced) - 1
+    short = (pauses > 0) & (pauses < max_pause_hops)
+    markers = np.zeros(len(activity) + 1, dtype=np.int32)
+    markers[voiced[:-1][short] + 1] += 1
+    markers[voiced[1:][short]] -= 1
+    return activity | (np.cumsum(markers)[:-1] > 0)
+
+
+def silence_trim_mask(
+    samples: np.ndarray,
+    frame_rate: int,
+    trim: Dict[str, Any],
+    full_scale: float = 1.0,
+) -> np.ndarray:
+    """Return which frames of a memo to keep once its silence is trimmed.
+
+    Silence before the first and after the last voiced hop is cut down to
+    ``pad_ms``. With ``max_pause_ms`` set, longer pauses inside the memo are
+    shortened to that length, keeping half of it on either side of the cut.
+    A memo without any voiced hop is kept whole.
+
+    Args:
+        trim: threshold_db, pad_ms and max_pause_ms (None keeps pauses)
+        full_scale: The value of a full-scale sample
+    """
+    hop = activity_hop_frames(frame_rate)
+    activity = voice_activity(samples, frame_rate, trim["threshold_db"], full_scale)
+    voiced = np.flatnonzero(activity)
+    if not voiced.size:
+        return np.ones(len(samples), dtype=bool)
+
+    hop_ms = hop * 1000 / frame_rate
+    pad_hops = round(trim["pad_ms"] / hop_ms)
+    markers = np.zeros(len(activity) + 1, dtype=np.int32)
+    markers[max(0, voiced[0] - pad_hops)] += 1
+    markers[min(len(activity), voiced[-1] + 1 + pad_hops)] -= 1
+    if trim["max_pause_ms"] is not None:
+        pause_hops = round(trim["max_pause_ms"] / hop_ms)
+        pauses = np.diff(voiced) - 1
+        long = pauses > pause_hops
+        markers[voiced[:-1][long] + 1 + pause_hops // 2] -= 1
+        markers[voiced[1:][long] - (pause_hops - pause_hops // 2)] += 1
+    keep = np.cumsum(markers)[:-1] > 0
+    return np.repeat(keep, hop)[: len(samples)]
+
+
+def ducking_amount(
+    activity: np.ndarray, attack_hops: int, release_hops: int
+) -> np.ndarray:
+    """Return how far the music is ducked at each hop, from 0 to 1.
+
+    The music is fully ducked on voiced hops. It ramps down linearly over
+    the attack_hops before voice starts and back up over the release_hops
+    after it stops, from the distance to the nearest voiced hop on either
+    side, so no sample-by-sample recursion is needed.
+    """
+    hops = np.arange(len(activity), dtype=np.float64)
+    last_voiced = np.maximum.accumulate(np.where(activity, hops, -np.inf))
+    next_voiced = np.minimum.accumulate(np.where(activity, hops, np.inf)[::-1])[::-1]
+    after = 1 - (hops - last_voiced) / (release_hops + 1)
+    before = 1 - (next_voiced - hops) / (attack_hops + 1)
+    return np.clip(np.maximum(after, before), 0.0, 1.0)
+
+
+def ducking_gains(
+    activity: np.ndarray,
+    frame_rate: int,
+    ducking: Dict[str, Any],
+    music_without_voice_db: float,
+    music_under_voice_db: float,
+) -> np.ndarray:
+    """Build the per-hop music gain curve from the voice activity.
+
+    Music plays at ``music_under_voice_db`` under voice, plus the
+    ``music_without_voice_db`` layer wherever it isn't ducked, the same
+    levels as the gap-based envelope.
+
+    Args:
+        activity: Whether each hop of the episode holds voice
+        ducking: threshold_db, attack_ms, release_ms and hold_ms (pauses
+            shorter than this keep the music ducked)
+    """
+    hop_ms = activity_hop_frames(frame_rate) * 1000 / frame_rate
+    activity = fill_short_pauses(activity, round(ducking["hold_ms"] / hop_ms))
+    amount = ducking_amount(
+        activity,
+        round(ducking["attack_ms"] / hop_ms),
+        round(ducking["release_ms"] / hop_ms),
+    )
+    return db_to_gain(music_under_voice_db) + db_to_gain(music_without_voice_db) * (
+        1 - amount
+    )
+
+
+def ducking_envelope(
+    gains: np.ndarray, frame_rate: int, num_frames: int, start_frame: int = 0
+) -> np.ndarray:
+    """Interpolate per-hop music gains to a per-frame curve for a window.
+
+    Each gain holds at the first frame of its hop, and the frames up to the
+    next hop ramp linearly towards the next gain.
+    """
+    hop = activity_hop_frames(frame_rate)
+    first = start_frame // hop
+    last = -(-(start_frame + num_frames) // hop)
+    hop_gains = gains[first : last + 1].astype(np.float32)
+    hop_gains = np.pad(hop_gains, (0, last - first + 1 - len(hop_gains)), "edge")
+    ramp = np.arange(hop, dtype=np.float32) / hop
+    envelope = hop_gains[:-1, np.newaxis] + np.diff(hop_gains)[:, np.newaxis] * ramp
+    offset = start_frame - first * hop
+    return envelope.ravel()[offset : offset + num_frames]
+
+
+def mix_arrays(
+    voice: np.ndarray,
+    music: np.ndarray,
+    music_envelope: np.ndarray,
+    master_envelope: np.ndarray,
+) -> np.ndarray:
+    """Sum gain-shaped music and voice, apply the master envelope and clip.
+
+    Mono inputs are broadcast, so the result has the larger channel count.
+    """
+    mixed = music * music_envelope[:, np.newaxis] + voice
+    mixed *= master_envelope[:, np.newaxis]
+    np.clip(mixed, -1.0, 1.0, out=mixed)
+    return mixed
+
+
+def prepare_mix_inputs(
+    voice_track: AudioSegment, bg_music: AudioSegment
+) -> Tuple[np.ndarray, np.ndarray, int, int]:
+    """Decode the voice track and music into aligned float arrays.
+
+    Returns:
+        A tuple of (voice, music, frame rate, sample width); music is looped
+        to the length of the voice track
+    """
+    voice_track, bg_music = sync_segments(voice_track, bg_music)
+    frame_rate = voice_track.frame_rate
+
+    # pydub lays the mix out on a silent track of len(voice_track) milliseconds
+    num_frames = ms_to_frames(len(voice_track), frame_rate)
+    voice = fit_to_length(segment_to_array(voice_track), num_frames)
+    music = loop_to_length(segment_to_array(bg_music), num_frames)
+    return voice, music, frame_rate, voice_track.sample_width
+
+
+def render_mix_window(
+    voice: np.ndarray,
+    music: np.ndarray,
+    frame_rate: int,
+    gap_ranges: List[Tuple[int, int]],
+    gap_fade_ms: int,
+    music_without_voice_db: float,
+    music_under_voice_db: float,
+    start_frame: int = 0,
+    end_frame: int | None = None,
+    music_gains: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Mix frames start_frame to end_frame of aligned voice and music arrays.
+
+    Args:
+        music_gains: Per-hop music gains from ``ducking_gains``, which
+            replace the gap-based music envelope
+    """
+    num_frames = len(voice)
+    end_frame = num_frames if end_frame is None else end_frame
+    window_frames = end_frame - start_frame
+
+    if music_gains is not None:
+        music_envelope = ducking_envelope(
+            music_gains, frame_rate, window_frames, start_frame
+        )
+    else:
+        music_envelope = build_music_envelope(
+            window_frames,
+            frame_rate,
+            gap_ranges,
+            gap_fade_ms,
+            music_without_voice_db,
+            music_under_voice_db,
+            start_frame=start_frame,
+            total_frames=num_frames,
+        )
+    fade_frames = ms_to_frames(gap_fade_ms, frame_rate)
+    master_envelope = fade_envelope(
+        window_frames, fade_frames, fade_frames, start=start_frame, total=num_frames
+    )
+    return mix_arrays(
+        voice[start_frame:end_frame],
+        music[start_frame:end_frame],
+        music_envelope,
+        master_envelope,
+    )
+
+
+def render_final_mix(
+    voice_track: AudioSegment,
+    bg_music: AudioSegment,
+    gap_ranges: List[Tuple[int, int]],
+    gap_fade_ms: int,
+    music_without_voice_db: float,
+    music_under_voice_db: float,
+    ducking: Optional[Dict[str, Any]] = None,
+) -> AudioSegment:
+    """Render the final mix of voice and background music with NumPy.
+
+    Produces the same result as the chained-overlay pydub path: music at
+    full volume in the gaps, lowered under speech, voice on top and a fade
+    in/out over the whole episode.
+
+    Args:
+        ducking: Voice ducking settings (see ``ducking_gains``); the music
+            then follows the voice activity instead of the gaps
+    """
+    voice, music, frame_rate, sample_width = prepare_mix_inputs(voice_track, bg_music)
+    music_gains = None
+    if ducking is not None:
+        music_gains = ducking_gains(
+            voice_activity(voice, frame_rate, ducking["threshold_db"]),
+            frame_rate,
+            ducking,
+            music_without_voice_db,
+            music_under_voice_db,
+        )
+    mixed = render_mix_window(
+        voice,
+        music,
+        frame_rate,
+        gap_ranges,
+        gap_fade_ms,
+        music_without_voice_db,
+        music_under_voice_db,
+        music_gains=music_gains,
+    )
+    logger.info(
+        f"Rendered {len(mixed)} frames at {frame_rate}Hz "
+        f"({mixed.shape[1]} channels) with the NumPy engine"
+    )
+    return array_to_segment(mixed, frame_rate, sample_width)
@@ -0,0 +1,191 @@
+"""Encoding the final mix.
+
+Raw PCM is piped straight into one ffmpeg process per output file, so the
+mix is never written to disk as an intermediate WAV. When several outputs
+are configured (e.g. the main MP3 plus a low-bandwidth mono AAC), every
+block of PCM is handed to all encoders at once and they encode in parallel.
+"""
+
+import os
+import pathlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List
+
+from pydub import AudioSegment  # type: ignore[import]
+
+from src.mixer.ffmpeg import FFmpegError, close_encoder, open_encoder
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_OUTPUT_NAME = "voice_memo_mix.mp3"
+EXPORT_CHUNK_BYTES = 1024 * 1024
+
+# Output file extension -> (ffmpeg muxer, audio codec, extra muxer options)
+OUTPUT_FORMATS = {
+    ".mp3": ("mp3", "libmp3lame", []),
+    ".m4a": ("ipod", "aac", ["-movflags", "+faststart"]),
+    ".aac": ("adts", "aac", []),
+    ".ogg": ("ogg", "libvorbis", []),
+    ".opus": ("opus", "libopus", []),
+    ".flac": ("flac", "flac", []),
+}
+
+# ffmpeg sample format of pydub's raw data, by sample width
+PCM_FORMATS = {1: "s8", 2: "s16le", 4: "s32le"}
+
+BITRATE_PATTERN = re.compile(r"^\d+k?$")
+
+
+class UnknownOutputFormatError(Exception):
+    """Exception raised when an output file has an unsupported extension."""
+
+
+def parse_output_options(options: str) -> Dict[str, Any]:
+    """Parse encoder options of the form ``bitrate=64k:channels=1``.
+
+    Supported options are ``bitrate`` (constant bitrate, e.g. ``128k``),
+    ``vbr`` (ffmpeg ``-q:a`` quality), ``channels`` and ``sample_rate``.
+    """
+    parsed: Dict[str, Any] = {}
+    for option in filter(None, options.split(":")):
+        key, _, value = option.partition("=")
+        if key == "bitrate":
+            if not BITRATE_PATTERN.match(value):
+                raise ValueError(f"Invalid bitrate: {value}")
+            parsed["bitrate"] = value
+        elif key in ("vbr", "channels", "sample_rate"):
+            try:
+                parsed[key] = int(value)
+            except ValueError as e:
+                raise ValueError(f"{key} must be an integer, got: {value}") from e
+            if parsed[key] < 0 or (key != "vbr" and parsed[key] == 0):
+                raise ValueError(f"Invalid {key}: {value}")
+        else:
+            raise ValueError(f"Unknown output option: {option}")
+
+    if "bitrate" in parsed and "vbr" in parsed:
+        raise ValueError("Output options bitrate and vbr are mutually exclusive")
+    return parsed
+
+
+def make_output(path: pathlib.Path, options: str = "") -> Dict[str, Any]:
+    """Describe an output file and its encoder options."""
+    if path.suffix.lower() not in OUTPUT_FORMATS:
+        raise UnknownOutputFormatError(
+            f"Unsupported output format {path.suffix!r}, "
+            f"expected one of {sorted(OUTPUT_FORMATS)}"
+        )
+    return {"path": path, **parse_output_options(options)}
+
+
+def get_export_outputs(output_dir: pathlib.Path) -> List[Dict[str, Any]]:
+    """Return the outputs configured by environment.
+
+    The main output is always ``voice_memo_mix.mp3``, encoded with
+    MIXER_OUTPUT_OPTIONS. MIXER_EXTRA_OUTPUTS adds comma-separated
+    ``filename[:options]`` entries, e.g. ``voice_memo_mix_low.m4a:bitrate=64k:
+    channels=1``.
+    """
+    outputs = [
+        make_output(
+            output_dir / DEFAULT_OUTPUT_NAME, os.getenv("MIXER_OUTPUT_OPTIONS", "")
+        )
+    ]
+    for spec in filter(None, os.getenv("MIXER_EXTRA_OUTPUTS", "").split(",")):
+        name, _, options = spec.strip().partition(":")
+        outputs.append(make_output(output_dir / name, options))
+    return outputs
+
+
+def encoder_args(output: Dict[str, Any]) -> List[str]:
+    """Build the ffmpeg codec options for an output."""
+    _, codec, muxer_args = OUTPUT_FORMATS[output["path"].suffix.lower()]
+    args = ["-c:a", codec]
+    if "bitrate" in output:
+        args += ["-b:a", output["bitrate"]]
+    if "vbr" in output:
+        args += ["-q:a", str(output["vbr"])]
+    if "channels" in output:
+        args += ["-ac", str(output["channels"])]
+    if "sample_rate" in output:
+        args += ["-ar", str(output["sample_rate"])]
+    return args + muxer_args
+
+
+def partial_path(path: pathlib.Path) -> pathlib.Path:
+    """Where an output is written until its encoder has finished."""
+    return path.with_name(f".{path.name}.partial")
+
+
+def encode_pcm(
+    chunks: Iterable[bytes],
+    outputs: List[Dict[str, Any]],
+    frame_rate: int,
+    channels: int,
+    pcm_format: str,
+) -> None:
+    """Encode a stream of raw PCM into every output in parallel.
+
+    Each output is written under a temporary name and renamed into place
+    only once its encoder succeeds, so a failed run never leaves a
+    truncated episode behind for the publishers to pick up.
+    """
+    processes = [
+        open_encoder(
+            partial_path(output["path"]),
+            frame_rate,
+            channels,
+            output_format=OUTPUT_FORMATS[output["path"].suffix.lower()][0],
+            output_args=encoder_args(output),
+            pcm_format=pcm_format,
+        )
+        for output in outputs
+    ]
+
+    def write(process, output: Dict[str, Any], chunk: bytes) -> None:
+        assert process.stdin is not None
+        try:
+            process.stdin.write(chunk)
+        except BrokenPipeError as e:
+            _, stderr = process.communicate()
+            raise FFmpegError(
+                f"Encoding {output['path']} failed: {stderr.decode(errors='replace')}"
+            ) from e
+
+    try:
+        # One writer thread per encoder, so encoders never wait on each other
+        with ThreadPoolExecutor(max_workers=len(processes)) as pool:
+            for chunk in chunks:
+                list(pool.map(write, processes, outputs, [chunk] * len(processes)))
+        for process, output in zip(processes, outputs, strict=True):
+            close_encoder(process, output["path"])
+    except BaseException:
+        for process, output in zip(processes, outputs, strict=True):
+            process.kill()
+            process.wait()
+            partial_path(output["path"]).unlink(missing_ok=True)
+        raise
+
+    for output in outputs:
+        os.replace(partial_path(output["path"]), output["path"])
+        logger.info(f"Encoded {output['path']} ({' '.join(encoder_args(output))})")
+
+
+def export_segment(segment: AudioSegment, outputs: List[Dict[str, Any]]) -> None:
+    """Encode an AudioSegment's samples into every output without a temp WAV."""
+    if segment.sample_width not in PCM_FORMATS:
+        raise FFmpegError(f"Unsupported sample width: {segment.sample_width}")
+    data = memoryview(segment.raw_data)
+    chunk_bytes = EXPORT_CHUNK_BYTES - EXPORT_CHUNK_BYTES % segment.frame_width
+    encode_pcm(
+        (
+            data[start : start + chunk_bytes]
+            for start in range(0, len(data), chunk_bytes)
+        ),
+        outputs,
+        segment.frame_rate,
+        segment.channels,
+        PCM_FORMATS[segment.sample_width],
+    )
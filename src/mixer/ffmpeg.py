@@ -0,0 +1,148 @@
+"""Thin wrappers around the ffmpeg CLI for raw PCM decoding and encoding.
+
+Audio crosses the process boundary as interleaved little-endian float32
+(``f32le``) so it maps directly onto the NumPy engine's arrays.
+"""
+
+import pathlib
+import subprocess
+from typing import Iterator, List, Sequence
+
+import numpy as np
+
+FFMPEG_BINARY = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+PCM_FORMAT = "f32le"
+PCM_DTYPE = np.dtype("<f4")
+
+
+class FFmpegError(Exception):
+    """Exception raised when an ffmpeg process fails."""
+
+
+def probe_duration_ms(path: pathlib.Path) -> int:
+    """Read a file's duration from its container metadata, without decoding."""
+    result = subprocess.run(
+        [
+            FFPROBE_BINARY,
+            "-v",
+            "error",
+            "-show_entries",
+            "format=duration",
+            "-of",
+            "default=noprint_wrappers=1:nokey=1",
+            str(path),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise FFmpegError(f"Probing {path} failed: {result.stderr}")
+    try:
+        return round(float(result.stdout.strip()) * 1000)
+    except ValueError as e:
+        raise FFmpegError(f"No duration in metadata of {path}") from e
+
+
+def decode_command(path: pathlib.Path, frame_rate: int, channels: int) -> List[str]:
+    """Build the ffmpeg command that decodes a file to raw PCM on stdout."""
+    return [
+        FFMPEG_BINARY,
+        "-v",
+        "error",
+        "-nostdin",
+        "-i",
+        str(path),
+        "-f",
+        PCM_FORMAT,
+        "-ac",
+        str(channels),
+        "-ar",
+        str(frame_rate),
+        "-",
+    ]
+
+
+def decode_to_array(path: pathlib.Path, frame_rate: int, channels: int) -> np.ndarray:
+    """Decode a whole file into a float32 array of shape (frames, channels)."""
+    result = subprocess.run(
+        decode_command(path, frame_rate, channels), capture_output=True
+    )
+    if result.returncode != 0:
+        raise FFmpegError(
+            f"Decoding {path} failed: {result.stderr.decode(errors='replace')}"
+        )
+    return np.frombuffer(result.stdout, dtype=PCM_DTYPE).reshape(-1, channels)
+
+
+def iter_decoded_blocks(
+    path: pathlib.Path, frame_rate: int, channels: int, block_frames: int
+) -> Iterator[np.ndarray]:
+    """Decode a file lazily, yielding float32 blocks of at most block_frames."""
+    process = subprocess.Popen(
+        decode_command(path, frame_rate, channels),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    assert process.stdout is not None
+    frame_bytes = PCM_DTYPE.itemsize * channels
+    try:
+        while True:
+            data = process.stdout.read(block_frames * frame_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % frame_bytes
+            yield np.frombuffer(data[:usable], dtype=PCM_DTYPE).reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise FFmpegError(f"Decoding {path} failed: {stderr.decode(errors='replace')}")
+
+
+def open_encoder(
+    output_path: pathlib.Path,
+    frame_rate: int,
+    channels: int,
+    output_format: str = "mp3",
+    output_args: Sequence[str] = (),
+    pcm_format: str = PCM_FORMAT,
+) -> subprocess.Popen:
+    """Start an ffmpeg process that encodes raw PCM from stdin to a file.
+
+    Args:
+        output_args: Extra encoder options (codec, bitrate, ...) for the output
+        pcm_format: ffmpeg sample format of the PCM written to stdin
+    """
+    return subprocess.Popen(
+        [
+            FFMPEG_BINARY,
+            "-v",
+            "error",
+            "-y",
+            "-f",
+            pcm_format,
+            "-ar",
+            str(frame_rate),
+            "-ac",
+            str(channels),
+            "-i",
+            "-",
+            *output_args,
+            "-f",
+            output_format,
+            str(output_path),
+        ],
+        stdin=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+
+def close_encoder(process: subprocess.Popen, output_path: pathlib.Path) -> None:
+    """Flush an encoder process and raise if encoding failed."""
+    # communicate() flushes and closes stdin, so the encoder sees EOF
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise FFmpegError(
+            f"Encoding {output_path} failed: {stderr.decode(errors='replace')}"
+        )
@@ -1,18 +1,80 @@
 import datetime
+import math
+import os
 import pathlib
 import random
-from typing import List, Tuple
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 from pydub import AudioSegment  # type: ignore[import]
 from pydub.effects import normalize  # type: ignore[import]
+from pydub.utils import db_to_float, ratio_to_db  # type: ignore[import]
 
+from src.mixer.decode_cache import (
+    cache_key,
+    decode_array,
+    decode_segment,
+    get_stem_cache,
+)
+from src.mixer.engine import (
+    SAMPLE_DTYPES,
+    array_to_segment,
+    concatenate_segments,
+    ducking_gains,
+    float_to_pcm,
+    ms_to_frames,
+    place_voice_activity,
+    prepare_mix_inputs,
+    render_final_mix,
+    render_mix_window,
+    silence_trim_mask,
+    voice_activity,
+)
+from src.mixer.export import export_segment, get_export_outputs
+from src.mixer.ffmpeg import FFmpegError, probe_duration_ms
+from src.mixer.incremental import (
+    build_manifest,
+    find_dirty_spans,
+    get_render_cache_dir,
+    is_incremental_enabled,
+    is_same_episode,
+    load_manifest,
+    load_previous_mix,
+    reuse_music_order,
+    save_render,
+    splice_render,
+)
+from src.mixer.instrumentation import count, current_run, measure_call, start_run
+from src.mixer.streaming import (
+    LOUDNESS_CEILING_DBFS,
+    NORMALIZE_HEADROOM_DB,
+    MusicStream,
+    encode_blocks,
+    frames_to_ms,
+    prepare_voice_stem,
+    render_blocks,
+    spill_stem,
+)
+from src.mixer.timeline import plan_voice_track
+from src.mixer.watch import DEFAULT_POLL_S, DEFAULT_SETTLE_S, watch_for_new_audio
+from src.utils.audio_metadata import measure_samples, read_sidecar, segment_samples
+from src.utils.env import get_non_negative_int_env, get_positive_int_env
+from src.utils.hashing import file_sha256
 from src.utils.logging import setup_logger
+from src.utils.loudness import integrated_loudness, loudness_gain_db
+from src.utils.new_audio import get_new_audio_flag
 
 logger = setup_logger(__name__)
 
-VOICE_DIR = pathlib.Path("data/voice-memos")
+# One show's memos; point it at data/voice-memos/<channel> when the
+# file-downloader serves several channels
+VOICE_DIR = pathlib.Path(os.getenv("MIXER_VOICE_DIR", "data/voice-memos"))
 MUSIC_DIR = pathlib.Path("data/background-music")
 PODCAST_OUTPUT_DIR = pathlib.Path("data/podcast")
+RUN_REPORT_NAME = "voice_memo_mix.report.json"
 
 INTRO_MS = 5000  # music intro length
 OUTRO_MS = 8000  # music outro length
@@ -23,6 +85,42 @@ MUSIC_UNDER_VOICE_DB = -40  # dB lowering under speech
 MUSIC_WITHOUT_VOICE_DB = -10  # little lower music when there is no voice
 GAP_FADE_MS = 2000  # fade in/out for gap transitions
 MAX_LENGTH_MS = int(datetime.timedelta(minutes=3, seconds=5).total_seconds() * 1000)
+MUSIC_LENGTH_MARGIN = 0.1  # extra music loaded beyond the voice track length
+SILENCE_FRAME_RATE = 11025  # frame rate of AudioSegment.silent()
+
+# "numpy" renders the mix in one vectorized pass, "pydub" chains overlays
+MIXER_ENGINES = ("numpy", "pydub")
+DEFAULT_MIXER_ENGINE = "numpy"
+
+# "memory" renders the whole episode at once, "streaming" renders it in blocks
+RENDER_MODES = ("memory", "streaming")
+DEFAULT_RENDER_MODE = "memory"
+DEFAULT_BLOCK_MS = 10_000  # streaming block length
+DEFAULT_DECODE_WORKERS = os.cpu_count() or 1  # parallel voice memo decoders
+STREAM_FRAME_RATE = 44100  # output format of the streaming render
+STREAM_CHANNELS = 2
+
+# MIXER_NORMALIZE: "peak" (default) or "loudness" (EBU R128, in LUFS)
+NORMALIZE_MODES = ("peak", "loudness")
+DEFAULT_NORMALIZE_MODE = "peak"
+DEFAULT_VOICE_TARGET_LUFS = -18.0  # each memo, before music is mixed under it
+DEFAULT_MASTER_TARGET_LUFS = -16.0  # the finished episode
+
+# MIXER_DUCKING: "gaps" (default) raises the music in the planned gaps between
+# memos; "voice" follows the voice activity, including pauses inside memos
+DUCKING_MODES = ("gaps", "voice")
+DEFAULT_DUCKING_MODE = "gaps"
+DEFAULT_DUCK_THRESHOLD_DB = -45.0  # RMS below which a 10ms hop is silent
+DEFAULT_DUCK_ATTACK_MS = 300  # music ducks over this long before voice
+DEFAULT_DUCK_RELEASE_MS = 1500  # and comes back up over this long after it
+DEFAULT_DUCK_HOLD_MS = 1000  # pauses shorter than this keep the music down
+
+# MIXER_TRIM_SILENCE=1 trims the silence around (and optionally inside) memos
+DEFAULT_TRIM_THRESHOLD_DB = -50.0  # RMS below which a 10ms hop is silent
+DEFAULT_TRIM_PAD_MS = 250  # silence kept before and after the speech
+
+VOICE_EXTENSIONS = [".mp3", ".wav", ".m4a", ".ogg", ".flac"]
+MUSIC_EXTENSIONS = [".mp3", ".wav", ".ogg", ".m4a"]
 
 
 class NoVoiceMemosFoundError(Exception):
@@ -33,35 +131,252 @@ class NoBackgroundMusicFoundError(Exception):
     """Exception raised when no background music is found."""
 
 
-def load_voice_memos() -> List[AudioSegment]:
-    """Load and normalize voice memos from the voice directory."""
-    logger.info("Loading voice memos...")
-    voice_files = sorted(
-        f for f in VOICE_DIR.iterdir() if f.suffix in [".mp3", ".wav", ".m4a", ".ogg"]
-    )
+class UnknownMixerEngineError(Exception):
+    """Exception raised when MIXER_ENGINE names an unsupported engine."""
+
+
+class UnknownRenderModeError(Exception):
+    """Exception raised when MIXER_RENDER_MODE names an unsupported mode."""
+
+
+class UnknownNormalizeModeError(Exception):
+    """Exception raised when MIXER_NORMALIZE names an unsupported mode."""
+
+
+class UnknownDuckingModeError(Exception):
+    """Exception raised when MIXER_DUCKING names an unsupported mode."""
+
+
+def list_voice_files() -> List[pathlib.Path]:
+    """List voice memo files in timeline (filename) order."""
+    voice_files = sorted(f for f in VOICE_DIR.iterdir() if f.suffix in VOICE_EXTENSIONS)
     if not voice_files:
         logger.error(f"No voice memos found in {VOICE_DIR}")
         raise NoVoiceMemosFoundError(f"No voice memos found in {VOICE_DIR}")
+    return voice_files
 
-    voice_segs: List[AudioSegment] = []
-    cumulative_position_ms = INTRO_MS
+
+def list_music_files() -> List[pathlib.Path]:
+    """List background music files in a random order."""
+    music_files = [f for f in MUSIC_DIR.iterdir() if f.suffix in MUSIC_EXTENSIONS]
+    random.shuffle(music_files)
+    if not music_files:
+        logger.error(f"No background music found in {MUSIC_DIR}")
+        raise NoBackgroundMusicFoundError(f"No background music found in {MUSIC_DIR}")
+    return music_files
+
+
+def read_voice_metadata(
+    voice_files: List[pathlib.Path],
+) -> List[Optional[Dict[str, Any]]]:
+    """Read the memos' sidecars; None for a memo without a current one."""
+    return [read_sidecar(f) for f in voice_files]
+
+
+def planned_durations_ms(
+    metadata: List[Optional[Dict[str, Any]]],
+) -> Optional[List[int]]:
+    """Return how long each memo will be on the timeline, from the sidecars.
+
+    Returns:
+        The truncated memo durations, or None if any memo lacks a sidecar
+    """
+    if any(m is None for m in metadata):
+        return None
+    return [min(m["duration_ms"], MAX_LENGTH_MS) for m in metadata]  # type: ignore[index]
+
+
+def log_planned_timeline(
+    voice_files: List[pathlib.Path], durations_ms: List[int]
+) -> Tuple[List[int], List[Tuple[int, int]], int]:
+    """Plan the voice track from memo durations and log where everything goes."""
+    memo_starts_ms, gap_ranges, total_ms = plan_voice_track(
+        durations_ms, INTRO_MS, GAP_MS, OUTRO_MS, CROSSFADE_MS
+    )
+    for f, start_ms, duration_ms in zip(
+        voice_files, memo_starts_ms, durations_ms, strict=True
+    ):
+        logger.info(
+            f"Voice memo planned: {f.name} | Duration: {duration_ms}ms | "
+            f"Timeline position: {start_ms}ms-{start_ms + duration_ms}ms"
+        )
+    logger.info(
+        f"Planned voice track: total length {total_ms}ms with "
+        f"{len(gap_ranges)} music-only gaps"
+    )
+    return memo_starts_ms, gap_ranges, total_ms
+
+
+def sidecar_describes(
+    segment: AudioSegment, metadata: Optional[Dict[str, Any]]
+) -> bool:
+    """Return whether a memo's sidecar describes this very decoded audio."""
+    return (
+        metadata is not None
+        and metadata.get("sample_width") == segment.sample_width
+        and metadata["duration_ms"] == len(segment)
+    )
+
+
+def normalize_voice_memo(
+    segment: AudioSegment,
+    metadata: Optional[Dict[str, Any]],
+    target_lufs: Optional[float] = None,
+) -> AudioSegment:
+    """Normalize a memo's peak or, given a target, its integrated loudness.
+
+    Peak normalization matches ``pydub.effects.normalize`` exactly. When the
+    memo's sidecar describes this very audio, its peak and loudness are used
+    instead of scanning every sample for them.
+    """
+    if target_lufs is not None:
+        if metadata is None or not sidecar_describes(segment, metadata):
+            metadata = measure_samples(segment_samples(segment), segment.frame_rate)
+        return segment.apply_gain(
+            loudness_gain_db(
+                metadata["integrated_loudness"],
+                metadata["peak"],
+                target_lufs,
+                LOUDNESS_CEILING_DBFS,
+            )
+        )
+    if not sidecar_describes(segment, metadata) or not metadata["peak"]:
+        return normalize(segment)
+    peak = metadata["peak"] * segment.max_possible_amplitude
+    target_peak = segment.max_possible_amplitude * db_to_float(-NORMALIZE_HEADROOM_DB)
+    return segment.apply_gain(ratio_to_db(target_peak / peak))
+
+
+def trim_voice_memo(segment: AudioSegment, trim: Dict[str, Any]) -> AudioSegment:
+    """Cut a memo's leading, trailing and (optionally) long internal silence.
+
+    Counts the audio removed as ``trimmed_ms``.
+    """
+    samples = np.frombuffer(
+        segment.raw_data, dtype=SAMPLE_DTYPES[segment.sample_width]
+    ).reshape(-1, segment.channels)
+    full_scale = float(2 ** (8 * segment.sample_width - 1))
+    keep = silence_trim_mask(samples, segment.frame_rate, trim, full_scale)
+    if keep.all():
+        return segment
+    trimmed = AudioSegment(
+        data=np.compress(keep, samples, axis=0).tobytes(),
+        sample_width=segment.sample_width,
+        frame_rate=segment.frame_rate,
+        channels=segment.channels,
+    )
+    count("trimmed_ms", len(segment) - len(trimmed))
+    return trimmed
+
+
+def decode_voice_memo(path: pathlib.Path) -> Tuple[AudioSegment, int]:
+    """Decode, trim, truncate, normalize and fade a single voice memo.
+
+    Runs inside decode worker processes, so it leaves logging to the caller.
+    Processed memos are kept in the stem cache, so an unchanged memo skips
+    both decoding and processing on the next run.
+
+    The silence trimmed and the duration before truncation are stored with
+    the cached stem, so a cache hit reports them just like a decode does.
+
+    Returns:
+        A tuple of (processed segment, duration in milliseconds before
+        truncation, after trimming silence)
+    """
+    target_lufs = get_voice_target_lufs()
+    trim = get_trim_settings()
+    cache = get_stem_cache()
+    key = None
+    if cache is not None:
+        key = cache_key(
+            file_sha256(path),
+            {
+                "stage": "voice-stem",
+                "max_length_ms": MAX_LENGTH_MS,
+                "voice_fade_ms": VOICE_FADE_MS,
+                "voice_target_lufs": target_lufs,
+                "trim": trim,
+            },
+        )
+        cached = cache.load_segment(key)
+        info = cache.load_info(key) if cached is not None else None
+        # Stems cached without their info are decoded again to get it
+        if cached is not None and info is not None:
+            count("stem_cache_hit_bytes", len(cached.raw_data))
+            if info["trimmed_ms"]:
+                count("trimmed_ms", info["trimmed_ms"])
+            return cached, info["original_ms"]
+
+    metadata = read_sidecar(path)
+    segment = decode_segment(path)
+    decoded_ms = len(segment)
+    if trim is not None:
+        segment = trim_voice_memo(segment, trim)
+    original_ms = len(segment)
+    if original_ms > MAX_LENGTH_MS:
+        segment = segment[:MAX_LENGTH_MS]
+        metadata = None  # describes the whole memo, not the truncated part
+    processed = (
+        normalize_voice_memo(segment, metadata, target_lufs)
+        .fade_in(VOICE_FADE_MS)
+        .fade_out(VOICE_FADE_MS)
+    )
+    if cache is not None and key is not None:
+        cache.store_segment(
+            key,
+            processed,
+            {"trimmed_ms": decoded_ms - original_ms, "original_ms": original_ms},
+        )
+    return processed, original_ms
+
+
+def load_voice_memos() -> List[AudioSegment]:
+    """Load and normalize voice memos from the voice directory.
+
+    Memos are decoded in parallel by a process pool (MIXER_DECODE_WORKERS)
+    and returned in sorted filename order. When every memo has a sidecar,
+    the timeline is planned and logged before anything is decoded.
+    """
+    logger.info("Loading voice memos...")
+    voice_files = list_voice_files()
+    workers = min(get_decode_workers(), len(voice_files))
+
+    # Sidecars hold untrimmed durations, so they can't plan a trimmed episode
+    if get_trim_settings() is None:
+        durations_ms = planned_durations_ms(read_voice_metadata(voice_files))
+        if durations_ms is not None:
+            log_planned_timeline(voice_files, durations_ms)
 
     for f in voice_files:
         logger.info(f"Loading voice memo: {f.name}")
-        segment = AudioSegment.from_file(str(f))
-        duration_ms = len(segment)
 
-        if len(segment) > MAX_LENGTH_MS:
+    measured_decode = partial(measure_call, decode_voice_memo)
+    if workers > 1:
+        logger.info(f"Decoding {len(voice_files)} voice memos with {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            decoded = list(pool.map(measured_decode, voice_files))
+    else:
+        decoded = [measured_decode(f) for f in voice_files]
+
+    voice_segs: List[AudioSegment] = []
+    cumulative_position_ms = INTRO_MS
+    trimmed_ms = 0
+
+    for f, ((normalized_seg, duration_ms), stats) in zip(
+        voice_files, decoded, strict=True
+    ):
+        current_run().add_file(f, stats, duration_ms=duration_ms)
+        memo_trimmed_ms = stats["counters"].get("trimmed_ms", 0)
+        if memo_trimmed_ms:
+            logger.info(f"Trimmed {memo_trimmed_ms}ms of silence from {f.name}")
+            trimmed_ms += memo_trimmed_ms
+        if duration_ms > MAX_LENGTH_MS:
             logger.info(
                 f"Voice memo {f.name} exceeds 3m 10s limit, "
                 f"truncating from {duration_ms}ms to {MAX_LENGTH_MS}ms"
             )
-            segment = segment[:MAX_LENGTH_MS]
             duration_ms = MAX_LENGTH_MS
 
-        normalized_seg = (
-            normalize(segment).fade_in(VOICE_FADE_MS).fade_out(VOICE_FADE_MS)
-        )
         voice_segs.append(normalized_seg)
 
         logger.info(
@@ -72,6 +387,8 @@ def load_voice_memos() -> List[AudioSegment]:
 
         cumulative_position_ms += duration_ms + GAP_MS
 
+    if trimmed_ms:
+        logger.info(f"Trimmed {trimmed_ms}ms of silence in total")
     logger.info(f"Loaded and normalized {len(voice_segs)} voice memos")
     return voice_segs
 
@@ -79,45 +396,64 @@ def load_voice_memos() -> List[AudioSegment]:
 def build_voice_track(
     voice_segs: List[AudioSegment],
 ) -> Tuple[AudioSegment, List[Tuple[int, int]]]:
-    """Build the voice track with gaps and track the gap ranges."""
+    """Build the voice track with gaps and track the gap ranges.
+
+    The layout is planned from memo durations first, then every memo is
+    written into a single preallocated buffer, so building the track costs
+    one copy of each memo instead of re-copying the whole show per memo.
+    """
     logger.info("Building voice track...")
-    show = AudioSegment.silent(INTRO_MS)  # add music intro at the start
-    gap_ranges = [(0, INTRO_MS)]  # first gap: intro
+    memo_starts_ms, gap_ranges, total_ms = plan_voice_track(
+        [len(seg) for seg in voice_segs], INTRO_MS, GAP_MS, OUTRO_MS, CROSSFADE_MS
+    )
 
-    logger.info(f"Intro gap: 0ms-{INTRO_MS}ms (background music only)")
+    # Same output format as appending to AudioSegment.silent() would give
+    frame_rate = max([SILENCE_FRAME_RATE] + [seg.frame_rate for seg in voice_segs])
+    channels = max([1] + [seg.channels for seg in voice_segs])
+    sample_width = max([2] + [seg.sample_width for seg in voice_segs])
+    buffer = np.zeros(
+        (ms_to_frames(total_ms, frame_rate), channels),
+        dtype=SAMPLE_DTYPES[sample_width],
+    )
 
-    cursor = INTRO_MS
+    logger.info(f"Intro gap: 0ms-{INTRO_MS}ms (background music only)")
 
-    for idx, seg in enumerate(voice_segs):
+    for idx, (seg, start_ms) in enumerate(zip(voice_segs, memo_starts_ms, strict=True)):
         if idx:
-            gap_start = cursor
-            gap_end = cursor + GAP_MS
-            gap_ranges.append((gap_start, gap_end))
-            show += AudioSegment.silent(GAP_MS)
-
+            gap_start, gap_end = gap_ranges[idx]
             logger.info(f"Gap {idx}: {gap_start}ms-{gap_end}ms (background music only)")
 
-            cursor += GAP_MS
+        seg = (
+            seg.set_channels(channels)
+            .set_frame_rate(frame_rate)
+            .set_sample_width(sample_width)
+        )
+        # The crossfade from silence leaves the memo's head faded in
+        head = seg[:CROSSFADE_MS].fade(from_gain=-120, start=0, end=float("inf"))
+        samples = np.frombuffer(
+            head.raw_data + seg[CROSSFADE_MS:].raw_data, dtype=buffer.dtype
+        ).reshape(-1, channels)
 
-        voice_start = cursor
-        voice_end = cursor + len(seg)
-        show = show.append(seg, crossfade=CROSSFADE_MS)
+        start = ms_to_frames(start_ms, frame_rate)
+        end = min(start + len(samples), len(buffer))
+        buffer[start:end] = samples[: end - start]
 
+        voice_start = gap_ranges[idx][1]
         logger.info(
-            f"Voice memo {idx + 1}: {voice_start}ms-{voice_end}ms "
+            f"Voice memo {idx + 1}: {voice_start}ms-{voice_start + len(seg)}ms "
             f"(voice + background music)"
         )
 
-        cursor += len(seg)
-
-    # After last voice memo, add outro
-    gap_start = cursor
-    gap_end = cursor + OUTRO_MS
-    gap_ranges.append((gap_start, gap_end))
-    show += AudioSegment.silent(OUTRO_MS)
-
+    gap_start, gap_end = gap_ranges[-1]
     logger.info(f"Outro gap: {gap_start}ms-{gap_end}ms (background music only)")
 
+    show = AudioSegment(
+        data=buffer.tobytes(),
+        sample_width=sample_width,
+        frame_rate=frame_rate,
+        channels=channels,
+    )
+
     logger.info(
         f"Built voice track: total length {len(show)}ms with "
         f"{len(gap_ranges)} music-only gaps"
@@ -125,23 +461,60 @@ def build_voice_track(
     return show, gap_ranges
 
 
-def load_background_music() -> AudioSegment:
-    """Load and prepare background music."""
+def music_length_needed(voice_track_ms: int) -> int:
+    """Return how much background music an episode of this length needs."""
+    return math.ceil(voice_track_ms * (1 + MUSIC_LENGTH_MARGIN))
+
+
+def select_music_tracks(
+    music_files: List[pathlib.Path], min_length_ms: int
+) -> List[pathlib.Path]:
+    """Pick tracks, in order, until their probed durations cover min_length_ms.
+
+    Durations come from container metadata, so nothing is decoded. A track
+    whose duration cannot be probed is picked but not counted.
+    """
+    selected: List[pathlib.Path] = []
+    covered_ms = 0
+    for f in music_files:
+        if covered_ms >= min_length_ms:
+            break
+        selected.append(f)
+        try:
+            covered_ms += probe_duration_ms(f)
+        except FFmpegError as e:
+            logger.warning(f"Could not probe {f.name}, decoding it anyway: {e}")
+
+    logger.info(
+        f"Selected {len(selected)} of {len(music_files)} background music tracks "
+        f"to cover {min_length_ms}ms"
+    )
+    return selected
+
+
+def load_background_music(
+    min_length_ms: int | None = None,
+    music_files: List[pathlib.Path] | None = None,
+) -> AudioSegment:
+    """Load and prepare background music.
+
+    If min_length_ms is given, only enough tracks to cover it are decoded;
+    otherwise every track is loaded. Shorter music is looped when mixing.
+    music_files sets the playlist order; by default it is shuffled.
+    """
     logger.info("Loading background music...")
-    music_files = [
-        f for f in MUSIC_DIR.iterdir() if f.suffix in [".mp3", ".wav", ".ogg", ".m4a"]
-    ]
-    random.shuffle(music_files)
-    if not music_files:
-        logger.error(f"No background music found in {MUSIC_DIR}")
-        raise NoBackgroundMusicFoundError(f"No background music found in {MUSIC_DIR}")
+    if music_files is None:
+        music_files = list_music_files()
+    if min_length_ms is not None:
+        music_files = select_music_tracks(music_files, min_length_ms)
 
-    bg = AudioSegment.empty()
+    tracks: List[AudioSegment] = []
     cumulative_music_ms = 0
 
     for f in music_files:
-        track = AudioSegment.from_file(str(f))
-        bg += track
+        track, stats = measure_call(decode_segment, f)
+        current_run().add_file(f, stats, duration_ms=len(track))
+        tracks.append(track)
         duration_ms = len(track)
 
         logger.info(
@@ -153,6 +526,9 @@ def load_background_music() -> AudioSegment:
 
         cumulative_music_ms += duration_ms
 
+    # Join everything in one copy instead of re-copying the buffer per track
+    bg = concatenate_segments(tracks)
+
     logger.info(
         f"Total background music: {len(music_files)} tracks, "
         f"combined length: {len(bg)}ms"
@@ -160,11 +536,152 @@ def load_background_music() -> AudioSegment:
     return bg
 
 
+def get_mixer_engine() -> str:
+    """Return the mixing engine selected by the MIXER_ENGINE env var."""
+    engine = os.getenv("MIXER_ENGINE", DEFAULT_MIXER_ENGINE).lower()
+    if engine not in MIXER_ENGINES:
+        raise UnknownMixerEngineError(
+            f"MIXER_ENGINE must be one of {MIXER_ENGINES}, got: {engine}"
+        )
+    return engine
+
+
 def create_final_mix(
     voice_track: AudioSegment, bg_music: AudioSegment, gap_ranges: List[Tuple[int, int]]
+) -> AudioSegment:
+    """Create the final mix with the configured mixing engine."""
+    engine = get_mixer_engine()
+    ducking = get_ducking_settings()
+    if engine == "pydub":
+        if ducking is not None:
+            logger.warning("Voice ducking needs the numpy engine, ducking gaps")
+        return create_final_mix_pydub(voice_track, bg_music, gap_ranges)
+
+    logger.info("Creating final mix (numpy engine)...")
+    logger.info("Final mix timeline summary:")
+    logger.info(f"  - Total track length: {len(voice_track)}ms")
+    logger.info(f"  - Background music length: {len(bg_music)}ms")
+    logger.info(f"  - Music-only gaps: {len(gap_ranges)} segments")
+
+    final_mix = render_final_mix(
+        voice_track,
+        bg_music,
+        gap_ranges,
+        gap_fade_ms=GAP_FADE_MS,
+        music_without_voice_db=MUSIC_WITHOUT_VOICE_DB,
+        music_under_voice_db=MUSIC_UNDER_VOICE_DB,
+        ducking=ducking,
+    )
+
+    logger.info("Final mix created successfully")
+    return final_mix
+
+
+def mixer_settings() -> Dict[str, Any]:
+    """Return the mixer constants a rendered episode depends on."""
+    return {
+        "engine": get_mixer_engine(),
+        "intro_ms": INTRO_MS,
+        "outro_ms": OUTRO_MS,
+        "crossfade_ms": CROSSFADE_MS,
+        "gap_ms": GAP_MS,
+        "voice_fade_ms": VOICE_FADE_MS,
+        "max_length_ms": MAX_LENGTH_MS,
+        "music_under_voice_db": MUSIC_UNDER_VOICE_DB,
+        "music_without_voice_db": MUSIC_WITHOUT_VOICE_DB,
+        "gap_fade_ms": GAP_FADE_MS,
+        "music_length_margin": MUSIC_LENGTH_MARGIN,
+        "voice_target_lufs": get_voice_target_lufs(),
+        "ducking": get_ducking_settings(),
+        "trim": get_trim_settings(),
+    }
+
+
+def create_final_mix_incremental(
+    voice_files: List[pathlib.Path],
+    voice_segs: List[AudioSegment],
+    music: List[Tuple[str, str]],
+    voice_track: AudioSegment,
+    bg_music: AudioSegment,
+    gap_ranges: List[Tuple[int, int]],
+) -> AudioSegment:
+    """Create the final mix, re-rendering only what changed since last run.
+
+    Args:
+        music: (filename, content digest) of the tracks in bg_music, in order
+    """
+    logger.info("Creating final mix (numpy engine, incremental)...")
+    voice, music_samples, frame_rate, sample_width = prepare_mix_inputs(
+        voice_track, bg_music
+    )
+    num_frames = len(voice)
+    ducking = get_ducking_settings()
+    music_gains = None
+    if ducking is not None:
+        music_gains = ducking_gains(
+            voice_activity(voice, frame_rate, ducking["threshold_db"]),
+            frame_rate,
+            ducking,
+            MUSIC_WITHOUT_VOICE_DB,
+            MUSIC_UNDER_VOICE_DB,
+        )
+    manifest = build_manifest(
+        mixer_settings(),
+        [
+            (f.name, file_sha256(f), len(seg))
+            for f, seg in zip(voice_files, voice_segs, strict=True)
+        ],
+        music,
+        frame_rate,
+        max(voice.shape[1], music_samples.shape[1]),
+        sample_width,
+    )
+
+    def render_window(start: int, end: int) -> np.ndarray:
+        return render_mix_window(
+            voice,
+            music_samples,
+            frame_rate,
+            gap_ranges,
+            GAP_FADE_MS,
+            MUSIC_WITHOUT_VOICE_DB,
+            MUSIC_UNDER_VOICE_DB,
+            start_frame=start,
+            end_frame=end,
+            music_gains=music_gains,
+        )
+
+    render_dir = get_render_cache_dir()
+    previous = load_manifest(render_dir)
+    spans = None
+    # A new episode shares nothing with the previous mix, so don't load it
+    if previous is not None and is_same_episode(
+        previous, [f.name for f in voice_files]
+    ):
+        spans = find_dirty_spans(previous, manifest)
+    previous_mix = load_previous_mix(render_dir) if spans is not None else None
+
+    if spans is not None and previous_mix is not None:
+        mixed = splice_render(
+            previous_mix, num_frames, frame_rate, spans, render_window
+        )
+    else:
+        logger.info("No reusable previous render, rendering the whole episode")
+        mixed = render_window(0, num_frames)
+    del previous_mix
+
+    samples = float_to_pcm(mixed, sample_width)
+    save_render(render_dir, manifest, samples)
+
+    logger.info("Final mix created successfully")
+    return array_to_segment(mixed, frame_rate, sample_width)
+
+
+def create_final_mix_pydub(
+    voice_track: AudioSegment, bg_music: AudioSegment, gap_ranges: List[Tuple[int, int]]
 ) -> AudioSegment:
     """Create the final mix by overlaying voice and background music."""
-    logger.info("Creating final mix...")
+    logger.info("Creating final mix (pydub engine)...")
 
     logger.info("Final mix timeline summary:")
     logger.info(f"  - Total track length: {len(voice_track)}ms")
@@ -172,12 +689,14 @@ def create_final_mix(
     logger.info(f"  - Music-only gaps: {len(gap_ranges)} segments")
 
     # If background music is too short, loop it
-    while len(bg_music) < len(voice_track) + len(voice_track) * 0.1:
+    needed_ms = music_length_needed(len(voice_track))
+    if len(bg_music) < needed_ms:
+        repeats = math.ceil(needed_ms / len(bg_music))
         logger.info(
             f"Background music too short "
-            f"({len(bg_music)}ms vs {len(voice_track)}ms), looping..."
+            f"({len(bg_music)}ms vs {len(voice_track)}ms), looping {repeats}x..."
         )
-        bg_music = bg_music + bg_music
+        bg_music = bg_music * repeats
 
     # Start with silent track of correct length
     final_music = AudioSegment.silent(len(voice_track))
@@ -218,34 +737,369 @@ def create_final_mix(
     return final_music
 
 
-def export_mix(final_mix: AudioSegment) -> None:
-    """Export the final mix to an MP3 file."""
+def normalize_master(final_mix: AudioSegment, target_lufs: float) -> AudioSegment:
+    """Bring the final mix to a target integrated loudness.
+
+    The mix is measured straight from its PCM, a chunk at a time, so no
+    float copy of the whole episode is made.
+    """
+    samples = np.frombuffer(
+        final_mix.raw_data, dtype=SAMPLE_DTYPES[final_mix.sample_width]
+    ).reshape(-1, final_mix.channels)
+    full_scale = float(2 ** (8 * final_mix.sample_width - 1))
+    loudness = integrated_loudness(samples, final_mix.frame_rate, full_scale)
+    peak = final_mix.max / full_scale
+    gain_db = loudness_gain_db(loudness, peak, target_lufs, LOUDNESS_CEILING_DBFS)
+    logger.info(
+        f"Master loudness {loudness:.1f} LUFS, applying {gain_db:+.1f}dB "
+        f"for {target_lufs:.1f} LUFS"
+    )
+    return final_mix.apply_gain(gain_db)
+
+
+def export_mix(final_mix: AudioSegment) -> List[pathlib.Path]:
+    """Export the final mix to the configured outputs (an MP3 by default).
+
+    PCM is piped straight into ffmpeg, with one encoder per output running
+    in parallel.
+
+    Returns:
+        The paths of the exported files
+    """
     logger.info("Exporting final mix...")
     PODCAST_OUTPUT_DIR.mkdir(exist_ok=True)
-    with open(PODCAST_OUTPUT_DIR / "voice_memo_mix.mp3", "wb") as out_f:
-        final_mix.export(out_f, format="mp3")
+    outputs = get_export_outputs(PODCAST_OUTPUT_DIR)
+    export_segment(final_mix, outputs)
     logger.info("Voice memo mix exported successfully!")
+    return [output["path"] for output in outputs]
 
 
-def produce_audio_mixed_track() -> None:
-    """Main function to generate the voice memo overlay with background music."""
+def get_render_mode() -> str:
+    """Return the render mode selected by the MIXER_RENDER_MODE env var."""
+    mode = os.getenv("MIXER_RENDER_MODE", DEFAULT_RENDER_MODE).lower()
+    if mode not in RENDER_MODES:
+        raise UnknownRenderModeError(
+            f"MIXER_RENDER_MODE must be one of {RENDER_MODES}, got: {mode}"
+        )
+    return mode
+
+
+def get_float_env(name: str, default: float) -> float:
+    """Read a number setting from an environment variable."""
+    value_str = os.getenv(name, str(default))
+    try:
+        return float(value_str)
+    except ValueError as e:
+        raise ValueError(f"{name} must be a number, got: {value_str}") from e
+
+
+def get_normalize_mode() -> str:
+    """Return the memo normalization selected by the MIXER_NORMALIZE env var."""
+    mode = os.getenv("MIXER_NORMALIZE", DEFAULT_NORMALIZE_MODE).lower()
+    if mode not in NORMALIZE_MODES:
+        raise UnknownNormalizeModeError(
+            f"MIXER_NORMALIZE must be one of {NORMALIZE_MODES}, got: {mode}"
+        )
+    return mode
+
+
+def get_ducking_settings() -> Optional[Dict[str, float]]:
+    """Return the voice ducking settings, or None when ducking the gaps.
+
+    Selected by MIXER_DUCKING and tuned by MIXER_DUCK_THRESHOLD_DB,
+    MIXER_DUCK_ATTACK_MS, MIXER_DUCK_RELEASE_MS and MIXER_DUCK_HOLD_MS.
+    """
+    mode = os.getenv("MIXER_DUCKING", DEFAULT_DUCKING_MODE).lower()
+    if mode not in DUCKING_MODES:
+        raise UnknownDuckingModeError(
+            f"MIXER_DUCKING must be one of {DUCKING_MODES}, got: {mode}"
+        )
+    if mode == "gaps":
+        return None
+    return {
+        "threshold_db": get_float_env(
+            "MIXER_DUCK_THRESHOLD_DB", DEFAULT_DUCK_THRESHOLD_DB
+        ),
+        "attack_ms": get_positive_int_env(
+            "MIXER_DUCK_ATTACK_MS", DEFAULT_DUCK_ATTACK_MS
+        ),
+        "release_ms": get_positive_int_env(
+            "MIXER_DUCK_RELEASE_MS", DEFAULT_DUCK_RELEASE_MS
+        ),
+        "hold_ms": get_positive_int_env("MIXER_DUCK_HOLD_MS", DEFAULT_DUCK_HOLD_MS),
+    }
+
+
+def get_trim_settings() -> Optional[Dict[str, Any]]:
+    """Return the silence trimming settings, or None if memos are kept whole.
+
+    Enabled by MIXER_TRIM_SILENCE=1 and tuned by MIXER_TRIM_THRESHOLD_DB,
+    MIXER_TRIM_PAD_MS and MIXER_TRIM_MAX_PAUSE_MS (unset keeps pauses inside
+    memos as they are).
+    """
+    if os.getenv("MIXER_TRIM_SILENCE", "0") == "0":
+        return None
+    max_pause_ms = None
+    if os.getenv("MIXER_TRIM_MAX_PAUSE_MS"):
+        max_pause_ms = get_positive_int_env("MIXER_TRIM_MAX_PAUSE_MS", 0)
+    return {
+        "threshold_db": get_float_env(
+            "MIXER_TRIM_THRESHOLD_DB", DEFAULT_TRIM_THRESHOLD_DB
+        ),
+        # 0 trims right up to the speech
+        "pad_ms": get_non_negative_int_env("MIXER_TRIM_PAD_MS", DEFAULT_TRIM_PAD_MS),
+        "max_pause_ms": max_pause_ms,
+    }
+
+
+def get_voice_target_lufs() -> Optional[float]:
+    """Return the memo loudness target, or None if memos are peak-normalized."""
+    if get_normalize_mode() != "loudness":
+        return None
+    return get_float_env("MIXER_VOICE_TARGET_LUFS", DEFAULT_VOICE_TARGET_LUFS)
+
+
+def get_master_target_lufs() -> Optional[float]:
+    """Return the final mix loudness target, or None if it is left as mixed."""
+    if get_normalize_mode() != "loudness":
+        return None
+    return get_float_env("MIXER_MASTER_TARGET_LUFS", DEFAULT_MASTER_TARGET_LUFS)
+
+
+def get_block_ms() -> int:
+    """Return the streaming block length from the MIXER_BLOCK_MS env var."""
+    return get_positive_int_env("MIXER_BLOCK_MS", DEFAULT_BLOCK_MS)
+
+
+def get_decode_workers() -> int:
+    """Return the number of voice memo decode processes (MIXER_DECODE_WORKERS)."""
+    return get_positive_int_env("MIXER_DECODE_WORKERS", DEFAULT_DECODE_WORKERS)
+
+
+def stream_sidecar(
+    metadata: Optional[Dict[str, Any]], frame_rate: int, channels: int
+) -> Optional[Dict[str, Any]]:
+    """Return a memo's sidecar if its peak and loudness hold for the stream.
+
+    Resampling or remixing channels can move the peak, so the sidecar only
+    applies when the memo is already in the streaming format.
+    """
+    if metadata is None:
+        return None
+    if (metadata["sample_rate"], metadata["channels"]) != (frame_rate, channels):
+        return None
+    return metadata
+
+
+def produce_audio_mixed_track_streaming() -> None:
+    """Render the episode block by block with bounded memory."""
+    logger.info("Starting streaming voice memo overlay generation...")
+    report = current_run()
+    frame_rate = STREAM_FRAME_RATE
+    channels = STREAM_CHANNELS
+    block_frames = ms_to_frames(get_block_ms(), frame_rate)
+
+    voice_files = list_voice_files()
+    music_files = list_music_files()
+    metadata = read_voice_metadata(voice_files)
+    target_lufs = get_voice_target_lufs()
+    ducking = get_ducking_settings()
+    trim = get_trim_settings()
+    if get_master_target_lufs() is not None:
+        logger.warning(
+            "The streaming render can't measure the mix before encoding it; "
+            "only memos are loudness-normalized"
+        )
+
+    # Step 1: With sidecars for every memo, plan before decoding anything
+    # (unless trimming silence, which changes the durations)
+    plan = None
+    planned_ms = planned_durations_ms(metadata) if trim is None else None
+    if planned_ms is not None:
+        with report.stage("plan_voice_track"):
+            plan = log_planned_timeline(voice_files, planned_ms)
+
+    with tempfile.TemporaryDirectory(prefix="wafflebot-stems-") as stem_dir:
+        # Step 2: Decode memos one at a time and spill the processed stems
+        stems = []
+        activities = []
+        with report.stage("load_voice_memos"):
+            for idx, (f, memo_metadata) in enumerate(
+                zip(voice_files, metadata, strict=True)
+            ):
+                logger.info(f"Loading voice memo: {f.name}")
+                samples, stats = measure_call(decode_array, f, frame_rate, channels)
+                sidecar = stream_sidecar(memo_metadata, frame_rate, channels) or {}
+                stem = prepare_voice_stem(
+                    samples,
+                    frame_rate,
+                    MAX_LENGTH_MS,
+                    VOICE_FADE_MS,
+                    CROSSFADE_MS,
+                    sidecar.get("peak"),
+                    target_lufs,
+                    sidecar.get("integrated_loudness"),
+                    trim,
+                )
+                stem_path = pathlib.Path(stem_dir) / f"{idx:05d}.npy"
+                stems.append(spill_stem(stem, stem_path))
+                if ducking is not None:
+                    activities.append(
+                        voice_activity(stem, frame_rate, ducking["threshold_db"])
+                    )
+                report.add_file(
+                    f, stats, duration_ms=frames_to_ms(len(stem), frame_rate)
+                )
+                del samples, stem
+
+        # Without sidecars (or if resampling changed a length), plan now
+        durations_ms = [frames_to_ms(len(stem), frame_rate) for stem in stems]
+        if durations_ms != planned_ms:
+            if planned_ms is not None:
+                logger.info("Decoded memo lengths differ from sidecars, replanning")
+            with report.stage("plan_voice_track"):
+                plan = log_planned_timeline(voice_files, durations_ms)
+        assert plan is not None
+        memo_starts_ms, gap_ranges, total_ms = plan
+        total_frames = ms_to_frames(total_ms, frame_rate)
+        stem_starts = [
+            ms_to_frames(start_ms, frame_rate) for start_ms in memo_starts_ms
+        ]
+        music_gains = None
+        if ducking is not None:
+            music_gains = ducking_gains(
+                place_voice_activity(activities, stem_starts, total_frames, frame_rate),
+                frame_rate,
+                ducking,
+                MUSIC_WITHOUT_VOICE_DB,
+                MUSIC_UNDER_VOICE_DB,
+            )
+
+        # Step 3: Mix block by block and feed the encoder
+        with report.stage("mix_and_export"):
+            music = MusicStream(music_files, frame_rate, channels, block_frames)
+            blocks = render_blocks(
+                stems,
+                stem_starts,
+                music,
+                gap_ranges,
+                total_frames,
+                frame_rate,
+                channels,
+                block_frames,
+                GAP_FADE_MS,
+                MUSIC_WITHOUT_VOICE_DB,
+                MUSIC_UNDER_VOICE_DB,
+                music_gains,
+            )
+            PODCAST_OUTPUT_DIR.mkdir(exist_ok=True)
+            outputs = get_export_outputs(PODCAST_OUTPUT_DIR)
+            encoded_frames = encode_blocks(blocks, outputs, frame_rate, channels)
+
+    encoded_ms = frames_to_ms(encoded_frames, frame_rate)
+    report.set_output([output["path"] for output in outputs], encoded_ms)
+    logger.info(
+        f"Voice memo mix streamed successfully! "
+        f"({encoded_ms}ms to {outputs[0]['path']})"
+    )
+
+
+def produce_audio_mixed_track_memory() -> None:
+    """Render the whole episode in memory."""
     logger.info("Starting voice memo overlay generation...")
+    report = current_run()
+    incremental = is_incremental_enabled() and get_mixer_engine() == "numpy"
 
     # Step 1: Load voice memos
-    voice_segs = load_voice_memos()
+    with report.stage("load_voice_memos"):
+        voice_segs = load_voice_memos()
 
     # Step 2: Build voice track
-    voice_track, gap_ranges = build_voice_track(voice_segs)
+    with report.stage("build_voice_track"):
+        voice_track, gap_ranges = build_voice_track(voice_segs)
+
+    # Step 3: Load just enough background music to cover the voice track
+    with report.stage("load_background_music"):
+        music_ms = music_length_needed(len(voice_track))
+        if incremental:
+            # Re-rendering the same episode keeps the previous playlist order,
+            # so unchanged spans can be reused
+            music = [(f.name, file_sha256(f)) for f in list_music_files()]
+            order = reuse_music_order(
+                music,
+                [f.name for f in list_voice_files()],
+                load_manifest(get_render_cache_dir()),
+            )
+            music = sorted(music, key=lambda track: order.index(track[0]))
+            music_files = select_music_tracks(
+                [MUSIC_DIR / name for name, _ in music], music_ms
+            )
+            bg_music = load_background_music(music_files=music_files)
+        else:
+            bg_music = load_background_music(music_ms)
+
+    # Step 4: Create final mix, re-rendering only the changed spans if possible
+    with report.stage("create_final_mix"):
+        if incremental:
+            final_mix = create_final_mix_incremental(
+                list_voice_files(), voice_segs, music, voice_track, bg_music, gap_ranges
+            )
+        else:
+            final_mix = create_final_mix(voice_track, bg_music, gap_ranges)
+
+    # Step 5: Bring the episode to the target loudness
+    master_target_lufs = get_master_target_lufs()
+    if master_target_lufs is not None:
+        with report.stage("normalize_master"):
+            final_mix = normalize_master(final_mix, master_target_lufs)
+
+    # Step 6: Export the mix
+    with report.stage("export_mix"):
+        output_paths = export_mix(final_mix)
+    report.set_output(output_paths, len(final_mix))
+
 
-    # Step 3: Load background music
-    bg_music = load_background_music()
+def produce_audio_mixed_track() -> None:
+    """Main function to generate the voice memo overlay with background music.
+
+    Every run, successful or not, leaves a JSON run report with per-stage and
+    per-file timings next to the episode.
+    """
+    report = start_run(
+        render_mode=os.getenv("MIXER_RENDER_MODE", DEFAULT_RENDER_MODE),
+        engine=os.getenv("MIXER_ENGINE", DEFAULT_MIXER_ENGINE),
+    )
+    try:
+        if get_render_mode() == "streaming":
+            produce_audio_mixed_track_streaming()
+        else:
+            produce_audio_mixed_track_memory()
+        report.status = "ok"
+    except BaseException as e:
+        report.status = "failed"
+        report.error = repr(e)
+        raise
+    finally:
+        report.write(PODCAST_OUTPUT_DIR / RUN_REPORT_NAME)
 
-    # Step 4: Create final mix
-    final_mix = create_final_mix(voice_track, bg_music, gap_ranges)
 
-    # Step 5: Export the mix
-    export_mix(final_mix)
+def is_watch_enabled() -> bool:
+    """Return whether the mixer should keep running and watch for new audio."""
+    return os.getenv("MIXER_WATCH", "0") != "0"
+
+
+def main() -> None:
+    if not is_watch_enabled():
+        produce_audio_mixed_track()
+        return
+    watch_for_new_audio(
+        produce_audio_mixed_track,
+        PODCAST_OUTPUT_DIR / RUN_REPORT_NAME,
+        get_new_audio_flag(VOICE_DIR),
+        poll_s=get_positive_int_env("MIXER_WATCH_POLL_S", DEFAULT_POLL_S),
+        settle_s=get_positive_int_env("MIXER_WATCH_SETTLE_S", DEFAULT_SETTLE_S),
+    )
 
 
 if __name__ == "__main__":
-    produce_audio_mixed_track()
+    main()
@@ -0,0 +1,267 @@
+"""Incremental episode rendering.
+
+After a render, the mixer keeps the final mix and a manifest describing
+what went into it: the mixer settings, the background music playlist and
+each memo's content hash and duration. On the next run, only the timeline
+spans affected by changed memos are mixed again and spliced into the
+previous mix, e.g. when a single memo is re-downloaded after a 🔁 reaction.
+"""
+
+import json
+import os
+import pathlib
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.mixer.engine import ACTIVITY_HOP_MS, fit_to_length, ms_to_frames
+from src.mixer.timeline import plan_voice_track
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+RENDER_CACHE_DIR = pathlib.Path("data/mixer-cache/render")
+MANIFEST_VERSION = 1
+SPAN_PADDING_MS = 1  # covers ms-to-frame rounding at span edges
+
+# Manifest fields that must match for the previous mix to be reusable
+REUSABLE_FIELDS = ("version", "settings", "music", "format")
+
+
+def is_incremental_enabled() -> bool:
+    """Return whether incremental rendering is on (MIXER_INCREMENTAL, opt-in).
+
+    It hashes every input and keeps a copy of the whole mix, which only
+    pays off when episodes are re-rendered, e.g. after a 🔁 re-download.
+    """
+    return os.getenv("MIXER_INCREMENTAL", "0") == "1"
+
+
+def get_render_cache_dir() -> pathlib.Path:
+    """Return where the previous mix and its manifest are kept."""
+    return pathlib.Path(os.getenv("MIXER_RENDER_CACHE_DIR", str(RENDER_CACHE_DIR)))
+
+
+def build_manifest(
+    settings: Dict[str, Any],
+    memos: Sequence[Tuple[str, str, int]],
+    music: Sequence[Tuple[str, str]],
+    frame_rate: int,
+    channels: int,
+    sample_width: int,
+) -> Dict[str, Any]:
+    """Describe a render.
+
+    Args:
+        settings: Mixer constants the render depends on
+        memos: (filename, content digest, processed duration ms) per memo
+        music: (filename, content digest) per track, in playlist order
+    """
+    return {
+        "version": MANIFEST_VERSION,
+        "settings": settings,
+        "music": [list(track) for track in music],
+        "memos": [list(memo) for memo in memos],
+        "format": {
+            "frame_rate": frame_rate,
+            "channels": channels,
+            "sample_width": sample_width,
+        },
+    }
+
+
+def load_manifest(render_dir: pathlib.Path) -> Optional[Dict[str, Any]]:
+    """Load the manifest of the previous render, if there is one."""
+    try:
+        with open(render_dir / "manifest.json", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError as e:
+        logger.warning(f"Ignoring unreadable render manifest: {e}")
+        return None
+
+
+def load_previous_mix(render_dir: pathlib.Path) -> Optional[np.ndarray]:
+    """Memory-map the samples of the previous render, if present."""
+    try:
+        return np.load(render_dir / "mix.npy", mmap_mode="r")
+    except FileNotFoundError:
+        return None
+
+
+def save_render(
+    render_dir: pathlib.Path, manifest: Dict[str, Any], samples: np.ndarray
+) -> None:
+    """Store a render's samples and manifest for the next run.
+
+    The manifest is written last, so an interrupted save is never reused.
+    """
+    render_dir.mkdir(parents=True, exist_ok=True)
+    (render_dir / "manifest.json").unlink(missing_ok=True)
+
+    # Replace rather than overwrite: the old mix may still be memory-mapped
+    fd, tmp_name = tempfile.mkstemp(dir=render_dir, suffix=".npy")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, samples)
+    os.replace(tmp_name, render_dir / "mix.npy")
+
+    fd, tmp_name = tempfile.mkstemp(dir=render_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_name, render_dir / "manifest.json")
+
+
+def is_same_episode(previous: Dict[str, Any], memos: Sequence[str]) -> bool:
+    """Return whether a render shares memos with the previous one.
+
+    Args:
+        memos: Filenames of the episode's voice memos
+    """
+    previous_memos = {filename for filename, _, _ in previous["memos"]}
+    return not previous_memos.isdisjoint(memos)
+
+
+def reuse_music_order(
+    music: Sequence[Tuple[str, str]],
+    memos: Sequence[str],
+    previous: Optional[Dict[str, Any]],
+) -> List[str]:
+    """Return the playlist order to use, keeping the previous one if possible.
+
+    The music under any point of the episode only stays the same if the
+    playlist order does, so a re-render of the same episode (one sharing
+    memos with the previous render) keeps the previous shuffle as long as
+    the set of tracks is unchanged. A new episode gets the given order,
+    i.e. a fresh shuffle.
+
+    Args:
+        music: (filename, content digest) of the tracks, in shuffled order
+        memos: Filenames of the episode's voice memos
+        previous: The manifest of the previous render, if any
+    """
+    names = [name for name, _ in music]
+    if previous is None or not is_same_episode(previous, memos):
+        return names
+    previous_music = [tuple(track) for track in previous["music"]]
+    if sorted(previous_music) != sorted(tuple(track) for track in music):
+        return names
+    return [name for name, _ in previous_music]
+
+
+def ducking_margin_ms(ducking: Optional[Dict[str, Any]]) -> int:
+    """Return how far a change in voice can move the ducked music around it.
+
+    A pause shorter than hold_ms is bridged, and the music ramps down over
+    attack_ms before voice and back up over release_ms after it, so a
+    change reaches at most hold + attack + release ms either way, plus a
+    hop of gain interpolation.
+    """
+    if not ducking:
+        return 0
+    return (
+        ducking["attack_ms"]
+        + ducking["release_ms"]
+        + ducking["hold_ms"]
+        + ACTIVITY_HOP_MS
+    )
+
+
+def find_dirty_spans(
+    previous: Dict[str, Any], current: Dict[str, Any]
+) -> Optional[List[Tuple[int, int]]]:
+    """Work out which parts of the timeline differ from the previous render.
+
+    Returns:
+        Spans (start ms, end ms) to re-render, or None if the previous mix
+        cannot be reused at all
+    """
+    if any(previous.get(field) != current[field] for field in REUSABLE_FIELDS):
+        return None
+
+    settings = current["settings"]
+    old_memos = previous["memos"]
+    new_memos = current["memos"]
+
+    def layout(memos):
+        return plan_voice_track(
+            [duration_ms for _, _, duration_ms in memos],
+            settings["intro_ms"],
+            settings["gap_ms"],
+            settings["outro_ms"],
+            settings["crossfade_ms"],
+        )
+
+    old_starts, old_gaps, _ = layout(old_memos)
+    new_starts, new_gaps, new_total = layout(new_memos)
+    margin_ms = ducking_margin_ms(settings.get("ducking"))
+    old_keys = [(digest, duration_ms) for _, digest, duration_ms in old_memos]
+    new_keys = [(digest, duration_ms) for _, digest, duration_ms in new_memos]
+
+    if [d for _, d in old_keys] == [d for _, d in new_keys]:
+        # Same layout: only the changed memos' own spans differ
+        return [
+            (max(0, start_ms - margin_ms), start_ms + duration_ms + margin_ms)
+            for start_ms, (old_digest, _), (new_digest, duration_ms) in zip(
+                new_starts, old_keys, new_keys, strict=True
+            )
+            if old_digest != new_digest
+        ]
+
+    # The layout shifted: everything from the first change onwards differs
+    first_change = next(
+        (
+            idx
+            for idx, (old_key, new_key) in enumerate(
+                zip(old_keys, new_keys, strict=False)
+            )
+            if old_key != new_key
+        ),
+        min(len(old_keys), len(new_keys)),
+    )
+    candidates = [old_gaps[first_change][0], new_gaps[first_change][0]]
+    candidates += [
+        starts[first_change]
+        for starts in (old_starts, new_starts)
+        if first_change < len(starts)
+    ]
+    start_ms = max(0, min(candidates) - max(settings["gap_fade_ms"], margin_ms))
+    return [(start_ms, new_total)]
+
+
+def splice_render(
+    previous_mix: np.ndarray,
+    num_frames: int,
+    frame_rate: int,
+    spans_ms: List[Tuple[int, int]],
+    render_window: Callable[[int, int], np.ndarray],
+) -> np.ndarray:
+    """Re-render only the given spans on top of the previous mix.
+
+    Args:
+        previous_mix: Integer samples of the previous render
+        num_frames: Length of the new mix in frames
+        render_window: Renders frames [start, end) of the new mix as floats
+
+    Returns:
+        The new mix as float samples
+    """
+    scale = float(2 ** (8 * previous_mix.dtype.itemsize - 1))
+    mixed = fit_to_length(
+        np.asarray(previous_mix, dtype=np.float32) / scale, num_frames
+    )
+
+    rendered_frames = 0
+    for start_ms, end_ms in spans_ms:
+        start = max(0, ms_to_frames(start_ms - SPAN_PADDING_MS, frame_rate))
+        end = min(num_frames, ms_to_frames(end_ms + SPAN_PADDING_MS, frame_rate))
+        if end > start:
+            mixed[start:end] = render_window(start, end)
+            rendered_frames += end - start
+
+    logger.info(
+        f"Incremental render: re-mixed {rendered_frames} of {num_frames} frames "
+        f"in {len(spans_ms)} span(s)"
+    )
+    return mixed
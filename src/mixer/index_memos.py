@@ -0,0 +1,65 @@
+"""Write duration and loudness sidecars for voice memos.
+
+Indexes every memo in the voice directory (MIXER_VOICE_DIR, or the
+directories given on the command line) that has no current sidecar, e.g.
+memos downloaded before ingest indexing was turned on:
+
+    python src/mixer/index_memos.py [--force] [directory ...]
+"""
+
+import argparse
+import pathlib
+import sys
+from typing import List, Optional
+
+from src.mixer.generate_audio import VOICE_DIR, VOICE_EXTENSIONS
+from src.utils.audio_metadata import index_file, read_sidecar
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def index_directory(directory: pathlib.Path, force: bool = False) -> int:
+    """Write sidecars for the memos of a directory that lack a current one.
+
+    Args:
+        directory: The directory whose memos to index
+        force: Re-index memos whose sidecar is still current
+
+    Returns:
+        The number of memos indexed
+    """
+    indexed = 0
+    for path in sorted(directory.iterdir()):
+        if path.suffix not in VOICE_EXTENSIONS:
+            continue
+        if not force and read_sidecar(path) is not None:
+            continue
+        try:
+            metadata = index_file(path)
+        except Exception:
+            logger.exception(f"Failed to index {path.name}")
+            continue
+        logger.info(
+            f"Indexed {path.name}: {metadata['duration_ms']}ms, "
+            f"peak {metadata['peak_dbfs']:.1f}dBFS, "
+            f"loudness {metadata['integrated_loudness']:.1f} LUFS"
+        )
+        indexed += 1
+    return indexed
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directories", nargs="*", type=pathlib.Path)
+    parser.add_argument(
+        "--force", action="store_true", help="re-index memos with a current sidecar"
+    )
+    args = parser.parse_args(argv)
+    for directory in args.directories or [VOICE_DIR]:
+        indexed = index_directory(directory, args.force)
+        logger.info(f"Indexed {indexed} voice memos in {directory}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
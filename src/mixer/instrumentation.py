@@ -0,0 +1,202 @@
+"""Timing and memory instrumentation for mixer runs.
+
+A run report records, for each pipeline stage and each input file, the
+wall time, CPU time and peak RSS, plus counters such as how many bytes
+were decoded or served from cache. It is written as JSON next to the
+episode so nightly runs can be compared for regressions.
+
+Peak RSS comes from ``getrusage``, which only exposes a process's
+high-water mark: a stage's value is the highest RSS reached by the end of
+that stage, and a file's value is that of the process that decoded it.
+"""
+
+import collections
+import contextlib
+import datetime
+import json
+import os
+import pathlib
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Process-wide counters, e.g. decoded_bytes; stages record their deltas
+COUNTERS: collections.Counter = collections.Counter()
+
+
+def count(name: str, amount: int) -> None:
+    """Add to a process-wide counter."""
+    COUNTERS[name] += amount
+
+
+def peak_rss_bytes(who: int = resource.RUSAGE_SELF) -> int:
+    """Return the peak resident set size of this process (or its children)."""
+    max_rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def cpu_seconds(include_children: bool = True) -> float:
+    """Return CPU time used so far, optionally including reaped children."""
+    times = os.times()
+    total = times.user + times.system
+    if include_children:
+        total += times.children_user + times.children_system
+    return total
+
+
+def counter_delta(before: Dict[str, int]) -> Dict[str, int]:
+    """Return how much each counter grew since a snapshot."""
+    return {
+        name: value - before.get(name, 0)
+        for name, value in COUNTERS.items()
+        if value != before.get(name, 0)
+    }
+
+
+def measure_call(func: Callable[..., Any], *args: Any) -> Tuple[Any, Dict[str, Any]]:
+    """Call a function and measure it; safe to run in a worker process.
+
+    Returns:
+        A tuple of (result, stats), where stats holds wall and CPU time,
+        the process's peak RSS and the counters the call incremented
+    """
+    counters_before = dict(COUNTERS)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = func(*args)
+    stats = {
+        "wall_s": time.perf_counter() - wall_start,
+        "cpu_s": time.process_time() - cpu_start,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "counters": counter_delta(counters_before),
+        "pid": os.getpid(),
+    }
+    return result, stats
+
+
+class RunReport:
+    """Collects per-stage and per-file measurements for one mixer run."""
+
+    def __init__(self, **metadata: Any):
+        self.metadata = metadata
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.stages: List[Dict[str, Any]] = []
+        self.files: List[Dict[str, Any]] = []
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.output: Dict[str, Any] = {}
+        self._wall_start = time.perf_counter()
+        self._cpu_start = cpu_seconds()
+        self._current_stage: Optional[Dict[str, Any]] = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Measure a pipeline stage."""
+        record: Dict[str, Any] = {"name": name, "counters": {}}
+        self.stages.append(record)
+        self._current_stage = record
+        counters_before = dict(COUNTERS)
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        try:
+            yield record
+        finally:
+            record["wall_s"] = time.perf_counter() - wall_start
+            # Includes worker processes reaped during the stage
+            record["cpu_s"] = cpu_seconds() - cpu_start
+            record["peak_rss_bytes"] = peak_rss_bytes()
+            record["children_peak_rss_bytes"] = peak_rss_bytes(resource.RUSAGE_CHILDREN)
+            merged = collections.Counter(record["counters"])
+            merged.update(counter_delta(counters_before))
+            record["counters"] = dict(merged)
+            self._current_stage = None
+            logger.info(
+                f"Stage {name}: {record['wall_s']:.3f}s wall, "
+                f"{record['cpu_s']:.3f}s CPU, "
+                f"peak RSS {record['peak_rss_bytes'] // (1024 * 1024)}MB"
+            )
+
+    def add_file(self, path: pathlib.Path, stats: Dict[str, Any], **extra: Any) -> None:
+        """Record the measurements of one input file in the current stage."""
+        stage_name = self._current_stage["name"] if self._current_stage else None
+        self.files.append(
+            {
+                "stage": stage_name,
+                "name": path.name,
+                **{key: value for key, value in stats.items() if key != "pid"},
+                **extra,
+            }
+        )
+        # Counters of work done in worker processes never reach COUNTERS here
+        if self._current_stage is not None and stats["pid"] != os.getpid():
+            merged = collections.Counter(self._current_stage["counters"])
+            merged.update(stats["counters"])
+            self._current_stage["counters"] = dict(merged)
+
+    def set_output(self, paths: List[pathlib.Path], duration_ms: int) -> None:
+        """Record the files the run produced and the episode length."""
+        self.output = {
+            "duration_ms": duration_ms,
+            "files": [
+                {"path": str(path), "size_bytes": path.stat().st_size} for path in paths
+            ],
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the report as JSON-serializable data."""
+        counters: collections.Counter = collections.Counter()
+        for stage in self.stages:
+            counters.update(stage["counters"])
+        wall_s = time.perf_counter() - self._wall_start
+        audio_ms = self.output.get("duration_ms")
+        return {
+            **self.metadata,
+            "status": self.status,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "total": {
+                "wall_s": wall_s,
+                "cpu_s": cpu_seconds() - self._cpu_start,
+                "peak_rss_bytes": peak_rss_bytes(),
+                "children_peak_rss_bytes": peak_rss_bytes(resource.RUSAGE_CHILDREN),
+                "audio_s_per_wall_s": (
+                    audio_ms / 1000 / wall_s if audio_ms and wall_s else None
+                ),
+            },
+            "counters": dict(counters),
+            "output": self.output,
+            "stages": self.stages,
+            "files": self.files,
+        }
+
+    def write(self, path: pathlib.Path) -> None:
+        """Write the report as JSON, atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        os.replace(tmp_name, path)
+        logger.info(f"Run report written to {path}")
+
+
+# The report of the run in progress; a throwaway one outside of runs
+_current_run = RunReport()
+
+
+def start_run(**metadata: Any) -> RunReport:
+    """Begin a new run report and make it the current one."""
+    global _current_run
+    _current_run = RunReport(**metadata)
+    return _current_run
+
+
+def current_run() -> RunReport:
+    """Return the report of the run in progress."""
+    return _current_run
@@ -0,0 +1,270 @@
+"""Streaming render mode for the mixer.
+
+Walks the episode timeline in fixed-size blocks instead of holding every
+memo, the looped music and the final mix in memory at once. Processed memos
+are spilled to disk and memory-mapped, music is decoded lazily through an
+ffmpeg pipe, and each mixed block goes straight to the encoder, so peak
+memory stays flat however long the episode is.
+"""
+
+import pathlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.mixer.engine import (
+    build_music_envelope,
+    db_to_gain,
+    ducking_envelope,
+    fade_envelope,
+    mix_arrays,
+    ms_to_frames,
+    silence_trim_mask,
+)
+from src.mixer.export import encode_pcm
+from src.mixer.ffmpeg import PCM_DTYPE, PCM_FORMAT, iter_decoded_blocks
+from src.mixer.instrumentation import count
+from src.utils.logging import setup_logger
+from src.utils.loudness import integrated_loudness, loudness_gain_db
+
+logger = setup_logger(__name__)
+
+NORMALIZE_HEADROOM_DB = 0.1  # same headroom as pydub.effects.normalize
+LOUDNESS_CEILING_DBFS = -1.0  # highest sample peak loudness normalization allows
+
+
+class MusicStreamExhaustedError(Exception):
+    """Exception raised when the music playlist yields no audio at all."""
+
+
+def frames_to_ms(num_frames: int, frame_rate: int) -> int:
+    """Convert a frame count to milliseconds, rounding like ``len(segment)``."""
+    return round(num_frames * 1000 / frame_rate)
+
+
+def peak_normalize(
+    samples: np.ndarray,
+    headroom_db: float = NORMALIZE_HEADROOM_DB,
+    peak: Optional[float] = None,
+) -> np.ndarray:
+    """Scale samples so the peak sits ``headroom_db`` below full scale.
+
+    Args:
+        peak: The known peak of the samples (e.g. from a sidecar), which
+            saves scanning them for it
+    """
+    if peak is None:
+        peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    if peak == 0.0:
+        return samples
+    return samples * np.float32(db_to_gain(-headroom_db) / peak)
+
+
+def loudness_normalize(
+    samples: np.ndarray,
+    frame_rate: int,
+    target_lufs: float,
+    loudness: Optional[float] = None,
+    peak: Optional[float] = None,
+) -> np.ndarray:
+    """Scale samples to a target integrated loudness.
+
+    The sample peak is kept at or below LOUDNESS_CEILING_DBFS.
+
+    Args:
+        loudness: The known integrated loudness of the samples in LUFS
+        peak: The known peak of the samples
+    """
+    if loudness is None:
+        loudness = integrated_loudness(samples, frame_rate)
+    if peak is None:
+        peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    gain_db = loudness_gain_db(loudness, peak, target_lufs, LOUDNESS_CEILING_DBFS)
+    return samples * np.float32(db_to_gain(gain_db))
+
+
+def prepare_voice_stem(
+    samples: np.ndarray,
+    frame_rate: int,
+    max_length_ms: int,
+    voice_fade_ms: int,
+    crossfade_ms: int,
+    peak: Optional[float] = None,
+    target_lufs: Optional[float] = None,
+    loudness: Optional[float] = None,
+    trim: Optional[Dict[str, Any]] = None,
+) -> np.ndarray:
+    """Trim, truncate, normalize and fade a decoded memo, ready to be placed.
+
+    Applies the same processing as ``load_voice_memos`` plus the fade-in
+    that ``build_voice_track``'s crossfade puts on the start of each memo.
+
+    Args:
+        peak: The memo's peak, if known for the (untruncated) samples
+        target_lufs: Normalize to this integrated loudness instead of
+            peak-normalizing
+        loudness: The memo's integrated loudness, if known for the
+            (untruncated) samples
+        trim: Silence trimming settings (see ``silence_trim_mask``)
+    """
+    if trim is not None:
+        keep = silence_trim_mask(samples, frame_rate, trim)
+        trimmed_frames = len(samples) - int(np.count_nonzero(keep))
+        if trimmed_frames:
+            samples = np.compress(keep, samples, axis=0)
+            peak, loudness = None, None
+            count("trimmed_ms", frames_to_ms(trimmed_frames, frame_rate))
+    max_frames = ms_to_frames(max_length_ms, frame_rate)
+    if len(samples) > max_frames:
+        samples, peak, loudness = samples[:max_frames], None, None
+    if target_lufs is None:
+        samples = peak_normalize(samples, peak=peak)
+    else:
+        samples = loudness_normalize(samples, frame_rate, target_lufs, loudness, peak)
+    length = len(samples)
+    voice_fade_frames = ms_to_frames(voice_fade_ms, frame_rate)
+    envelope = fade_envelope(length, voice_fade_frames, voice_fade_frames)
+    envelope *= fade_envelope(length, ms_to_frames(crossfade_ms, frame_rate), 0)
+    return samples * envelope[:, np.newaxis]
+
+
+def spill_stem(samples: np.ndarray, path: pathlib.Path) -> np.ndarray:
+    """Write a stem to disk and return it as a read-only memory map."""
+    np.save(path, np.ascontiguousarray(samples, dtype=np.float32))
+    return np.load(path, mmap_mode="r")
+
+
+class MusicStream:
+    """Endless, lazily decoded background music.
+
+    Plays the files in order and starts over from the first one when the
+    playlist runs out, the same order the in-memory path loops them in.
+    """
+
+    def __init__(
+        self,
+        music_files: Sequence[pathlib.Path],
+        frame_rate: int,
+        channels: int,
+        block_frames: int,
+    ):
+        self._music_files = list(music_files)
+        self._frame_rate = frame_rate
+        self._channels = channels
+        self._block_frames = block_frames
+        self._blocks = self._iter_blocks()
+        self._pending = np.zeros((0, channels), dtype=np.float32)
+
+    def _iter_blocks(self) -> Iterator[np.ndarray]:
+        while True:
+            frames_this_cycle = 0
+            for path in self._music_files:
+                logger.info(f"Streaming background music: {path.name}")
+                for block in iter_decoded_blocks(
+                    path, self._frame_rate, self._channels, self._block_frames
+                ):
+                    frames_this_cycle += len(block)
+                    count("decoded_bytes", block.nbytes)
+                    yield block
+            if not frames_this_cycle:
+                raise MusicStreamExhaustedError("Background music contains no audio")
+            logger.info("Background music playlist finished, looping...")
+
+    def read(self, num_frames: int) -> np.ndarray:
+        """Return the next num_frames frames of music."""
+        parts = [self._pending]
+        available = len(self._pending)
+        while available < num_frames:
+            block = next(self._blocks)
+            parts.append(block)
+            available += len(block)
+        buffered = np.concatenate(parts) if len(parts) > 1 else self._pending
+        self._pending = buffered[num_frames:]
+        return buffered[:num_frames]
+
+
+def render_blocks(
+    stems: Sequence[np.ndarray],
+    stem_starts: Sequence[int],
+    music: MusicStream,
+    gap_ranges: List[Tuple[int, int]],
+    total_frames: int,
+    frame_rate: int,
+    channels: int,
+    block_frames: int,
+    gap_fade_ms: int,
+    music_without_voice_db: float,
+    music_under_voice_db: float,
+    music_gains: Optional[np.ndarray] = None,
+) -> Iterator[np.ndarray]:
+    """Mix the episode one block at a time.
+
+    Args:
+        stems: Processed memos, shape (frames, channels)
+        stem_starts: Frame at which each stem starts in the episode
+        music: Source of background music frames
+        gap_ranges: Music-only gaps in milliseconds
+        total_frames: Length of the episode in frames
+        music_gains: Per-hop music gains from voice ducking, which replace
+            the gap-based music envelope
+
+    Yields:
+        Mixed blocks of at most block_frames frames
+    """
+    fade_frames = ms_to_frames(gap_fade_ms, frame_rate)
+
+    for block_start in range(0, total_frames, block_frames):
+        num_frames = min(block_frames, total_frames - block_start)
+        block_end = block_start + num_frames
+
+        voice = np.zeros((num_frames, channels), dtype=np.float32)
+        for stem, stem_start in zip(stems, stem_starts, strict=True):
+            start = max(stem_start, block_start)
+            end = min(stem_start + len(stem), block_end)
+            if end > start:
+                voice[start - block_start : end - block_start] += stem[
+                    start - stem_start : end - stem_start
+                ]
+
+        if music_gains is not None:
+            music_envelope = ducking_envelope(
+                music_gains, frame_rate, num_frames, block_start
+            )
+        else:
+            music_envelope = build_music_envelope(
+                num_frames,
+                frame_rate,
+                gap_ranges,
+                gap_fade_ms,
+                music_without_voice_db,
+                music_under_voice_db,
+                start_frame=block_start,
+                total_frames=total_frames,
+            )
+        master_envelope = fade_envelope(
+            num_frames, fade_frames, fade_frames, start=block_start, total=total_frames
+        )
+        yield mix_arrays(voice, music.read(num_frames), music_envelope, master_envelope)
+
+
+def encode_blocks(
+    blocks: Iterator[np.ndarray],
+    outputs: List[Dict[str, Any]],
+    frame_rate: int,
+    channels: int,
+) -> int:
+    """Feed mixed blocks straight into the ffmpeg encoders of every output.
+
+    Returns:
+        The number of frames encoded
+    """
+    encoded_frames = 0
+
+    def pcm_chunks() -> Iterator[bytes]:
+        nonlocal encoded_frames
+        for block in blocks:
+            encoded_frames += len(block)
+            yield np.ascontiguousarray(block, dtype=PCM_DTYPE).tobytes()
+
+    encode_pcm(pcm_chunks(), outputs, frame_rate, channels, PCM_FORMAT)
+    return encoded_frames
@@ -0,0 +1,48 @@
+"""Timeline planning for the voice track.
+
+Computes where every memo lands and where the music-only gaps are from memo
+durations alone, so renderers can lay audio out without building the voice
+track by repeated concatenation.
+"""
+
+from typing import List, Tuple
+
+
+def plan_voice_track(
+    durations_ms: List[int],
+    intro_ms: int,
+    gap_ms: int,
+    outro_ms: int,
+    crossfade_ms: int,
+) -> Tuple[List[int], List[Tuple[int, int]], int]:
+    """Plan the voice track layout produced by ``build_voice_track``.
+
+    Each memo is appended with a crossfade, so it starts ``crossfade_ms``
+    before the end of the audio so far. The gap ranges keep the cursor
+    arithmetic of ``build_voice_track`` (which does not subtract the
+    crossfade) so both paths duck the music identically.
+
+    Returns:
+        A tuple of (memo start positions, gap ranges, total length), all in
+        milliseconds
+    """
+    memo_starts: List[int] = []
+    gap_ranges = [(0, intro_ms)]
+    audio_end = intro_ms
+    cursor = intro_ms
+
+    for idx, duration_ms in enumerate(durations_ms):
+        if idx:
+            gap_ranges.append((cursor, cursor + gap_ms))
+            audio_end += gap_ms
+            cursor += gap_ms
+
+        overlap = min(crossfade_ms, audio_end, duration_ms)
+        memo_starts.append(audio_end - overlap)
+        audio_end += duration_ms - overlap
+        cursor += duration_ms
+
+    gap_ranges.append((cursor, cursor + outro_ms))
+    total_ms = audio_end + outro_ms
+
+    return memo_starts, gap_ranges, total_ms
@@ -0,0 +1,88 @@
+"""Render the episode as soon as new voice memos arrive.
+
+The file-downloader touches a flag file next to the memos whenever it saves
+new audio (see ``src.utils.new_audio``). In watch mode the mixer polls that
+flag and renders once it is newer than the last run report, after waiting
+for a quiet period so a burst of memos is mixed in one go.
+"""
+
+import pathlib
+import time
+from typing import Callable, Optional
+
+from src.utils.logging import setup_logger
+from src.utils.new_audio import new_audio_signalled_at
+
+logger = setup_logger(__name__)
+
+DEFAULT_POLL_S = 5
+DEFAULT_SETTLE_S = 30  # quiet period after the last new memo
+
+
+def last_render_at(report_path: pathlib.Path) -> Optional[float]:
+    """Return when the last render finished, successful or not."""
+    try:
+        return report_path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def render_due(
+    signalled_at: Optional[float],
+    rendered_at: Optional[float],
+    now: float,
+    settle_s: float,
+) -> bool:
+    """Return whether new audio arrived since the last render and has settled.
+
+    Args:
+        signalled_at: When new audio was last announced, if ever
+        rendered_at: When the last render finished, if ever
+        now: The current time
+        settle_s: How long the flag must be untouched before rendering
+    """
+    if signalled_at is None:
+        return False
+    if rendered_at is not None and rendered_at >= signalled_at:
+        return False
+    return now - signalled_at >= settle_s
+
+
+def watch_for_new_audio(
+    render: Callable[[], None],
+    report_path: pathlib.Path,
+    flag_path: Optional[pathlib.Path] = None,
+    poll_s: float = DEFAULT_POLL_S,
+    settle_s: float = DEFAULT_SETTLE_S,
+    max_renders: Optional[int] = None,
+) -> None:
+    """Poll the new audio flag and render whenever it is due.
+
+    A failed render still writes its report, so it is only retried once more
+    audio arrives rather than on every poll.
+
+    Args:
+        render: Renders the episode and writes the run report
+        report_path: The run report, whose age marks the last render
+        flag_path: The new audio flag (default: get_new_audio_flag())
+        poll_s: Seconds between checks
+        settle_s: Quiet period after the last new memo before rendering
+        max_renders: Stop after this many renders (default: run forever)
+    """
+    logger.info(f"Watching for new audio every {poll_s}s")
+    renders = 0
+    while max_renders is None or renders < max_renders:
+        if render_due(
+            new_audio_signalled_at(flag_path),
+            last_render_at(report_path),
+            time.time(),
+            settle_s,
+        ):
+            logger.info("New audio arrived, rendering the episode")
+            renders += 1
+            try:
+                render()
+            except Exception:
+                logger.exception("Render failed, waiting for more audio")
+            continue
+        time.sleep(poll_s)
@@ -0,0 +1 @@
+# Initialize the publish-podcast-to-s3 package
@@ -0,0 +1,214 @@
+"""Publish the podcast to S3 under an ISO 8601 timestamp.
+
+Uploads data/podcast/voice_memo_mix.mp3 to podcasts/YYYY-MM-DDTHHMMSS.mp3
+with boto3's transfer manager, which splits large files into parts and
+uploads them in parallel over the shared client's connection pool. Every
+part carries a SHA-256 checksum that S3 verifies on arrival.
+
+The SHA-256 of the whole file is stored in the episode's metadata, and a
+marker object under checksums/ points from that hash to the episode, so
+publishing the same mix twice (e.g. a rerun after a failed RSS update)
+costs two HEAD requests instead of another upload and a duplicate episode.
+"""
+
+import mimetypes
+import os
+import pathlib
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.exceptions import ClientError
+
+from src.utils.env import get_positive_int_env
+from src.utils.hashing import file_sha256
+from src.utils.logging import setup_logger
+from src.utils.s3 import (
+    NoS3CredentialsError,
+    S3AccessError,
+    get_s3_client,
+    s3_error,
+)
+
+logger = setup_logger(__name__)
+
+INPUT_FILE = pathlib.Path("data/podcast/voice_memo_mix.mp3")
+PODCAST_PREFIX = "podcasts/"
+CHECKSUM_PREFIX = "checksums/"
+EPISODE_TIMESTAMP_FORMAT = "%Y-%m-%dT%H%M%S"
+
+# Matches the RSS feed's metadata, i.e. x-amz-meta-content-sha256
+CONTENT_HASH_METADATA = "content-sha256"
+EPISODE_KEY_METADATA = "episode-key"
+
+MB = 1024 * 1024
+MIN_CHUNK_MB = 5  # S3's minimum part size
+DEFAULT_CHUNK_MB = 8
+DEFAULT_CONCURRENCY = 10
+
+
+class PublishError(Exception):
+    """Exception raised when the podcast can't be published."""
+
+
+def episode_key(input_file: pathlib.Path, published_at: datetime) -> str:
+    """Return the S3 key of an episode, e.g. podcasts/2025-01-15T143022.mp3."""
+    return (
+        f"{PODCAST_PREFIX}{published_at:{EPISODE_TIMESTAMP_FORMAT}}{input_file.suffix}"
+    )
+
+
+def get_transfer_config() -> TransferConfig:
+    """Get the multipart upload settings from environment variables.
+
+    S3_MULTIPART_CHUNK_MB (default 8, at least 5) is both the part size and
+    the size above which files are uploaded in parts; S3_UPLOAD_CONCURRENCY
+    (default 10) is how many parts are uploaded at once.
+    """
+    chunk_mb = get_positive_int_env("S3_MULTIPART_CHUNK_MB", DEFAULT_CHUNK_MB)
+    if chunk_mb < MIN_CHUNK_MB:
+        raise ValueError(
+            f"S3_MULTIPART_CHUNK_MB must be at least {MIN_CHUNK_MB}, got: {chunk_mb}"
+        )
+    return TransferConfig(
+        multipart_threshold=chunk_mb * MB,
+        multipart_chunksize=chunk_mb * MB,
+        max_concurrency=get_positive_int_env(
+            "S3_UPLOAD_CONCURRENCY", DEFAULT_CONCURRENCY
+        ),
+    )
+
+
+def find_published_copy(
+    s3_client, bucket_name: str, content_sha256: str
+) -> Optional[str]:
+    """Return the key of an episode already holding this file, if any.
+
+    Looks up the checksum marker, then checks that the episode it points to
+    still holds a file with that hash.
+    """
+    try:
+        marker = s3_client.head_object(
+            Bucket=bucket_name, Key=f"{CHECKSUM_PREFIX}{content_sha256}"
+        )
+        key = marker["Metadata"][EPISODE_KEY_METADATA]
+        # The episode may have been deleted or replaced since
+        episode = s3_client.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+            # Uploading will tell whether S3 is reachable at all
+            logger.warning(f"Failed to check for a published copy: {e}")
+        return None
+    except KeyError:
+        return None
+    if episode.get("Metadata", {}).get(CONTENT_HASH_METADATA) != content_sha256:
+        return None
+    return key
+
+
+def upload_episode(
+    s3_client,
+    bucket_name: str,
+    input_file: pathlib.Path,
+    key: str,
+    content_sha256: str,
+) -> None:
+    """Upload the episode, in parallel parts if it is large enough."""
+    content_type = mimetypes.guess_type(input_file.name)[0]
+    extra_args = {
+        "ContentType": content_type or "application/octet-stream",
+        "ChecksumAlgorithm": "SHA256",
+        "Metadata": {CONTENT_HASH_METADATA: content_sha256},
+    }
+    with create_transfer_manager(s3_client, get_transfer_config()) as manager:
+        manager.upload(
+            str(input_file), bucket_name, key, extra_args=extra_args
+        ).result()
+
+
+def upload_episode_creating_bucket(
+    s3_client,
+    bucket_name: str,
+    input_file: pathlib.Path,
+    key: str,
+    content_sha256: str,
+) -> None:
+    """Upload the episode; on a custom endpoint, create a missing bucket.
+
+    Against MinIO or another S3-compatible service (AWS_ENDPOINT_URL), a
+    missing bucket is created and the upload retried; real buckets are
+    created by Terraform.
+    """
+    try:
+        upload_episode(s3_client, bucket_name, input_file, key, content_sha256)
+        return
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code != "NoSuchBucket" or not os.getenv("AWS_ENDPOINT_URL"):
+            raise s3_error(f"upload {key}", e) from e
+
+    logger.info(f"Creating bucket {bucket_name}...")
+    try:
+        s3_client.create_bucket(Bucket=bucket_name)
+        upload_episode(s3_client, bucket_name, input_file, key, content_sha256)
+    except ClientError as e:
+        raise s3_error(f"upload {key}", e) from e
+
+
+def publish_podcast(
+    input_file: pathlib.Path = INPUT_FILE, published_at: Optional[datetime] = None
+) -> str:
+    """Upload the podcast to S3, unless this exact file is already there.
+
+    Args:
+        input_file: The podcast audio to publish
+        published_at: The time to name the episode after (default: now)
+
+    Returns:
+        The S3 key of the episode holding the file
+    """
+    if not input_file.is_file():
+        raise PublishError(f"Input file {input_file} not found")
+
+    s3_client = get_s3_client()
+    bucket_name = os.environ["S3_BUCKET_NAME"]
+    content_sha256 = file_sha256(input_file)
+
+    published_key = find_published_copy(s3_client, bucket_name, content_sha256)
+    if published_key is not None:
+        logger.info(f"{input_file.name} is already published as {published_key}")
+        return published_key
+
+    key = episode_key(input_file, published_at or datetime.now(timezone.utc))
+    logger.info(f"Uploading {input_file.name} to s3://{bucket_name}/{key}...")
+    upload_episode_creating_bucket(
+        s3_client, bucket_name, input_file, key, content_sha256
+    )
+
+    try:
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=f"{CHECKSUM_PREFIX}{content_sha256}",
+            Body=b"",
+            Metadata={EPISODE_KEY_METADATA: key},
+        )
+    except ClientError as e:
+        # The episode is published; a rerun would only upload it again
+        logger.warning(f"Failed to record the checksum of {key}: {e}")
+
+    logger.info(f"Podcast published successfully to S3: s3://{bucket_name}/{key}")
+    return key
+
+
+def main() -> None:
+    logger.info("Running publish-podcast-to-s3...")
+    try:
+        publish_podcast()
+    except (PublishError, NoS3CredentialsError, S3AccessError) as e:
+        logger.error(f"Publishing to S3 failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
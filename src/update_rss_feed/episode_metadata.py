@@ -0,0 +1,230 @@
+"""Per-episode metadata for the RSS feed, cached between runs.
+
+An episode's duration is probed from the start of its MP3: a ranged GET of
+the first few KB gives the frame header and, for VBR files, the Xing/Info
+frame count. Results are cached in a JSON file keyed by S3 key and tied to
+the object's ETag and size, so regenerating the feed only probes episodes
+that are new or have been replaced.
+"""
+
+import json
+import os
+import pathlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from src.utils.env import get_positive_int_env
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+CACHE_VERSION = 1
+PROBE_BYTES = 64 * 1024
+DEFAULT_PROBE_WORKERS = 8
+
+ID3_HEADER_BYTES = 10
+# Layer III bitrates in kbps by bitrate index, for MPEG-1 and MPEG-2/2.5
+MPEG1_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+MPEG2_BITRATES = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+# Sample rates by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+MPEG1 = 3
+MONO = 3
+LAYER_III = 1
+XING_FRAMES_FLAG = 0x1
+
+
+def get_probe_workers() -> int:
+    """Get the number of episodes to probe at once from RSS_PROBE_WORKERS."""
+    return get_positive_int_env("RSS_PROBE_WORKERS", DEFAULT_PROBE_WORKERS)
+
+
+def id3v2_size(data: bytes) -> int:
+    """Return the length of the ID3v2 tag at the start of data, if any."""
+    if len(data) < ID3_HEADER_BYTES or data[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in data[6:10]:  # syncsafe: 7 bits per byte
+        size = (size << 7) | (byte & 0x7F)
+    footer = ID3_HEADER_BYTES if data[5] & 0x10 else 0
+    return ID3_HEADER_BYTES + size + footer
+
+
+def parse_frame_header(data: bytes, offset: int) -> Optional[Dict[str, int]]:
+    """Parse the MPEG Layer III frame header at offset, if there is one."""
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x3
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x3
+    if (
+        version not in SAMPLE_RATES
+        or (b1 >> 1) & 0x3 != LAYER_III
+        or bitrate_index in (0, 15)
+        or sample_rate_index == 3
+    ):
+        return None
+    bitrates = MPEG1_BITRATES if version == MPEG1 else MPEG2_BITRATES
+    return {
+        "version": version,
+        "bitrate": bitrates[bitrate_index] * 1000,
+        "sample_rate": SAMPLE_RATES[version][sample_rate_index],
+        "samples_per_frame": 1152 if version == MPEG1 else 576,
+        "mono": int(b3 >> 6 == MONO),
+    }
+
+
+def xing_frame_count(data: bytes, offset: int, header: Dict[str, int]) -> Optional[int]:
+    """Return the frame count of a Xing/Info header in the frame at offset."""
+    if header["version"] == MPEG1:
+        side_info = 17 if header["mono"] else 32
+    else:
+        side_info = 9 if header["mono"] else 17
+    tag = offset + 4 + side_info
+    if data[tag : tag + 4] not in (b"Xing", b"Info") or len(data) < tag + 12:
+        return None
+    flags = int.from_bytes(data[tag + 4 : tag + 8], "big")
+    if not flags & XING_FRAMES_FLAG:
+        return None
+    return int.from_bytes(data[tag + 8 : tag + 12], "big")
+
+
+def mp3_duration(data: bytes, size: int, audio_start: int = 0) -> Optional[float]:
+    """Estimate an MP3's duration in seconds from its first bytes.
+
+    Uses the Xing/Info frame count when the encoder wrote one (LAME does,
+    for CBR and VBR alike); otherwise assumes a constant bitrate.
+
+    Args:
+        data: The start of the file, beginning at audio_start
+        size: The size of the whole file in bytes
+        audio_start: Where data starts in the file, i.e. past any ID3v2 tag
+
+    Returns:
+        The duration, or None if no frame header was found
+    """
+    for offset in range(len(data) - 3):
+        header = parse_frame_header(data, offset)
+        if header is None:
+            continue
+        frames = xing_frame_count(data, offset, header)
+        if frames is not None:
+            return frames * header["samples_per_frame"] / header["sample_rate"]
+        return (size - audio_start - offset) * 8 / header["bitrate"]
+    return None
+
+
+def probe_episode(s3_client, bucket_name: str, podcast_file: Dict[str, Any]) -> Dict:
+    """Read the start of an episode from S3 and describe it for the cache."""
+    metadata = {
+        "etag": podcast_file.get("etag"),
+        "size": podcast_file["size"],
+        "duration_s": None,
+    }
+    if not podcast_file["key"].endswith(".mp3"):
+        return metadata
+
+    def read_range(start: int) -> bytes:
+        response = s3_client.get_object(
+            Bucket=bucket_name,
+            Key=podcast_file["key"],
+            Range=f"bytes={start}-{start + PROBE_BYTES - 1}",
+        )
+        return response["Body"].read()
+
+    data = read_range(0)
+    audio_start = id3v2_size(data)
+    if audio_start >= len(data):  # e.g. a large cover image in the tag
+        data = read_range(audio_start)
+    else:
+        data = data[audio_start:]
+    metadata["duration_s"] = mp3_duration(data, podcast_file["size"], audio_start)
+    return metadata
+
+
+def load_episode_cache(path: pathlib.Path) -> Dict[str, Dict[str, Any]]:
+    """Load cached episode metadata by S3 key; missing or invalid is empty."""
+    try:
+        cache = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("episodes", {})
+
+
+def save_episode_cache(path: pathlib.Path, episodes: Dict[str, Dict[str, Any]]) -> None:
+    """Save episode metadata by S3 key, atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "episodes": episodes}, f, indent=2)
+    os.replace(tmp_name, path)
+
+
+def is_current(metadata: Optional[Dict[str, Any]], podcast_file: Dict) -> bool:
+    """Return whether cached metadata still describes the S3 object."""
+    return (
+        metadata is not None
+        and metadata.get("size") == podcast_file["size"]
+        and metadata.get("etag") == podcast_file.get("etag")
+    )
+
+
+def get_episode_metadata(
+    s3_client,
+    podcast_files: List[Dict[str, Any]],
+    cache_path: pathlib.Path,
+    prune: bool = True,
+) -> Dict[str, Dict[str, Any]]:
+    """Return the metadata of each episode by S3 key, probing only cache misses.
+
+    Episodes that fail to probe are left out (and retried next run), so
+    their items are written without a duration.
+
+    Args:
+        s3_client: The S3 client
+        podcast_files: The episodes, as listed by list_podcast_files
+        cache_path: The JSON file caching metadata between runs
+        prune: Drop cached episodes that weren't listed, i.e. were deleted;
+            off when only new episodes were listed
+    """
+    cached = load_episode_cache(cache_path)
+    episodes = {
+        f["key"]: cached[f["key"]]
+        for f in podcast_files
+        if is_current(cached.get(f["key"]), f)
+    }
+    missing = [f for f in podcast_files if f["key"] not in episodes]
+    if not missing:
+        logger.info(f"Episode metadata of all {len(podcast_files)} files is cached")
+        return episodes
+
+    logger.info(f"Probing {len(missing)} of {len(podcast_files)} podcast files...")
+    bucket_name = os.getenv("S3_BUCKET_NAME")
+
+    def probe(podcast_file: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            return probe_episode(s3_client, bucket_name, podcast_file)
+        except ClientError as e:
+            logger.warning(f"Failed to probe {podcast_file['key']}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=get_probe_workers()) as executor:
+        results = list(executor.map(probe, missing))
+    for podcast_file, metadata in zip(missing, results, strict=True):
+        if metadata is not None:
+            episodes[podcast_file["key"]] = metadata
+
+    save_episode_cache(cache_path, episodes if prune else {**cached, **episodes})
+    return episodes
@@ -0,0 +1,91 @@
+"""State of the published feed, for incremental updates.
+
+After each successful upload the updater records the last S3 key in the
+feed, the channel metadata it was written with and a hash of the feed. On
+the next run, if the local copy of the feed still matches that state, only
+keys after the last one are listed (episode filenames are ISO 8601
+timestamps, so they sort by time) and their items are spliced into the
+existing feed. Anything else falls back to a full rebuild.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+from typing import Any, Dict, List, Optional
+
+STATE_VERSION = 1
+FEED_STATE_NAME = "feed-state.json"
+
+
+def feed_hash(rss_content: str) -> str:
+    """Return the SHA-256 of a feed's UTF-8 encoding."""
+    return hashlib.sha256(rss_content.encode("utf-8")).hexdigest()
+
+
+def load_feed_state(path: pathlib.Path) -> Optional[Dict[str, Any]]:
+    """Load the feed state, or None if it is missing, invalid or outdated."""
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+
+def save_feed_state(
+    path: pathlib.Path,
+    rss_content: str,
+    podcast_files: List[Dict[str, Any]],
+    channel: Dict[str, Any],
+    previous: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Record the state of a feed that was just published, atomically.
+
+    Args:
+        path: Where to write the state
+        rss_content: The feed as uploaded
+        podcast_files: The files listed for this run
+        channel: The channel metadata the feed was written with
+        previous: The state this run's feed was spliced onto, if any
+
+    Returns:
+        The state as written
+    """
+    keys = [f["key"] for f in podcast_files]
+    if previous is not None:
+        keys.append(previous["last_key"])
+    state = {
+        "version": STATE_VERSION,
+        "last_key": max(keys),
+        "episodes": len(podcast_files) + (previous["episodes"] if previous else 0),
+        "channel": channel,
+        "feed_sha256": feed_hash(rss_content),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_name, path)
+    return state
+
+
+def read_spliceable_feed(
+    state: Optional[Dict[str, Any]], feed_path: pathlib.Path, channel: Dict[str, Any]
+) -> Optional[str]:
+    """Return the local feed if new items can be spliced into it.
+
+    That requires a state, a local feed that is exactly the one the state
+    describes, and unchanged channel metadata.
+    """
+    if state is None or state.get("channel") != channel:
+        return None
+    try:
+        rss_content = feed_path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    if feed_hash(rss_content) != state.get("feed_sha256"):
+        return None
+    return rss_content
@@ -0,0 +1,118 @@
+"""Streaming writer for RSS 2.0 podcast feeds with iTunes tags.
+
+The feed is written to a text stream element by element, so a feed with
+years of daily episodes never has to be assembled as one string in memory
+(or in one giant template); each item is written and forgotten.
+"""
+
+from typing import Any, Dict, Optional, TextIO
+from xml.sax.saxutils import escape, quoteattr
+
+ITUNES_NAMESPACE = "http://www.itunes.com/dtds/podcast-1.0.dtd"
+INDENT = "  "
+ITEM_START = f"{INDENT * 2}<item>\n"
+CHANNEL_END = f"{INDENT}</channel>\n"
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration for itunes:duration, e.g. 1:02:03."""
+    total = round(seconds)
+    return f"{total // 3600}:{total // 60 % 60:02d}:{total % 60:02d}"
+
+
+class RSSFeedWriter:
+    """Writes an RSS 2.0 feed to a text stream, one element at a time.
+
+    Call start_feed once, write_item for each episode, then end_feed.
+    """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def _element(
+        self,
+        depth: int,
+        name: str,
+        text: Optional[str] = None,
+        attributes: Optional[Dict[str, str]] = None,
+    ) -> None:
+        attrs = "".join(
+            f" {key}={quoteattr(value)}" for key, value in (attributes or {}).items()
+        )
+        if text is None:
+            self.stream.write(f"{INDENT * depth}<{name}{attrs}/>\n")
+        else:
+            self.stream.write(
+                f"{INDENT * depth}<{name}{attrs}>{escape(text)}</{name}>\n"
+            )
+
+    def start_feed(self, channel: Dict[str, Any]) -> None:
+        """Write the feed's header and its channel-level elements.
+
+        Args:
+            channel: title, description, link, language and last_build_date
+                (an RFC 822 date, or None), plus optional author, image_url
+                and category for the iTunes directory
+        """
+        self.stream.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.stream.write(
+            f'<rss version="2.0" xmlns:itunes={quoteattr(ITUNES_NAMESPACE)}>\n'
+        )
+        self.stream.write(f"{INDENT}<channel>\n")
+        self._element(2, "title", channel["title"])
+        self._element(2, "link", channel["link"])
+        self._element(2, "description", channel["description"])
+        self._element(2, "language", channel["language"])
+        if channel.get("last_build_date"):
+            self._element(2, "lastBuildDate", channel["last_build_date"])
+        self._element(2, "generator", "WaffleBot RSS Generator")
+        if channel.get("author"):
+            self._element(2, "itunes:author", channel["author"])
+        self._element(2, "itunes:summary", channel["description"])
+        if channel.get("image_url"):
+            self._element(2, "itunes:image", attributes={"href": channel["image_url"]})
+        if channel.get("category"):
+            self._element(
+                2, "itunes:category", attributes={"text": channel["category"]}
+            )
+        self._element(2, "itunes:explicit", "false")
+
+    def write_item(self, item: Dict[str, Any]) -> None:
+        """Write one episode.
+
+        Args:
+            item: title, guid, pub_date (RFC 822), url, length (bytes) and
+                mime_type of the enclosure, and duration_s if known
+        """
+        self.stream.write(ITEM_START)
+        self._element(3, "title", item["title"])
+        self._element(3, "guid", item["guid"], {"isPermaLink": "false"})
+        self._element(3, "pubDate", item["pub_date"])
+        self._element(
+            3,
+            "enclosure",
+            attributes={
+                "url": item["url"],
+                "length": str(item["length"]),
+                "type": item["mime_type"],
+            },
+        )
+        if item.get("duration_s") is not None:
+            self._element(3, "itunes:duration", format_duration(item["duration_s"]))
+        self.stream.write(f"{INDENT * 2}</item>\n")
+
+    def copy_items(self, rss_content: str) -> None:
+        """Copy the items of a feed this writer wrote earlier, as they are.
+
+        This is how new items are spliced in front of existing ones without
+        parsing or rewriting the rest of the feed.
+        """
+        start = rss_content.find(ITEM_START)
+        if start == -1:
+            return
+        end = rss_content.rindex(CHANNEL_END)
+        self.stream.write(rss_content[start:end])
+
+    def end_feed(self) -> None:
+        """Close the channel and the feed."""
+        self.stream.write(f"{CHANNEL_END}</rss>\n")
@@ -1,74 +1,59 @@
+import email.utils
+import gzip
+import hashlib
+import io
 import os
 import pathlib
 from datetime import datetime, timezone
-from typing import Any, Dict, List
-
-import boto3
-from botocore.exceptions import ClientError, NoCredentialsError
-
+from typing import Any, Dict, List, Optional, TextIO
+
+from botocore.exceptions import ClientError
+
+from src.update_rss_feed.episode_metadata import get_episode_metadata
+from src.update_rss_feed.feed_state import (
+    FEED_STATE_NAME,
+    feed_hash,
+    load_feed_state,
+    read_spliceable_feed,
+    save_feed_state,
+)
+from src.update_rss_feed.feed_writer import RSSFeedWriter
 from src.utils.logging import setup_logger
+from src.utils.s3 import NoS3CredentialsError, S3AccessError, get_s3_client, s3_error
 
 logger = setup_logger(__name__)
 
 RSS_OUTPUT_DIR = pathlib.Path("data/rss")
+EPISODE_CACHE_NAME = "episodes.json"
 
+# Episode files are named after when they were published, e.g.
+# 2025-01-15T143022.mp3
+EPISODE_TIMESTAMP_FORMAT = "%Y-%m-%dT%H%M%S"
 
-class NoS3CredentialsError(Exception):
-    """Exception raised when AWS S3 credentials are not available."""
-
+# Uploads carry the SHA-256 of the uncompressed feed as x-amz-meta-content-sha256
+CONTENT_HASH_METADATA = "content-sha256"
 
-class S3AccessError(Exception):
-    """Exception raised when S3 access fails."""
+MIME_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/x-m4a",
+    ".wav": "audio/wav",
+    ".ogg": "audio/ogg",
+}
 
 
 class RSSGenerationError(Exception):
     """Exception raised when RSS feed generation fails."""
 
 
-def get_s3_client():
-    """Create and return an S3 client using environment variables."""
-    try:
-        # Check for required environment variables
-        required_vars = ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME"]
-        missing_vars = [var for var in required_vars if not os.getenv(var)]
-
-        if missing_vars:
-            raise NoS3CredentialsError(
-                f"Missing required environment variables: {missing_vars}"
-            )
-
-        # Create S3 client
-        session = boto3.Session(
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            # Optional for temporary credentials
-            aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
-            region_name=os.getenv("AWS_REGION", "us-east-1"),
-        )
-
-        s3_client = session.client("s3")
+def list_podcast_files(
+    s3_client, start_after: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """List podcast audio files from S3 bucket.
 
-        # Test credentials by listing bucket (this will fail if credentials are invalid)
-        bucket_name = os.getenv("S3_BUCKET_NAME")
-        s3_client.head_bucket(Bucket=bucket_name)
-
-        logger.info(f"Successfully connected to S3 bucket: {bucket_name}")
-        return s3_client
-
-    except NoCredentialsError as e:
-        raise NoS3CredentialsError(f"AWS credentials not found: {e}") from e
-    except ClientError as e:
-        error_code = e.response["Error"]["Code"]
-        if error_code == "403":
-            raise S3AccessError(f"Access denied to S3 bucket: {e}") from e
-        elif error_code == "404":
-            raise S3AccessError(f"S3 bucket not found: {e}") from e
-        else:
-            raise S3AccessError(f"S3 error: {e}") from e
-
-
-def list_podcast_files(s3_client) -> List[Dict[str, Any]]:
-    """List all podcast audio files from S3 bucket."""
+    Args:
+        s3_client: The S3 client
+        start_after: Only list keys that sort after this one (default: all)
+    """
     logger.info("Listing podcast files from S3...")
 
     bucket_name = os.getenv("S3_BUCKET_NAME")
@@ -77,7 +62,10 @@ def list_podcast_files(s3_client) -> List[Dict[str, Any]]:
     try:
         # List objects in the podcasts/ prefix
         paginator = s3_client.get_paginator("list_objects_v2")
-        pages = paginator.paginate(Bucket=bucket_name, Prefix="podcasts/")
+        list_args = {"Bucket": bucket_name, "Prefix": "podcasts/"}
+        if start_after is not None:
+            list_args["StartAfter"] = start_after
+        pages = paginator.paginate(**list_args)
 
         for page in pages:
             if "Contents" in page:
@@ -90,6 +78,7 @@ def list_podcast_files(s3_client) -> List[Dict[str, Any]]:
                             "filename": pathlib.Path(key).name,
                             "last_modified": obj["LastModified"],
                             "size": obj["Size"],
+                            "etag": obj.get("ETag", "").strip('"'),
                             "url": f"https://{bucket_name}.s3.amazonaws.com/{key}",
                         }
                         podcast_files.append(file_info)
@@ -101,63 +90,218 @@ def list_podcast_files(s3_client) -> List[Dict[str, Any]]:
         return podcast_files
 
     except ClientError as e:
-        raise S3AccessError(f"Failed to list podcast files: {e}") from e
+        raise s3_error("list podcast files", e) from e
 
 
-def generate_rss_feed_content(podcast_files: List[Dict[str, Any]]) -> str:
+def get_channel_settings() -> Dict[str, Any]:
+    """Get the podcast's channel metadata from environment variables."""
+    bucket_name = os.getenv("S3_BUCKET_NAME")
+    return {
+        "title": os.getenv("RSS_TITLE", "WaffleBot Podcast"),
+        "description": os.getenv(
+            "RSS_DESCRIPTION", "Automated podcast generated from Discord voice memos"
+        ),
+        "link": os.getenv("RSS_LINK", f"https://{bucket_name}.s3.amazonaws.com/"),
+        "language": os.getenv("RSS_LANGUAGE", "en-us"),
+        "author": os.getenv("RSS_AUTHOR"),
+        "image_url": os.getenv("RSS_IMAGE_URL"),
+        "category": os.getenv("RSS_CATEGORY"),
+    }
+
+
+def episode_timestamp(podcast_file: Dict[str, Any]) -> Optional[datetime]:
+    """Return the publication time in an episode's filename, if it has one."""
+    stem = pathlib.Path(podcast_file["filename"]).stem
+    try:
+        return datetime.strptime(stem, EPISODE_TIMESTAMP_FORMAT).replace(
+            tzinfo=timezone.utc
+        )
+    except ValueError:
+        return None
+
+
+def episode_published_at(podcast_file: Dict[str, Any]) -> datetime:
+    """Return when an episode was published, or else when it was uploaded."""
+    return episode_timestamp(podcast_file) or podcast_file["last_modified"]
+
+
+def build_episode_item(
+    podcast_file: Dict[str, Any],
+    metadata: Optional[Dict[str, Any]],
+    podcast_title: str,
+) -> Dict[str, Any]:
+    """Describe a podcast file as a feed item."""
+    path = pathlib.Path(podcast_file["filename"])
+    timestamp = episode_timestamp(podcast_file)
+    if timestamp is not None:
+        title = f"{podcast_title}: {timestamp:%B} {timestamp.day}, {timestamp.year}"
+    else:
+        title = path.stem
+    return {
+        "title": title,
+        "guid": podcast_file["key"],
+        "pub_date": email.utils.format_datetime(episode_published_at(podcast_file)),
+        "url": podcast_file["url"],
+        "length": podcast_file["size"],
+        "mime_type": MIME_TYPES.get(path.suffix.lower(), "application/octet-stream"),
+        "duration_s": metadata.get("duration_s") if metadata else None,
+    }
+
+
+def write_rss_feed(
+    stream: TextIO,
+    podcast_files: List[Dict[str, Any]],
+    episode_metadata: Dict[str, Dict[str, Any]],
+    existing_feed: Optional[str] = None,
+) -> None:
+    """Write the RSS feed for the podcast files, newest first, to a stream.
+
+    lastBuildDate is the newest episode's publication date, so the feed
+    only changes when the episodes do.
+
+    Args:
+        stream: Where to write the feed
+        podcast_files: The episodes to write items for
+        episode_metadata: Cached metadata (e.g. duration) by S3 key
+        existing_feed: A feed written earlier whose items follow the new
+            ones; the podcast files must all be newer than its episodes
+    """
+    channel = get_channel_settings()
+    podcast_files = sorted(podcast_files, key=episode_published_at, reverse=True)
+    last_build_date = None
+    if podcast_files:
+        last_build_date = email.utils.format_datetime(
+            episode_published_at(podcast_files[0])
+        )
+
+    writer = RSSFeedWriter(stream)
+    writer.start_feed({**channel, "last_build_date": last_build_date})
+    for podcast_file in podcast_files:
+        writer.write_item(
+            build_episode_item(
+                podcast_file,
+                episode_metadata.get(podcast_file["key"]),
+                channel["title"],
+            )
+        )
+    if existing_feed is not None:
+        writer.copy_items(existing_feed)
+    writer.end_feed()
+
+
+def generate_rss_feed_content(
+    podcast_files: List[Dict[str, Any]],
+    episode_metadata: Optional[Dict[str, Dict[str, Any]]] = None,
+    existing_feed: Optional[str] = None,
+) -> str:
     """Generate RSS feed XML content from podcast files.
 
-    This is a stub function that will be replaced with actual RSS library
-    implementation.
+    Args:
+        podcast_files: The episodes, as listed by list_podcast_files
+        episode_metadata: Cached metadata (e.g. duration) by S3 key
+        existing_feed: A feed to splice the new episodes into, if any
     """
     logger.info("Generating RSS feed content...")
 
-    # TODO: Replace this stub with actual RSS feed generation using a proper library
-    # This should generate a valid RSS 2.0 feed with podcast metadata
+    stream = io.StringIO()
+    try:
+        write_rss_feed(stream, podcast_files, episode_metadata or {}, existing_feed)
+    except (KeyError, TypeError, ValueError) as e:
+        raise RSSGenerationError(f"Failed to generate RSS feed: {e}") from e
 
-    build_date = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S %z")
-    rss_content = f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">
-    <channel>
-        <title>WaffleBot Podcast</title>
-        <description>Automated podcast generated from Discord voice memos</description>
-        <language>en-us</language>
-        <lastBuildDate>{build_date}</lastBuildDate>
-        <generator>WaffleBot RSS Generator</generator>
+    logger.info(f"RSS feed content generated with {len(podcast_files)} episodes")
+    return stream.getvalue()
 
-        <!-- Podcast episodes will be added here by RSS library -->
-        <!-- Stub: Found {len(podcast_files)} episodes -->
 
-    </channel>
-</rss>"""
+def is_gzip_enabled() -> bool:
+    """Whether RSS_GZIP=1 asks for a gzip-encoded copy of the feed."""
+    return os.getenv("RSS_GZIP", "0") == "1"
 
-    logger.info("RSS feed content generated (stub implementation)")
-    return rss_content
 
+def is_already_uploaded(
+    s3_client, bucket_name: str, s3_key: str, body: bytes, content_sha256: str
+) -> bool:
+    """Return whether the object at s3_key already holds this feed.
 
-def upload_rss_feed(s3_client, rss_content: str) -> None:
-    """Upload the generated RSS feed to S3."""
+    A HEAD request compares the feed's hash with the one recorded in the
+    object's metadata, or for objects uploaded without one, the MD5 of the
+    body with the ETag of a single-part upload.
+    """
+    try:
+        response = s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+    except ClientError:
+        return False  # missing (or not readable), so upload it
+    if response.get("Metadata", {}).get(CONTENT_HASH_METADATA) == content_sha256:
+        return True
+    md5 = hashlib.md5(body, usedforsecurity=False).hexdigest()
+    return response.get("ETag", "").strip('"') == md5
+
+
+def put_rss_object(
+    s3_client,
+    bucket_name: str,
+    s3_key: str,
+    body: bytes,
+    content_sha256: str,
+    content_encoding: Optional[str] = None,
+) -> bool:
+    """Upload one encoding of the feed unless S3 already has it.
+
+    Returns:
+        Whether the object was uploaded
+    """
+    if is_already_uploaded(s3_client, bucket_name, s3_key, body, content_sha256):
+        logger.info(f"RSS feed at {s3_key} is unchanged, skipping upload")
+        return False
+
+    extra_args = {"ContentEncoding": content_encoding} if content_encoding else {}
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=s3_key,
+        Body=body,
+        ContentType="application/rss+xml",
+        CacheControl="max-age=3600",  # Cache for 1 hour
+        Metadata={CONTENT_HASH_METADATA: content_sha256},
+        **extra_args,
+    )
+    rss_url = f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
+    logger.info(f"RSS feed uploaded successfully to: {rss_url}")
+    return True
+
+
+def upload_rss_feed(s3_client, rss_content: str) -> bool:
+    """Upload the generated RSS feed to S3, unless it is already there.
+
+    With RSS_GZIP=1 a gzip-encoded copy is also uploaded next to it, as
+    ``rss/<feed_name>.gz`` with ``Content-Encoding: gzip``.
+
+    Returns:
+        Whether anything was uploaded
+    """
     logger.info("Uploading RSS feed to S3...")
 
     bucket_name = os.getenv("S3_BUCKET_NAME")
     rss_feed_name = os.getenv("RSS_FEED_NAME", "podcast.xml")
     s3_key = f"rss/{rss_feed_name}"
+    body = rss_content.encode("utf-8")
+    content_sha256 = feed_hash(rss_content)
 
     try:
-        # Upload RSS feed with appropriate content type
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=s3_key,
-            Body=rss_content.encode("utf-8"),
-            ContentType="application/rss+xml",
-            CacheControl="max-age=3600",  # Cache for 1 hour
-        )
-
-        rss_url = f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
-        logger.info(f"RSS feed uploaded successfully to: {rss_url}")
+        uploaded = put_rss_object(s3_client, bucket_name, s3_key, body, content_sha256)
+        if is_gzip_enabled():
+            # mtime=0 keeps the compressed bytes the same for the same feed
+            uploaded |= put_rss_object(
+                s3_client,
+                bucket_name,
+                f"{s3_key}.gz",
+                gzip.compress(body, mtime=0),
+                content_sha256,
+                content_encoding="gzip",
+            )
+        return uploaded
 
     except ClientError as e:
-        raise S3AccessError(f"Failed to upload RSS feed: {e}") from e
+        raise s3_error("upload RSS feed", e) from e
 
 
 def save_rss_feed_locally(rss_content: str) -> None:
@@ -174,30 +318,76 @@ def save_rss_feed_locally(rss_content: str) -> None:
     logger.info(f"RSS feed saved locally to: {local_path}")
 
 
+def is_incremental() -> bool:
+    """Whether RSS_INCREMENTAL=1 asks to splice new episodes into the feed."""
+    return os.getenv("RSS_INCREMENTAL", "0") == "1"
+
+
 def update_rss_feed() -> None:
-    """Main function to update the RSS feed."""
+    """Main function to update the RSS feed.
+
+    With RSS_INCREMENTAL=1, and a local feed matching the recorded feed
+    state, only episodes added since the last run are listed and probed,
+    and their items are spliced into the existing feed.
+    """
     logger.info("Starting RSS feed update...")
 
     try:
         # Step 1: Connect to S3
         s3_client = get_s3_client()
 
-        # Step 2: List all podcast files
-        podcast_files = list_podcast_files(s3_client)
-
-        if not podcast_files:
-            logger.warning("No podcast files found in S3 bucket")
-            return
+        # Step 2: List the podcast files, or only the new ones
+        existing_feed = None
+        state = None
+        state_path = RSS_OUTPUT_DIR / FEED_STATE_NAME
+        if is_incremental():
+            state = load_feed_state(state_path)
+            existing_feed = read_spliceable_feed(
+                state,
+                RSS_OUTPUT_DIR / os.getenv("RSS_FEED_NAME", "podcast.xml"),
+                get_channel_settings(),
+            )
+        if existing_feed is not None:
+            logger.info(f"Updating the feed incrementally after {state['last_key']}")
+            podcast_files = list_podcast_files(s3_client, start_after=state["last_key"])
+            if not podcast_files:
+                logger.info("No new podcast files, the RSS feed is up to date")
+                return
+        else:
+            podcast_files = list_podcast_files(s3_client)
+            if not podcast_files:
+                logger.warning("No podcast files found in S3 bucket")
+                return
+
+        # Step 3: Look up episode durations, probing only new files
+        episode_metadata = get_episode_metadata(
+            s3_client,
+            podcast_files,
+            RSS_OUTPUT_DIR / EPISODE_CACHE_NAME,
+            prune=existing_feed is None,
+        )
 
-        # Step 3: Generate RSS feed content
-        rss_content = generate_rss_feed_content(podcast_files)
+        # Step 4: Generate RSS feed content
+        rss_content = generate_rss_feed_content(
+            podcast_files, episode_metadata, existing_feed
+        )
 
-        # Step 4: Save locally (for debugging)
+        # Step 5: Save locally (for debugging)
         save_rss_feed_locally(rss_content)
 
-        # Step 5: Upload to S3
+        # Step 6: Upload to S3
         upload_rss_feed(s3_client, rss_content)
 
+        # Step 7: Remember what was published for the next incremental run
+        if is_incremental():
+            save_feed_state(
+                state_path,
+                rss_content,
+                podcast_files,
+                get_channel_settings(),
+                state if existing_feed is not None else None,
+            )
+
         logger.info("RSS feed update completed successfully!")
 
     except (NoS3CredentialsError, S3AccessError, RSSGenerationError) as e:
@@ -0,0 +1,123 @@
+"""Duration and loudness sidecars for audio files.
+
+Each indexed file gets a ``<file>.json`` sidecar next to it with its
+duration, sample rate, channels, peak and integrated loudness, so the mixer
+can plan the timeline and normalization gains without decoding anything.
+Sidecars are written at ingest by the file-downloader and by the
+``index_memos`` command for files that arrived without one.
+
+A sidecar records the size and modification time of the file it describes;
+if the file changes, the sidecar is ignored until it is indexed again.
+"""
+
+import json
+import math
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+from pydub import AudioSegment  # type: ignore[import]
+
+from src.utils.loudness import SILENCE_DB, integrated_loudness
+
+# Version 2: integrated loudness is K-weighted and gated (LUFS)
+SIDECAR_VERSION = 2
+
+
+def sidecar_path(audio_path: Path) -> Path:
+    """Return where the sidecar of an audio file lives, e.g. memo.flac.json."""
+    return audio_path.with_name(f"{audio_path.name}.json")
+
+
+def to_db(ratio: float) -> float:
+    """Convert an amplitude ratio to dB, flooring silence at SILENCE_DB."""
+    return 20 * math.log10(ratio) if ratio > 0 else SILENCE_DB
+
+
+def measure_samples(samples: np.ndarray, sample_rate: int) -> Dict[str, Any]:
+    """Measure decoded audio for its sidecar.
+
+    Args:
+        samples: Float samples in [-1.0, 1.0) of shape (frames, channels)
+        sample_rate: Frames per second
+
+    Returns:
+        The duration (rounded like ``len(AudioSegment)``), format, peak as a
+        fraction of full scale and in dBFS, and integrated loudness in LUFS
+    """
+    frames, channels = samples.shape
+    peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    return {
+        "duration_ms": round(frames * 1000 / sample_rate),
+        "frames": frames,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "peak": peak,
+        "peak_dbfs": to_db(peak),
+        "integrated_loudness": integrated_loudness(samples, sample_rate),
+    }
+
+
+def segment_samples(segment: AudioSegment) -> np.ndarray:
+    """Return a segment's samples as floats in [-1.0, 1.0), shaped per frame."""
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[segment.sample_width]
+    samples = np.frombuffer(segment.raw_data, dtype=dtype).astype(np.float64)
+    samples /= float(2 ** (8 * segment.sample_width - 1))
+    return samples.reshape(-1, segment.channels)
+
+
+def write_sidecar(audio_path: Path, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Write the sidecar of an audio file, atomically.
+
+    Call it once the audio file is in its final place: the sidecar is tied
+    to the file's current size and modification time.
+
+    Returns:
+        The metadata as written
+    """
+    stat = audio_path.stat()
+    metadata = {
+        **metadata,
+        "version": SIDECAR_VERSION,
+        "size_bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    path = sidecar_path(audio_path)
+    # The temporary name has no audio suffix, so the mixer ignores it
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_name, path)
+    return metadata
+
+
+def read_sidecar(audio_path: Path) -> Optional[Dict[str, Any]]:
+    """Return the metadata of an audio file, or None if it is missing or stale."""
+    try:
+        metadata = json.loads(sidecar_path(audio_path).read_text())
+        stat = audio_path.stat()
+    except (OSError, ValueError):
+        return None
+    if (
+        metadata.get("version") != SIDECAR_VERSION
+        or metadata.get("size_bytes") != stat.st_size
+        or metadata.get("mtime_ns") != stat.st_mtime_ns
+    ):
+        return None
+    return metadata
+
+
+def index_file(audio_path: Path) -> Dict[str, Any]:
+    """Decode an audio file, measure it and write its sidecar.
+
+    Decodes with pydub, like the mixer does, so the duration and peak match
+    what the mixer would measure itself.
+
+    Returns:
+        The metadata as written
+    """
+    segment = AudioSegment.from_file(str(audio_path))
+    metadata = measure_samples(segment_samples(segment), segment.frame_rate)
+    return write_sidecar(audio_path, {**metadata, "sample_width": segment.sample_width})
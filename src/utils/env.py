@@ -0,0 +1,32 @@
+"""Integer settings read from environment variables.
+
+Every service validates its numeric settings the same way, with the same
+error messages, so a bad value fails fast and names the variable.
+"""
+
+import os
+
+
+def get_int_env(name: str, default: int) -> int:
+    """Read an integer setting from an environment variable."""
+    value_str = os.getenv(name, str(default))
+    try:
+        return int(value_str)
+    except ValueError as e:
+        raise ValueError(f"{name} must be an integer, got: {value_str}") from e
+
+
+def get_positive_int_env(name: str, default: int) -> int:
+    """Read a positive integer setting from an environment variable."""
+    value = get_int_env(name, default)
+    if value <= 0:
+        raise ValueError(f"{name} must be positive, got: {value}")
+    return value
+
+
+def get_non_negative_int_env(name: str, default: int) -> int:
+    """Read a zero or positive integer setting from an environment variable."""
+    value = get_int_env(name, default)
+    if value < 0:
+        raise ValueError(f"{name} must not be negative, got: {value}")
+    return value
@@ -0,0 +1,30 @@
+"""Content hashes of files, read in chunks so large audio never sits in memory.
+
+The downloader, the mixer's caches and the S3 publisher all identify files
+by the SHA-256 of their content, so they share these helpers.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Any, Optional
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def hash_file(path: Path, digest: Optional[Any] = None) -> Any:
+    """Feed a file's content into a hash (a new SHA-256 by default).
+
+    Passing a digest lets the caller keep hashing data that follows, e.g.
+    the rest of a resumed download.
+    """
+    if digest is None:
+        digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest
+
+
+def file_sha256(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    return hash_file(path).hexdigest()
@@ -0,0 +1,59 @@
+import datetime
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Optional
+
+# Touched by the file-downloader whenever new audio lands; the audio-mixer
+# watches it. It lives next to the memos so both containers can see it.
+VOICE_MEMOS_DIR = Path("data/voice-memos")
+NEW_AUDIO_FLAG_NAME = ".new-audio"
+
+
+def get_new_audio_flag(voice_dir: Optional[Path] = None) -> Path:
+    """
+    Returns the path of the new audio flag (NEW_AUDIO_FLAG overrides it)
+
+    Args:
+        voice_dir: The directory the memos are saved to (default:
+            data/voice-memos)
+    """
+    default = (voice_dir or VOICE_MEMOS_DIR) / NEW_AUDIO_FLAG_NAME
+    return Path(os.getenv("NEW_AUDIO_FLAG", str(default)))
+
+
+def signal_new_audio(paths: Iterable[Path], flag_path: Optional[Path] = None) -> None:
+    """
+    Announce that new audio files were saved.
+
+    The flag is replaced atomically, so its modification time always moves
+    forward and readers never see a half-written file.
+
+    Args:
+        paths: The files that were just saved
+        flag_path: The flag to write (default: get_new_audio_flag())
+    """
+    flag_path = flag_path or get_new_audio_flag()
+    flag_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=flag_path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "files": [Path(path).name for path in paths],
+            },
+            f,
+        )
+    os.replace(tmp_name, flag_path)
+
+
+def new_audio_signalled_at(flag_path: Optional[Path] = None) -> Optional[float]:
+    """
+    Returns when new audio was last announced (a Unix timestamp), or None
+    """
+    flag_path = flag_path or get_new_audio_flag()
+    try:
+        return flag_path.stat().st_mtime
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,136 @@
+"""A shared, lazily created S3 client.
+
+Creating a boto3 session and client loads the service model, which takes a
+noticeable fraction of a second, and every client has its own connection
+pool. The RSS updater and the podcast publisher therefore get one client per
+process from get_s3_client, tuned for many small concurrent requests:
+
+- a connection pool big enough for parallel probes and multipart uploads
+- adaptive retries, which back off when S3 throttles
+- TCP keepalive, so pooled connections survive between requests
+
+Credentials are not checked up front (that used to cost a head_bucket round
+trip per run); a bad key or a missing bucket surfaces on the first real
+request, and s3_error turns it into an S3AccessError.
+"""
+
+import functools
+import os
+from typing import Any, Optional
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from src.utils.env import get_positive_int_env
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+REQUIRED_ENV_VARS = ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME")
+DEFAULT_REGION = "us-east-1"
+DEFAULT_MAX_POOL_CONNECTIONS = 16
+DEFAULT_MAX_RETRIES = 5
+
+ACCESS_DENIED_CODES = {
+    "403",
+    "AccessDenied",
+    "InvalidAccessKeyId",
+    "SignatureDoesNotMatch",
+    "ExpiredToken",
+}
+NOT_FOUND_CODES = {"404", "NoSuchBucket"}
+
+
+class NoS3CredentialsError(Exception):
+    """Exception raised when AWS S3 credentials are not available."""
+
+
+class S3AccessError(Exception):
+    """Exception raised when S3 access fails."""
+
+
+def client_config(max_pool_connections: int, max_retries: int) -> Config:
+    """Build the botocore config of the shared client."""
+    return Config(
+        max_pool_connections=max_pool_connections,
+        # botocore's max_attempts doesn't count the first attempt
+        retries={"mode": "adaptive", "max_attempts": max_retries},
+        tcp_keepalive=True,
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def create_s3_client(
+    access_key_id: str,
+    secret_access_key: str,
+    session_token: Optional[str],
+    region: str,
+    endpoint_url: Optional[str],
+    max_pool_connections: int,
+    max_retries: int,
+) -> Any:
+    """Create a client; cached, so each set of settings gets one client."""
+    session = boto3.Session(
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        # Optional for temporary credentials
+        aws_session_token=session_token,
+        region_name=region,
+    )
+    if endpoint_url:
+        logger.info(f"Using custom S3 endpoint: {endpoint_url}")
+    return session.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        config=client_config(max_pool_connections, max_retries),
+    )
+
+
+def get_s3_client() -> Any:
+    """Return the process's S3 client, creating it on first use.
+
+    Reads AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_SESSION_TOKEN,
+    AWS_REGION (default us-east-1) and AWS_ENDPOINT_URL (for MinIO or other
+    S3-compatible services). S3_MAX_POOL_CONNECTIONS (default 16) sizes the
+    connection pool and S3_MAX_RETRIES (default 5) caps the retries of a
+    failed request. Clients are thread-safe, so the same one can be used from
+    worker threads.
+
+    Raises:
+        NoS3CredentialsError: If the credentials or S3_BUCKET_NAME are unset
+    """
+    missing_vars = [var for var in REQUIRED_ENV_VARS if not os.getenv(var)]
+    if missing_vars:
+        raise NoS3CredentialsError(
+            f"Missing required environment variables: {missing_vars}"
+        )
+    return create_s3_client(
+        os.environ["AWS_ACCESS_KEY_ID"],
+        os.environ["AWS_SECRET_ACCESS_KEY"],
+        os.getenv("AWS_SESSION_TOKEN"),
+        os.getenv("AWS_REGION", DEFAULT_REGION),
+        os.getenv("AWS_ENDPOINT_URL") or None,
+        get_positive_int_env("S3_MAX_POOL_CONNECTIONS", DEFAULT_MAX_POOL_CONNECTIONS),
+        get_positive_int_env("S3_MAX_RETRIES", DEFAULT_MAX_RETRIES),
+    )
+
+
+def reset_s3_client() -> None:
+    """Forget the shared clients, e.g. after the credentials changed."""
+    create_s3_client.cache_clear()
+
+
+def s3_error(action: str, error: ClientError) -> S3AccessError:
+    """Describe a failed S3 request, e.g. s3_error("upload the feed", e).
+
+    Since credentials are only checked by the first real request, this is
+    where access denied and missing buckets are told apart from other
+    failures.
+    """
+    code = error.response.get("Error", {}).get("Code")
+    if code in ACCESS_DENIED_CODES:
+        return S3AccessError(f"Access denied to S3 bucket, failed to {action}: {error}")
+    if code in NOT_FOUND_CODES:
+        return S3AccessError(f"S3 bucket not found, failed to {action}: {error}")
+    return S3AccessError(f"Failed to {action}: {error}")
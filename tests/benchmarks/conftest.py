@@ -0,0 +1,61 @@
+"""Collects mixer benchmark results and prints them after the run.
+
+Set MIXER_BENCHMARK_JSON to a path to also save the results as JSON, e.g.
+to compare two engine changes.
+"""
+
+import json
+import os
+import pathlib
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+RESULTS: List[Dict[str, Any]] = []
+
+
+RecordBenchmark = Callable[[int, float, Dict[str, float]], None]
+
+
+@pytest.fixture(scope="session")
+def record_benchmark() -> RecordBenchmark:
+    """Record timings for the summary, e.g. record(memos, audio_s, timings).
+
+    timings maps each stage to its wall-clock seconds; audio_s is the
+    seconds of audio the stage processed, for the throughput column.
+    """
+
+    def record(memos: int, audio_s: float, timings: Dict[str, float]) -> None:
+        for stage, seconds in timings.items():
+            RESULTS.append(
+                {
+                    "memos": memos,
+                    "stage": stage,
+                    "seconds": seconds,
+                    "audio_s": audio_s,
+                    "audio_s_per_wall_s": audio_s / seconds if seconds else None,
+                }
+            )
+
+    return record
+
+
+def pytest_terminal_summary(terminalreporter) -> None:
+    if not RESULTS:
+        return
+    terminalreporter.section("mixer benchmarks")
+    terminalreporter.write_line(
+        f"{'memos':>6} {'stage':<22} {'seconds':>9} {'audio s/s':>10}"
+    )
+    for result in RESULTS:
+        throughput = result["audio_s_per_wall_s"]
+        terminalreporter.write_line(
+            f"{result['memos']:>6} {result['stage']:<22} "
+            f"{result['seconds']:>9.3f} "
+            f"{'-' if throughput is None else f'{throughput:.1f}':>10}"
+        )
+
+    json_path = os.getenv("MIXER_BENCHMARK_JSON")
+    if json_path:
+        pathlib.Path(json_path).write_text(json.dumps(RESULTS, indent=2))
+        terminalreporter.write_line(f"Saved benchmark results to {json_path}")
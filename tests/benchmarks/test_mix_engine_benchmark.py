@@ -0,0 +1,79 @@
+"""Benchmark the NumPy mixing engine against the chained pydub overlays."""
+
+import time
+
+import pytest
+
+from src.mixer.engine import (
+    build_music_envelope,
+    ducking_envelope,
+    ducking_gains,
+    segment_to_array,
+    voice_activity,
+)
+from src.mixer.generate_audio import (
+    GAP_FADE_MS,
+    build_voice_track,
+    create_final_mix,
+    create_final_mix_pydub,
+)
+from tests.benchmarks.utils.synthetic_audio import make_music, make_voice_memos
+
+MEMO_COUNT = 32
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_numpy_engine_against_pydub_overlays(record_benchmark, monkeypatch):
+    """Time the single-pass NumPy mix against chained overlays."""
+    voice_track, gap_ranges = build_voice_track(make_voice_memos(MEMO_COUNT))
+    bg_music = make_music(60_000)
+
+    start = time.perf_counter()
+    create_final_mix_pydub(voice_track, bg_music, gap_ranges)
+    pydub_seconds = time.perf_counter() - start
+
+    monkeypatch.setenv("MIXER_ENGINE", "numpy")
+    start = time.perf_counter()
+    create_final_mix(voice_track, bg_music, gap_ranges)
+    numpy_seconds = time.perf_counter() - start
+
+    record_benchmark(
+        MEMO_COUNT,
+        len(voice_track) / 1000,
+        {"mix_pydub": pydub_seconds, "mix_numpy": numpy_seconds},
+    )
+
+
+def test_voice_ducking_envelope_against_gap_envelope(record_benchmark):
+    """Time deriving the music gains from voice activity against the gaps."""
+    voice_track, gap_ranges = build_voice_track(make_voice_memos(MEMO_COUNT))
+    voice = segment_to_array(voice_track)
+    frame_rate = voice_track.frame_rate
+    ducking = {
+        "threshold_db": -45,
+        "attack_ms": 300,
+        "release_ms": 1500,
+        "hold_ms": 1000,
+    }
+
+    start = time.perf_counter()
+    build_music_envelope(len(voice), frame_rate, gap_ranges, GAP_FADE_MS, -10, -40)
+    gaps_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gains = ducking_gains(
+        voice_activity(voice, frame_rate, ducking["threshold_db"]),
+        frame_rate,
+        ducking,
+        -10,
+        -40,
+    )
+    ducking_envelope(gains, frame_rate, len(voice))
+    voice_seconds = time.perf_counter() - start
+
+    record_benchmark(
+        MEMO_COUNT,
+        len(voice_track) / 1000,
+        {"envelope_gaps": gaps_seconds, "envelope_voice": voice_seconds},
+    )
@@ -0,0 +1,62 @@
+"""Benchmark loudness normalization against the peak-normalize path.
+
+Peak normalization (``pydub.effects.normalize``) is one scan for the peak
+and one gain; loudness normalization adds the K-weighted, gated measurement.
+Both are timed on the same synthetic memos, without sidecars, and with
+sidecars supplying the measurement, plus the master on a long stereo mix.
+"""
+
+import time
+
+import pytest
+from pydub.effects import normalize  # type: ignore[import]
+
+from src.mixer.generate_audio import normalize_master, normalize_voice_memo
+from src.utils.audio_metadata import measure_samples, segment_samples
+from tests.benchmarks.utils.synthetic_audio import make_music, make_voice_memos
+
+MEMO_COUNT = 50
+MASTER_MS = 10 * 60_000
+TARGET_LUFS = -18.0
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_loudness_normalize_memos(record_benchmark):
+    """Time loudness normalization of the memos against peak normalization."""
+    memos = make_voice_memos(MEMO_COUNT)
+    audio_s = sum(len(memo) for memo in memos) / 1000
+    sidecars = [
+        {
+            **measure_samples(segment_samples(memo), memo.frame_rate),
+            "sample_width": memo.sample_width,
+        }
+        for memo in memos
+    ]
+
+    timings = {}
+    for stage, func in [
+        ("normalize_peak", normalize),
+        ("normalize_loudness", lambda m: normalize_voice_memo(m, None, TARGET_LUFS)),
+    ]:
+        start = time.perf_counter()
+        for memo in memos:
+            func(memo)
+        timings[stage] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for memo, sidecar in zip(memos, sidecars, strict=True):
+        normalize_voice_memo(memo, sidecar, TARGET_LUFS)
+    timings["loudness_from_sidecar"] = time.perf_counter() - start
+
+    record_benchmark(MEMO_COUNT, audio_s, timings)
+
+
+def test_loudness_normalize_master(record_benchmark):
+    final_mix = make_music(MASTER_MS)
+
+    start = time.perf_counter()
+    normalize_master(final_mix, TARGET_LUFS)
+    seconds = time.perf_counter() - start
+
+    record_benchmark(0, MASTER_MS / 1000, {"normalize_master": seconds})
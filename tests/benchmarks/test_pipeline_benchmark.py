@@ -0,0 +1,97 @@
+"""Benchmark each mixer pipeline stage on synthetic episodes.
+
+Episodes of 1, 10, 50 and 200 memos of varying length are generated as WAV
+files, then every stage of the in-memory pipeline is timed on its own.
+Throughput is reported as seconds of episode audio per wall-clock second.
+Caches and incremental rendering are disabled so every run measures a cold
+render; export is skipped when ffmpeg is not installed.
+"""
+
+import shutil
+import time
+
+import pytest
+
+from src.mixer import generate_audio
+from tests.benchmarks.utils.synthetic_audio import (
+    make_music,
+    make_voice_memos,
+    wav_duration_ms,
+    write_voice_memos,
+)
+
+MEMO_COUNTS = [1, 10, 50, 200]
+MEMO_MIN_MS = 2_000
+MEMO_MAX_MS = 15_000
+FRAME_RATE = 22050  # keeps the 200-memo episode within a few hundred MB
+MUSIC_TRACK_MS = 120_000
+MUSIC_TRACKS = 3
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope="module", params=MEMO_COUNTS, ids=lambda n: f"{n}-memos")
+def episode(request, tmp_path_factory):
+    """Voice memo and music directories for an episode of N memos."""
+    root = tmp_path_factory.mktemp(f"episode-{request.param}")
+    voice_dir = root / "voice-memos"
+    music_dir = root / "background-music"
+    voice_dir.mkdir()
+    music_dir.mkdir()
+
+    write_voice_memos(
+        voice_dir,
+        make_voice_memos(
+            request.param,
+            min_ms=MEMO_MIN_MS,
+            max_ms=MEMO_MAX_MS,
+            frame_rate=FRAME_RATE,
+        ),
+    )
+    music = make_music(MUSIC_TRACK_MS, frame_rate=FRAME_RATE)
+    for idx in range(MUSIC_TRACKS):
+        music.export(music_dir / f"track-{idx}.wav", format="wav")
+    return request.param, root
+
+
+def test_pipeline_stages(episode, record_benchmark, monkeypatch):
+    memo_count, root = episode
+    monkeypatch.setattr(generate_audio, "VOICE_DIR", root / "voice-memos")
+    monkeypatch.setattr(generate_audio, "MUSIC_DIR", root / "background-music")
+    monkeypatch.setattr(generate_audio, "PODCAST_OUTPUT_DIR", root / "podcast")
+    monkeypatch.setattr(generate_audio, "probe_duration_ms", wav_duration_ms)
+    monkeypatch.setenv("MIXER_ENGINE", "numpy")
+    monkeypatch.setenv("MIXER_DECODE_CACHE_MAX_MB", "0")
+
+    timings = {}
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    voice_segs = timed("load_voice_memos", generate_audio.load_voice_memos)
+    voice_track, gap_ranges = timed(
+        "build_voice_track", generate_audio.build_voice_track, voice_segs
+    )
+    bg_music = timed(
+        "load_background_music",
+        generate_audio.load_background_music,
+        generate_audio.music_length_needed(len(voice_track)),
+    )
+    final_mix = timed(
+        "create_final_mix",
+        generate_audio.create_final_mix,
+        voice_track,
+        bg_music,
+        gap_ranges,
+    )
+    if shutil.which("ffmpeg"):
+        timed("export_mix", generate_audio.export_mix, final_mix)
+
+    timings["total"] = sum(timings.values())
+    record_benchmark(memo_count, len(final_mix) / 1000, timings)
+
+    assert len(voice_segs) == memo_count
+    assert len(final_mix) == len(voice_track)
@@ -0,0 +1,38 @@
+"""Benchmark silence trimming of decoded memos."""
+
+import time
+
+import pytest
+from pydub import AudioSegment  # type: ignore[import]
+
+from src.mixer.generate_audio import (
+    DEFAULT_TRIM_PAD_MS,
+    DEFAULT_TRIM_THRESHOLD_DB,
+    trim_voice_memo,
+)
+from tests.benchmarks.utils.synthetic_audio import VOICE_FRAME_RATE, make_voice_memos
+
+MEMO_COUNT = 60
+SILENCE_MS = 3_000  # before and after each memo
+TRIM = {
+    "threshold_db": DEFAULT_TRIM_THRESHOLD_DB,
+    "pad_ms": DEFAULT_TRIM_PAD_MS,
+    "max_pause_ms": 1_000,
+}
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_trim_silence_of_decoded_memos(record_benchmark):
+    """Time trimming the silence of 60 decoded memos."""
+    silence = AudioSegment.silent(SILENCE_MS, frame_rate=VOICE_FRAME_RATE)
+    memos = [silence + memo + silence for memo in make_voice_memos(MEMO_COUNT)]
+    audio_s = sum(len(memo) for memo in memos) / 1000
+
+    start = time.perf_counter()
+    trimmed = [trim_voice_memo(memo, TRIM) for memo in memos]
+    seconds = time.perf_counter() - start
+
+    removed_s = audio_s - sum(len(memo) for memo in trimmed) / 1000
+    record_benchmark(MEMO_COUNT, audio_s, {"trim_silence": seconds})
+    assert removed_s > MEMO_COUNT * 2 * (SILENCE_MS - DEFAULT_TRIM_PAD_MS) / 1000 - 1
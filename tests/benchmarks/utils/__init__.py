@@ -0,0 +1 @@
+# Benchmark test utilities
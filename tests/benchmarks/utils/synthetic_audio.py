@@ -0,0 +1,79 @@
+"""Synthetic voice memo and music fixtures for mixer benchmarks."""
+
+import pathlib
+import wave
+from typing import List
+
+import numpy as np
+from pydub import AudioSegment  # type: ignore[import]
+
+from src.mixer.engine import array_to_segment
+
+VOICE_FRAME_RATE = 44100
+MUSIC_FRAME_RATE = 44100
+
+
+def make_tone(
+    duration_ms: int,
+    frequency: float,
+    frame_rate: int = VOICE_FRAME_RATE,
+    channels: int = 1,
+    amplitude: float = 0.3,
+) -> AudioSegment:
+    """Generate a sine tone as an AudioSegment."""
+    num_frames = int(duration_ms * frame_rate / 1000)
+    t = np.arange(num_frames, dtype=np.float32) / frame_rate
+    samples = (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+    return array_to_segment(
+        np.repeat(samples[:, np.newaxis], channels, axis=1), frame_rate
+    )
+
+
+def make_voice_memos(
+    count: int,
+    seed: int = 0,
+    min_ms: int = 5_000,
+    max_ms: int = 20_000,
+    frame_rate: int = VOICE_FRAME_RATE,
+) -> List[AudioSegment]:
+    """Generate mono "voice memos" of varying length (5-20 seconds by default)."""
+    rng = np.random.default_rng(seed)
+    return [
+        make_tone(
+            int(rng.integers(min_ms, max_ms)),
+            float(rng.uniform(150, 400)),
+            frame_rate=frame_rate,
+        )
+        for _ in range(count)
+    ]
+
+
+def make_music(
+    duration_ms: int, frame_rate: int = MUSIC_FRAME_RATE, channels: int = 2
+) -> AudioSegment:
+    """Generate a "music" bed (stereo by default)."""
+    return make_tone(
+        duration_ms,
+        440.0,
+        frame_rate=frame_rate,
+        channels=channels,
+        amplitude=0.5,
+    )
+
+
+def write_voice_memos(
+    directory: pathlib.Path, voice_segs: List[AudioSegment]
+) -> List[pathlib.Path]:
+    """Write memos as WAV files named like downloaded attachments."""
+    paths = []
+    for idx, seg in enumerate(voice_segs):
+        path = directory / f"2025-01-01_10-{idx // 60:02d}-{idx % 60:02d}-memo.wav"
+        seg.export(path, format="wav")
+        paths.append(path)
+    return paths
+
+
+def wav_duration_ms(path: pathlib.Path) -> int:
+    """Read a WAV file's duration from its header, standing in for ffprobe."""
+    with wave.open(str(path)) as f:
+        return round(f.getnframes() * 1000 / f.getframerate())
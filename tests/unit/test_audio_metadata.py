@@ -0,0 +1,59 @@
+"""Tests for audio sidecar metadata."""
+
+import math
+
+import numpy as np
+import pytest
+
+from src.utils.audio_metadata import (
+    SILENCE_DB,
+    measure_samples,
+    read_sidecar,
+    sidecar_path,
+    write_sidecar,
+)
+
+
+def test_measure_samples():
+    samples = np.zeros((8000, 2))
+    samples[:, 0] = 0.5 * np.sin(2 * np.pi * 997 * np.arange(8000) / 8000)
+
+    metadata = measure_samples(samples, 8000)
+
+    assert metadata["duration_ms"] == 1000
+    assert (metadata["sample_rate"], metadata["channels"]) == (8000, 2)
+    assert metadata["peak"] == pytest.approx(0.5, abs=1e-3)
+    assert metadata["peak_dbfs"] == pytest.approx(-6.02, abs=0.01)
+    # A full-scale 997Hz sine in one channel reads -3.01 LUFS
+    assert metadata["integrated_loudness"] == pytest.approx(
+        -3.01 + 20 * math.log10(0.5), abs=0.1
+    )
+
+
+def test_measure_silence():
+    metadata = measure_samples(np.zeros((100, 1)), 8000)
+
+    assert metadata["peak_dbfs"] == SILENCE_DB
+    assert metadata["integrated_loudness"] == SILENCE_DB
+
+
+def test_sidecar_is_ignored_once_the_file_changes(tmp_path):
+    audio = tmp_path / "memo.wav"
+    audio.write_bytes(b"audio")
+
+    write_sidecar(audio, {"duration_ms": 1000})
+
+    assert sidecar_path(audio) == tmp_path / "memo.wav.json"
+    assert read_sidecar(audio)["duration_ms"] == 1000
+
+    audio.write_bytes(b"other audio")
+    assert read_sidecar(audio) is None
+
+
+def test_missing_or_corrupt_sidecar(tmp_path):
+    audio = tmp_path / "memo.wav"
+    audio.write_bytes(b"audio")
+    assert read_sidecar(audio) is None
+
+    sidecar_path(audio).write_text("{not json")
+    assert read_sidecar(audio) is None
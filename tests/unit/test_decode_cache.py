@@ -0,0 +1,156 @@
+"""Tests for the mixer's decode cache."""
+
+import os
+import pathlib
+
+import numpy as np
+import pytest
+
+from src.mixer import decode_cache
+from src.mixer.decode_cache import (
+    DecodeCache,
+    cache_key,
+    decode_segment,
+    get_decode_cache,
+)
+from src.mixer.engine import array_to_segment
+
+
+@pytest.fixture
+def cache_env(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("MIXER_DECODE_CACHE_DIR", str(cache_dir))
+    monkeypatch.setenv("MIXER_DECODE_CACHE_MAX_MB", "1")
+    return cache_dir
+
+
+def test_store_and_load_round_trip(tmp_path):
+    cache = DecodeCache(tmp_path, max_bytes=1024 * 1024)
+    samples = np.arange(20, dtype=np.int16).reshape(-1, 2)
+
+    cache.store("ab" * 32, samples, 44100)
+    loaded, frame_rate = cache.load("ab" * 32)
+
+    assert frame_rate == 44100
+    assert loaded.dtype == np.int16
+    assert np.array_equal(loaded, samples)
+
+
+def test_info_is_stored_alongside_the_entry(tmp_path):
+    cache = DecodeCache(tmp_path, max_bytes=1024 * 1024)
+    samples = np.zeros((10, 1), dtype=np.int16)
+
+    cache.store("ab" * 32, samples, 8000, {"trimmed_ms": 250})
+    cache.store("cd" * 32, samples, 8000)
+
+    assert cache.load_info("ab" * 32) == {"trimmed_ms": 250}
+    assert cache.load_info("cd" * 32) is None
+
+
+def test_load_missing_entry_returns_none(tmp_path):
+    assert DecodeCache(tmp_path, max_bytes=1024).load("cd" * 32) is None
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"WBPC", b"JUNK" + bytes(12), b"WBPC" + bytes(12) + b"\x01\x02\x03"],
+    ids=["empty", "truncated_header", "bad_magic", "bad_dtype"],
+)
+def test_corrupt_entry_is_a_miss_and_deleted(tmp_path, data):
+    cache = DecodeCache(tmp_path, max_bytes=1024 * 1024)
+    key = "ef" * 32
+    entry = cache._entry_path(key)
+    entry.parent.mkdir(parents=True)
+    entry.write_bytes(data)
+
+    assert cache.load(key) is None
+    assert not entry.exists()
+
+
+def test_truncated_samples_are_a_miss(tmp_path):
+    cache = DecodeCache(tmp_path, max_bytes=1024 * 1024)
+    key = "ab" * 32
+    cache.store(key, np.arange(20, dtype=np.int16).reshape(-1, 2), 44100)
+    entry = cache._entry_path(key)
+    entry.write_bytes(entry.read_bytes()[:-3])
+
+    assert cache.load(key) is None
+    assert not entry.exists()
+
+
+def test_evict_skips_entries_removed_by_another_worker(tmp_path, monkeypatch):
+    samples = np.zeros((1000, 1), dtype=np.float32)
+    cache = DecodeCache(tmp_path, max_bytes=10_000)
+    for key in ["01" * 32, "02" * 32]:
+        cache.store(key, samples, 8000)
+    gone = cache._entry_path("01" * 32)
+    listed = sorted(tmp_path.glob("*/*.pcm"))
+    gone.unlink()
+    monkeypatch.setattr(pathlib.Path, "glob", lambda self, pattern: iter(listed))
+
+    assert cache.evict() == 0
+
+
+def test_cache_key_depends_on_params():
+    assert cache_key("abc", {"frame_rate": 44100}) != cache_key(
+        "abc", {"frame_rate": 22050}
+    )
+    assert cache_key("abc", {"a": 1, "b": 2}) == cache_key("abc", {"b": 2, "a": 1})
+
+
+def test_evicts_least_recently_used(tmp_path):
+    samples = np.zeros((1000, 1), dtype=np.float32)  # ~4KB per entry
+    cache = DecodeCache(tmp_path, max_bytes=10_000)
+    keys = ["01" * 32, "02" * 32, "03" * 32]
+
+    for age, key in enumerate(keys[:2]):
+        cache.store(key, samples, 8000, {"age": age})
+        entry = cache._entry_path(key)
+        os.utime(entry, (1000 + age, 1000 + age))
+    cache.load(keys[0])  # touch the oldest entry so it becomes most recent
+    cache.store(keys[2], samples, 8000)
+
+    assert cache.load(keys[0]) is not None
+    assert cache.load(keys[1]) is None
+    assert cache.load_info(keys[1]) is None
+    assert cache.load(keys[2]) is not None
+
+
+def test_store_only_scans_the_cache_when_it_may_be_full(tmp_path, monkeypatch):
+    samples = np.zeros((1000, 1), dtype=np.float32)  # ~4KB per entry
+    cache = DecodeCache(tmp_path, max_bytes=10_000)
+    scans = []
+    evict = DecodeCache.evict
+    monkeypatch.setattr(
+        DecodeCache, "evict", lambda self: scans.append(1) or evict(self)
+    )
+
+    for key in ["01" * 32, "02" * 32]:
+        cache.store(key, samples, 8000)
+    assert len(scans) == 1  # the first store learns the cache's size
+
+    cache.store("03" * 32, samples, 8000)
+    assert len(scans) == 2
+    assert len(list(tmp_path.glob("*/*.pcm"))) == 2
+
+
+def test_decode_segment_skips_decoder_on_hit(tmp_path, cache_env, monkeypatch):
+    path = tmp_path / "memo.wav"
+    segment = array_to_segment(np.full((800, 1), 0.25, dtype=np.float32), 8000)
+    segment.export(path, format="wav")
+
+    first = decode_segment(path)
+
+    def fail_from_file(*args, **kwargs):
+        raise AssertionError("decoder should not run on a cache hit")
+
+    monkeypatch.setattr(decode_cache.AudioSegment, "from_file", fail_from_file)
+    second = decode_segment(path)
+
+    assert second.raw_data == first.raw_data
+    assert second.frame_rate == first.frame_rate
+
+
+def test_cache_disabled_with_zero_size(monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_CACHE_MAX_MB", "0")
+    assert get_decode_cache() is None
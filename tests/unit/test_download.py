@@ -1,17 +1,122 @@
+import asyncio
+import collections
 import datetime
-from unittest.mock import ANY, AsyncMock, Mock
+import hashlib
+from unittest.mock import AsyncMock, Mock
 
 import pytest
+import pytest_asyncio
 
+from src.file_downloader import download, ingest
 from src.file_downloader.download import (
     COMPLETED_EMOJI,
     REPEAT_EMOJI,
+    AttachmentSizeMismatchError,
+    GatewayDownloader,
     add_white_check_mark,
+    get_channel_configs,
+    get_download_concurrency,
+    get_downloader_mode,
     has_repeat_emoji,
     has_white_check_mark,
+    parse_channel_configs,
+    partial_path,
     perform_download,
+    process_channels,
     process_messages,
 )
+from src.file_downloader.state import get_download_state
+from src.utils.new_audio import new_audio_signalled_at
+
+
+class FakeResponse:
+    """Enough of an aiohttp response for stream_attachment."""
+
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+        self.content = self
+
+    def raise_for_status(self):
+        pass
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start : start + size]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """
+    Serves attachment URLs from fetch coroutines; honours Range headers
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+
+    def get(self, url, headers=None):
+        headers = headers or {}
+        self.requests.append({"url": url, "headers": headers})
+        return self._respond(url, headers)
+
+    def _respond(self, url, headers):
+        session = self
+
+        class Pending:
+            async def __aenter__(self):
+                body = await session.routes[url]()
+                if "Range" in headers:
+                    offset = int(headers["Range"][len("bytes=") : -1])
+                    self.response = FakeResponse(206, body[offset:])
+                else:
+                    self.response = FakeResponse(200, body)
+                return self.response
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Pending()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture(autouse=True)
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(download, "VOICE_MEMOS_DIR", tmp_path)
+    monkeypatch.setenv("DOWNLOADER_STATE_DB", str(tmp_path / "state.sqlite3"))
+    monkeypatch.setenv("NEW_AUDIO_FLAG", str(tmp_path / "flag" / ".new-audio"))
+    session = FakeSession()
+    monkeypatch.setattr(download.aiohttp, "ClientSession", lambda: session)
+    return session
+
+
+async def audio_body():
+    return b"audio"
+
+
+def make_attachment(session, attachment_id, filename, fetch=audio_body, size=5):
+    """
+    An attachment served by the fake session. attachment.fetch records how
+    often its content was requested.
+    """
+    attachment = Mock()
+    attachment.id = attachment_id
+    attachment.filename = filename
+    attachment.url = f"https://cdn.example/{attachment_id}/{filename}"
+    attachment.size = size
+    attachment.fetch = AsyncMock(side_effect=fetch)
+    session.routes[attachment.url] = attachment.fetch
+    return attachment
 
 
 # Fixture for a mock Discord message
@@ -57,21 +162,23 @@ async def test_perform_download_no_attachments(mock_message):
 
 
 @pytest.mark.asyncio
-async def test_perform_download_with_audio_file():
+async def test_perform_download_with_audio_file(session, tmp_path):
     # Create a mock message
     mock_message = Mock()
     mock_message.reactions = []
     # Create a mock attachment
-    mock_attachment = AsyncMock()
-    mock_attachment.filename = "test.mp3"
+    mock_attachment = make_attachment(session, 10, "test.mp3")
     mock_message.attachments = [mock_attachment]
     mock_message.created_at = datetime.datetime.now()
     mock_message.author = Mock()
     mock_message.author.name = "tester"
     mock_message.id = 1
 
-    await perform_download(mock_message)
-    mock_attachment.save.assert_called_once_with(ANY)
+    [record] = await perform_download(mock_message)
+    mock_attachment.fetch.assert_called_once()
+    assert record["path"].read_bytes() == b"audio"
+    assert record["sha256"] == hashlib.sha256(b"audio").hexdigest()
+    assert [p.name for p in tmp_path.iterdir()] == [record["path"].name]
 
 
 @pytest.mark.asyncio
@@ -99,7 +206,7 @@ class AsyncIterList:
 
 
 @pytest.mark.asyncio
-async def test_process_messages_with_checkmark():
+async def test_process_messages_with_checkmark(session):
     # Create a mock message with checkmark
     mock_message = AsyncMock()
     check_reaction = Mock()
@@ -112,24 +219,24 @@ async def test_process_messages_with_checkmark():
     mock_message.id = 123
 
     # Create a mock attachment
-    mock_attachment = AsyncMock()
-    mock_attachment.filename = "test.mp3"
+    mock_attachment = make_attachment(session, 10, "test.mp3")
     mock_message.attachments = [mock_attachment]
     mock_message.add_reaction = AsyncMock()
 
     # Create mock channel that returns our message
     mock_channel = AsyncMock()
+    mock_channel.id = 1
     mock_channel.history = lambda limit: AsyncIterList([mock_message])
 
     # Call process_messages
     await process_messages(mock_channel)
 
-    # Verify that save was NOT called since message had checkmark
-    mock_attachment.save.assert_not_called()
+    # Verify that nothing was downloaded since message had checkmark
+    mock_attachment.fetch.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_process_messages_with_checkmark_and_repeat():
+async def test_process_messages_with_checkmark_and_repeat(session):
     # Create a mock message with both checkmark and repeat emoji
     mock_message = AsyncMock()
     check_reaction = Mock()
@@ -144,17 +251,429 @@ async def test_process_messages_with_checkmark_and_repeat():
     mock_message.id = 456
 
     # Create a mock attachment
-    mock_attachment = AsyncMock()
-    mock_attachment.filename = "test.mp3"
+    mock_attachment = make_attachment(session, 10, "test.mp3")
     mock_message.attachments = [mock_attachment]
     mock_message.add_reaction = AsyncMock()
 
     # Create mock channel that returns our message
     mock_channel = AsyncMock()
+    mock_channel.id = 1
     mock_channel.history = lambda limit: AsyncIterList([mock_message])
 
     # Call process_messages
     await process_messages(mock_channel)
 
-    # Verify that save WAS called since message had repeat emoji
-    mock_attachment.save.assert_called_once_with(ANY)
+    # Verify that it WAS downloaded since message had repeat emoji
+    mock_attachment.fetch.assert_called_once()
+
+
+def make_audio_message(session, message_id, attachment_count, events, fetch=None):
+    """A new (unmarked) message whose saves and reactions are logged to events."""
+    message = AsyncMock()
+    message.reactions = []
+    message.created_at = datetime.datetime.now()
+    message.author = Mock()
+    message.author.name = "tester"
+    message.id = message_id
+    message.attachments = []
+    for idx in range(attachment_count):
+        filename = f"{message_id}-{idx}.mp3"
+
+        async def default_fetch(name=filename):
+            await asyncio.sleep(0.01)
+            events.append(("save", name))
+            return b"audio"
+
+        message.attachments.append(
+            make_attachment(
+                session, message_id * 100 + idx, filename, fetch or default_fetch
+            )
+        )
+
+    async def add_reaction(emoji):
+        events.append(("react", message_id))
+
+    message.add_reaction = AsyncMock(side_effect=add_reaction)
+    return message
+
+
+@pytest.fixture
+def no_reaction_delay(monkeypatch):
+    monkeypatch.setattr(download, "REACTION_INTERVAL_S", 0)
+
+
+@pytest.mark.asyncio
+async def test_process_messages_bounds_concurrent_downloads(
+    session, monkeypatch, no_reaction_delay
+):
+    monkeypatch.setenv("DOWNLOAD_CONCURRENCY", "2")
+    active = 0
+    max_active = 0
+
+    async def tracking_fetch():
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return b"audio"
+
+    events = []
+    messages = [
+        make_audio_message(session, i, 2, events, tracking_fetch) for i in range(4)
+    ]
+    mock_channel = AsyncMock()
+    mock_channel.id = 1
+    mock_channel.history = lambda limit: AsyncIterList(list(messages))
+
+    await process_messages(mock_channel)
+
+    assert max_active == 2
+    for message in messages:
+        message.add_reaction.assert_called_once_with(COMPLETED_EMOJI)
+
+
+@pytest.mark.asyncio
+async def test_checkmark_only_after_all_attachments_saved(session, no_reaction_delay):
+    events = []
+    message = make_audio_message(session, 1, 3, events)
+    mock_channel = AsyncMock()
+    mock_channel.id = 1
+    mock_channel.history = lambda limit: AsyncIterList([message])
+
+    await process_messages(mock_channel)
+
+    assert [kind for kind, _ in events] == ["save", "save", "save", "react"]
+
+
+@pytest.mark.asyncio
+async def test_failed_download_gets_no_checkmark(session, no_reaction_delay):
+    async def failing_fetch():
+        raise OSError("connection reset")
+
+    events = []
+    failed = make_audio_message(session, 1, 2, events, failing_fetch)
+    succeeded = make_audio_message(session, 2, 1, events)
+    mock_channel = AsyncMock()
+    mock_channel.id = 1
+    mock_channel.history = lambda limit: AsyncIterList([failed, succeeded])
+
+    await process_messages(mock_channel)
+
+    failed.add_reaction.assert_not_called()
+    succeeded.add_reaction.assert_called_once_with(COMPLETED_EMOJI)
+
+
+@pytest.mark.parametrize("value", ["zero", "0", "-3"])
+def test_get_download_concurrency_rejects_invalid_values(monkeypatch, value):
+    monkeypatch.setenv("DOWNLOAD_CONCURRENCY", value)
+    with pytest.raises(ValueError):
+        get_download_concurrency()
+
+
+class FakeChannel:
+    """A channel whose history honours limit, after and oldest_first."""
+
+    def __init__(self, messages):
+        self.id = 1
+        self.messages = messages
+        self.history_calls = []
+
+    def history(self, limit, after=None, oldest_first=None):
+        self.history_calls.append({"limit": limit, "after": after})
+        messages = sorted(self.messages, key=lambda m: m.id, reverse=True)
+        if limit is not None:
+            messages = messages[:limit]
+        if after is not None:
+            messages = [m for m in messages if m.id > after.id]
+        if oldest_first:
+            messages.reverse()
+        return AsyncIterList(messages)
+
+
+@pytest.mark.asyncio
+async def test_second_run_fetches_only_messages_after_last_seen(
+    session, no_reaction_delay
+):
+    events = []
+    first = make_audio_message(session, 1, 1, events)
+    channel = FakeChannel([first])
+    await process_messages(channel)
+
+    # The reaction never landed, but the index remembers the message
+    first.reactions = []
+    second = make_audio_message(session, 2, 1, events)
+    channel.messages.append(second)
+    await process_messages(channel)
+
+    assert channel.history_calls[1]["after"].id == 1
+    assert channel.history_calls[1]["limit"] is None
+    assert first.attachments[0].fetch.call_count == 1
+    assert second.attachments[0].fetch.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_message_is_fetched_again(session, no_reaction_delay):
+    async def failing_fetch():
+        raise OSError("connection reset")
+
+    events = []
+    channel = FakeChannel(
+        [
+            make_audio_message(session, 1, 1, events),
+            make_audio_message(session, 2, 1, events, failing_fetch),
+            make_audio_message(session, 3, 1, events),
+        ]
+    )
+    await process_messages(channel)
+    await process_messages(channel)
+
+    assert channel.history_calls[1]["after"].id == 1
+    assert channel.messages[1].attachments[0].fetch.call_count == 2
+    assert channel.messages[2].attachments[0].fetch.call_count == 1
+
+
+def make_message(*attachments):
+    message = Mock()
+    message.reactions = []
+    message.created_at = datetime.datetime(2025, 1, 2, 3, 4, 5)
+    message.author = Mock()
+    message.author.name = "tester"
+    message.id = 1
+    message.attachments = list(attachments)
+    return message
+
+
+@pytest.mark.asyncio
+async def test_size_mismatch_leaves_no_file(session, tmp_path):
+    attachment = make_attachment(session, 10, "test.mp3", size=1000)
+
+    with pytest.raises(AttachmentSizeMismatchError):
+        await perform_download(make_message(attachment))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_download_resumes_from_partial_file(session, tmp_path):
+    async def fetch():
+        return b"0123456789"
+
+    attachment = make_attachment(session, 10, "test.mp3", fetch, size=10)
+    save_path = tmp_path / "2025-01-02_03-04-05-test.mp3"
+    partial_path(save_path).write_bytes(b"0123")
+
+    [record] = await perform_download(make_message(attachment))
+
+    assert session.requests[0]["headers"] == {"Range": "bytes=4-"}
+    assert save_path.read_bytes() == b"0123456789"
+    assert record["sha256"] == hashlib.sha256(b"0123456789").hexdigest()
+    assert not partial_path(save_path).exists()
+
+
+@pytest.mark.asyncio
+async def test_unchanged_attachment_is_not_downloaded_again(session, tmp_path):
+    attachment = make_attachment(session, 10, "test.mp3")
+    message = make_message(attachment)
+    [record] = await perform_download(message)
+
+    known = {attachment.id: record["sha256"]}
+    [again] = await perform_download(message, known_hashes=known)
+
+    assert attachment.fetch.call_count == 1
+    assert again["sha256"] == record["sha256"]
+
+    # A changed file on disk is downloaded again
+    record["path"].write_bytes(b"other")
+    await perform_download(message, known_hashes=known)
+    assert attachment.fetch.call_count == 2
+    assert record["path"].read_bytes() == b"audio"
+
+
+def test_get_downloader_mode_rejects_unknown_modes(monkeypatch):
+    monkeypatch.setenv("DOWNLOADER_MODE", "forever")
+    with pytest.raises(ValueError):
+        get_downloader_mode()
+
+
+@pytest_asyncio.fixture
+async def gateway(session, no_reaction_delay):
+    state = get_download_state()
+    config = {"channel_id": 1, "directory": download.VOICE_MEMOS_DIR, "concurrency": 2}
+    gateway = GatewayDownloader([config], state, session)
+    yield gateway
+    await gateway.close()
+    state.close()
+
+
+def state_of(gateway):
+    return gateway.channels[1].state
+
+
+def live_message(session, message_id, events, channel_id=1, fetch=None):
+    message = make_audio_message(session, message_id, 1, events, fetch)
+    message.channel = Mock()
+    message.channel.id = channel_id
+    return message
+
+
+@pytest.mark.asyncio
+async def test_gateway_downloads_new_messages_right_away(session, gateway):
+    events = []
+    message = live_message(session, 5, events)
+
+    await gateway.on_message(message, bot_user=Mock())
+    await gateway.on_message(message, bot_user=Mock())
+
+    assert message.attachments[0].fetch.call_count == 1
+    assert state_of(gateway).last_seen(1) == 5
+    assert new_audio_signalled_at() is not None
+
+
+@pytest.mark.asyncio
+async def test_gateway_ignores_other_channels_and_itself(session, gateway):
+    events = []
+    elsewhere = live_message(session, 5, events, channel_id=2)
+    own = live_message(session, 6, events)
+    bot_user = own.author
+
+    await gateway.on_message(elsewhere, bot_user)
+    await gateway.on_message(own, bot_user)
+
+    assert events == []
+    assert new_audio_signalled_at() is None
+
+
+@pytest.mark.asyncio
+async def test_gateway_failed_message_holds_back_last_seen(session, gateway):
+    async def failing_fetch():
+        raise OSError("connection reset")
+
+    events = []
+    await gateway.on_message(live_message(session, 5, events), Mock())
+    await gateway.on_message(
+        live_message(session, 6, events, fetch=failing_fetch), Mock()
+    )
+    await gateway.on_message(live_message(session, 7, events), Mock())
+
+    assert state_of(gateway).last_seen(1) == 5
+    assert state_of(gateway).is_processed(7)
+
+
+@pytest.mark.asyncio
+async def test_gateway_redownloads_on_repeat_reaction(session, gateway):
+    events = []
+    message = live_message(session, 5, events)
+    await gateway.on_message(message, Mock())
+    channel = Mock()
+    channel.fetch_message = AsyncMock(return_value=message)
+    payload = Mock()
+    payload.channel_id = 1
+    payload.message_id = 5
+    payload.user_id = 42
+    payload.emoji = REPEAT_EMOJI
+
+    await gateway.on_raw_reaction_add(payload, channel, Mock(id=1000))
+
+    channel.fetch_message.assert_called_once_with(5)
+    # Unchanged on disk, so only the hash is checked
+    assert message.attachments[0].fetch.call_count == 1
+
+
+def test_parse_channel_configs(tmp_path, monkeypatch):
+    monkeypatch.setenv("DOWNLOAD_CONCURRENCY", "3")
+
+    configs = parse_channel_configs("11:show-a:2, 22")
+
+    assert configs == [
+        {"channel_id": 11, "directory": tmp_path / "show-a", "concurrency": 2},
+        {"channel_id": 22, "directory": tmp_path / "22", "concurrency": 3},
+    ]
+
+
+@pytest.mark.parametrize("value", ["", "abc", "1:a:0", "1:../up", "1:a:2:x", "1,1"])
+def test_parse_channel_configs_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_channel_configs(value)
+
+
+def test_single_channel_id_saves_into_voice_memos_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv("CHANNEL_IDS", raising=False)
+    monkeypatch.setenv("CHANNEL_ID", "11")
+
+    [config] = get_channel_configs()
+
+    assert config["channel_id"] == 11
+    assert config["directory"] == tmp_path
+
+
+@pytest.mark.asyncio
+async def test_process_channels_concurrently_into_own_directories(
+    session, tmp_path, no_reaction_delay
+):
+    active = collections.Counter()
+    max_active = collections.Counter()
+    both_active = False
+
+    def tracking_fetch(name):
+        async def fetch():
+            nonlocal both_active
+            active[name] += 1
+            max_active[name] = max(max_active[name], active[name])
+            both_active = both_active or bool(active["a"] and active["b"])
+            await asyncio.sleep(0.01)
+            active[name] -= 1
+            return b"audio"
+
+        return fetch
+
+    events = []
+    channels = []
+    for channel_id, name, concurrency in [(1, "a", 1), (2, "b", 3)]:
+        channel = FakeChannel(
+            [
+                make_audio_message(
+                    session, channel_id * 10 + i, 2, events, tracking_fetch(name)
+                )
+                for i in range(3)
+            ]
+        )
+        channel.id = channel_id
+        config = {
+            "channel_id": channel_id,
+            "directory": tmp_path / name,
+            "concurrency": concurrency,
+        }
+        channels.append((channel, config))
+
+    await process_channels(channels)
+
+    assert len(list((tmp_path / "a").glob("*.mp3"))) == 6
+    assert len(list((tmp_path / "b").glob("*.mp3"))) == 6
+    assert max_active == {"a": 1, "b": 3}
+    assert both_active
+
+
+@pytest.mark.asyncio
+async def test_ingest_transcodes_into_memo_directory(
+    session, tmp_path, monkeypatch, no_reaction_delay
+):
+    def fake_transcode(source, output_dir, settings):
+        output = output_dir / f"{source.stem}.{settings['format']}"
+        output.write_bytes(source.read_bytes())
+        return output
+
+    monkeypatch.setattr(ingest, "transcode", fake_transcode)
+    monkeypatch.setenv("INGEST_FORMAT", "flac")
+    events = []
+    message = make_audio_message(session, 1, 1, events)
+    mock_channel = AsyncMock()
+    mock_channel.id = 1
+    mock_channel.history = lambda limit: AsyncIterList([message])
+
+    await process_messages(mock_channel)
+
+    [original] = (tmp_path / "originals").glob("*.mp3")
+    assert (tmp_path / f"{original.stem}.flac").read_bytes() == b"audio"
+    assert list(tmp_path.glob("*.mp3")) == []
+    message.add_reaction.assert_called_once_with(COMPLETED_EMOJI)
@@ -0,0 +1,41 @@
+from src.file_downloader.state import DownloadState
+
+
+def test_last_seen_never_moves_backwards(tmp_path):
+    state = DownloadState(tmp_path / "state.sqlite3")
+    assert state.last_seen(1) is None
+
+    state.set_last_seen(1, 500)
+    state.set_last_seen(1, 400)
+
+    assert state.last_seen(1) == 500
+    assert state.last_seen(2) is None
+
+
+def test_mark_processed_replaces_attachment_records(tmp_path):
+    state = DownloadState(tmp_path / "state.sqlite3")
+    record = {
+        "attachment_id": 7,
+        "filename": "memo.mp3",
+        "path": tmp_path / "memo.mp3",
+        "size": 5,
+        "sha256": "aaa",
+    }
+
+    state.mark_processed(1, 100, [record])
+    state.mark_processed(1, 100, [{**record, "sha256": "bbb"}])
+
+    assert state.is_processed(100)
+    assert not state.is_processed(101)
+    assert state.attachment_hashes(100) == {7: "bbb"}
+
+
+def test_state_persists_across_connections(tmp_path):
+    state = DownloadState(tmp_path / "state.sqlite3")
+    state.mark_processed(1, 100)
+    state.set_last_seen(1, 100)
+    state.close()
+
+    reopened = DownloadState(tmp_path / "state.sqlite3")
+    assert reopened.is_processed(100)
+    assert reopened.last_seen(1) == 100
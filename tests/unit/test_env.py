@@ -0,0 +1,31 @@
+"""Tests for the shared integer setting parsers."""
+
+import pytest
+
+from src.utils.env import get_int_env, get_non_negative_int_env, get_positive_int_env
+
+
+def test_defaults_apply_when_unset(monkeypatch):
+    monkeypatch.delenv("WAFFLEBOT_TEST_INT", raising=False)
+    assert get_positive_int_env("WAFFLEBOT_TEST_INT", 4) == 4
+
+
+def test_get_int_env_rejects_non_integers(monkeypatch):
+    monkeypatch.setenv("WAFFLEBOT_TEST_INT", "four")
+    with pytest.raises(ValueError, match="WAFFLEBOT_TEST_INT must be an integer"):
+        get_int_env("WAFFLEBOT_TEST_INT", 4)
+
+
+@pytest.mark.parametrize("value", ["0", "-1"])
+def test_get_positive_int_env_rejects_zero_and_negatives(monkeypatch, value):
+    monkeypatch.setenv("WAFFLEBOT_TEST_INT", value)
+    with pytest.raises(ValueError, match="must be positive"):
+        get_positive_int_env("WAFFLEBOT_TEST_INT", 4)
+
+
+def test_get_non_negative_int_env_accepts_zero(monkeypatch):
+    monkeypatch.setenv("WAFFLEBOT_TEST_INT", "0")
+    assert get_non_negative_int_env("WAFFLEBOT_TEST_INT", 4) == 0
+    monkeypatch.setenv("WAFFLEBOT_TEST_INT", "-1")
+    with pytest.raises(ValueError, match="must not be negative"):
+        get_non_negative_int_env("WAFFLEBOT_TEST_INT", 4)
@@ -0,0 +1,117 @@
+"""Tests for encoding the final mix."""
+
+import pathlib
+import sys
+
+import numpy as np
+import pytest
+
+from src.mixer import ffmpeg
+from src.mixer.engine import array_to_segment
+from src.mixer.export import (
+    UnknownOutputFormatError,
+    encoder_args,
+    export_segment,
+    get_export_outputs,
+    make_output,
+    parse_output_options,
+)
+from src.mixer.ffmpeg import FFmpegError
+
+# Stands in for ffmpeg: copies stdin to the output file (the last argument)
+# and records its arguments next to it, or fails if the output name says so
+FAKE_FFMPEG = f"""#!{sys.executable}
+import pathlib, sys
+output = pathlib.Path(sys.argv[-1])
+if "fail" in output.name:
+    sys.stderr.write("encoder exploded")
+    sys.exit(1)
+output.write_bytes(sys.stdin.buffer.read())
+output.with_suffix(".args").write_text(" ".join(sys.argv[1:]))
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    script = tmp_path / "ffmpeg"
+    script.write_text(FAKE_FFMPEG)
+    script.chmod(0o755)
+    monkeypatch.setattr(ffmpeg, "FFMPEG_BINARY", str(script))
+    return script
+
+
+def test_parse_output_options():
+    assert parse_output_options("bitrate=64k:channels=1:sample_rate=22050") == {
+        "bitrate": "64k",
+        "channels": 1,
+        "sample_rate": 22050,
+    }
+    assert parse_output_options("vbr=2") == {"vbr": 2}
+    assert parse_output_options("") == {}
+
+
+@pytest.mark.parametrize(
+    "options", ["bitrate=fast", "channels=0", "vbr=-1", "volume=11", "bitrate=1:vbr=2"]
+)
+def test_parse_output_options_rejects_invalid_values(options):
+    with pytest.raises(ValueError):
+        parse_output_options(options)
+
+
+def test_make_output_rejects_unknown_format():
+    with pytest.raises(UnknownOutputFormatError):
+        make_output(pathlib.Path("episode.wma"))
+
+
+def test_get_export_outputs_reads_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("MIXER_OUTPUT_OPTIONS", "bitrate=128k")
+    monkeypatch.setenv("MIXER_EXTRA_OUTPUTS", "low.m4a:bitrate=64k:channels=1")
+
+    outputs = get_export_outputs(tmp_path)
+
+    assert outputs == [
+        {"path": tmp_path / "voice_memo_mix.mp3", "bitrate": "128k"},
+        {"path": tmp_path / "low.m4a", "bitrate": "64k", "channels": 1},
+    ]
+    assert encoder_args(outputs[1]) == [
+        "-c:a",
+        "aac",
+        "-b:a",
+        "64k",
+        "-ac",
+        "1",
+        "-movflags",
+        "+faststart",
+    ]
+
+
+def test_export_segment_pipes_pcm_to_every_output(tmp_path, fake_ffmpeg):
+    samples = np.linspace(-0.5, 0.5, 8000 * 2, dtype=np.float32).reshape(-1, 2)
+    segment = array_to_segment(samples, 8000)
+    outputs = [
+        make_output(tmp_path / "mix.mp3", "vbr=2"),
+        make_output(tmp_path / "low.m4a", "bitrate=64k:channels=1"),
+    ]
+
+    export_segment(segment, outputs)
+
+    for output in outputs:
+        assert output["path"].read_bytes() == segment.raw_data
+    args = (tmp_path / ".low.m4a.args").read_text().split()
+    assert args[args.index("-f") + 1] == "s16le"
+    assert "-b:a 64k -ac 1" in " ".join(args)
+    assert not list(tmp_path.glob(".*.partial"))
+
+
+def test_failed_encode_leaves_no_output(tmp_path, fake_ffmpeg):
+    segment = array_to_segment(np.zeros((800, 1), dtype=np.float32), 8000)
+    outputs = [
+        make_output(tmp_path / "mix.mp3"),
+        make_output(tmp_path / "fail.m4a"),
+    ]
+
+    with pytest.raises(FFmpegError, match="encoder exploded"):
+        export_segment(segment, outputs)
+
+    assert not list(tmp_path.glob("*.mp3")) + list(tmp_path.glob("*.m4a"))
+    assert not list(tmp_path.glob(".*.partial"))
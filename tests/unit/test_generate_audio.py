@@ -0,0 +1,354 @@
+"""Tests for the audio mixer pipeline steps."""
+
+import json
+
+import numpy as np
+import pytest
+from pydub import AudioSegment  # type: ignore[import]
+
+from src.mixer import generate_audio
+from src.mixer.engine import array_to_segment, segment_to_array
+from src.mixer.generate_audio import (
+    CROSSFADE_MS,
+    GAP_MS,
+    INTRO_MS,
+    OUTRO_MS,
+    NoVoiceMemosFoundError,
+    UnknownNormalizeModeError,
+    build_voice_track,
+    get_decode_workers,
+    load_background_music,
+    load_voice_memos,
+    music_length_needed,
+    planned_durations_ms,
+    read_voice_metadata,
+)
+from src.mixer.index_memos import index_directory
+from src.utils.audio_metadata import index_file, segment_samples
+from src.utils.loudness import integrated_loudness
+
+FRAME_RATE = 8000
+
+
+def write_memo(path, seconds, frequency):
+    t = np.arange(int(seconds * FRAME_RATE), dtype=np.float32) / FRAME_RATE
+    samples = (0.2 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+    array_to_segment(samples[:, np.newaxis], FRAME_RATE).export(path, format="wav")
+
+
+@pytest.fixture(autouse=True)
+def decode_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_CACHE_DIR", str(tmp_path / "decode-cache"))
+    monkeypatch.setenv("MIXER_STEM_CACHE_DIR", str(tmp_path / "stem-cache"))
+    monkeypatch.setenv("MIXER_RENDER_CACHE_DIR", str(tmp_path / "render-cache"))
+
+
+@pytest.fixture
+def voice_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_audio, "VOICE_DIR", tmp_path)
+    for name, seconds, frequency in [
+        ("2025-01-02_10-00-00-b.wav", 1.5, 330),
+        ("2025-01-01_10-00-00-a.wav", 1.0, 220),
+        ("2025-01-03_10-00-00-c.wav", 2.0, 440),
+    ]:
+        write_memo(tmp_path / name, seconds, frequency)
+    return tmp_path
+
+
+def test_load_voice_memos_keeps_sorted_order(voice_dir, monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+    voice_segs = load_voice_memos()
+
+    assert [len(seg) for seg in voice_segs] == [1000, 1500, 2000]
+
+
+def test_load_voice_memos_parallel_matches_serial(voice_dir, monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+    serial = load_voice_memos()
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "3")
+    parallel = load_voice_memos()
+
+    assert [seg.raw_data for seg in parallel] == [seg.raw_data for seg in serial]
+
+
+def test_load_voice_memos_truncates_long_memos(voice_dir, monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+    monkeypatch.setattr(generate_audio, "MAX_LENGTH_MS", 1200)
+    voice_segs = load_voice_memos()
+
+    assert [len(seg) for seg in voice_segs] == [1000, 1200, 1200]
+
+
+def test_sidecar_peaks_normalize_like_a_scan(voice_dir, monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+    monkeypatch.setenv("MIXER_DECODE_CACHE_MAX_MB", "0")
+    scanned = load_voice_memos()
+
+    for path in voice_dir.glob("*.wav"):
+        index_file(path)
+
+    def no_scan(segment):
+        raise AssertionError("normalize scanned a memo with a sidecar")
+
+    monkeypatch.setattr(generate_audio, "normalize", no_scan)
+    from_sidecars = load_voice_memos()
+
+    assert [seg.raw_data for seg in from_sidecars] == [seg.raw_data for seg in scanned]
+
+
+def test_loudness_normalization_reaches_the_target(voice_dir, monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+    monkeypatch.setenv("MIXER_DECODE_CACHE_MAX_MB", "0")
+    monkeypatch.setenv("MIXER_NORMALIZE", "loudness")
+    monkeypatch.setenv("MIXER_VOICE_TARGET_LUFS", "-20")
+    scanned = load_voice_memos()
+
+    for path in voice_dir.glob("*.wav"):
+        index_file(path)
+
+    def no_scan(samples, sample_rate):
+        raise AssertionError("measured a memo with a sidecar")
+
+    monkeypatch.setattr(generate_audio, "measure_samples", no_scan)
+    from_sidecars = load_voice_memos()
+
+    assert [seg.raw_data for seg in from_sidecars] == [seg.raw_data for seg in scanned]
+    for seg in scanned:
+        # The voice fades take a little off memos this short
+        loudness = integrated_loudness(segment_samples(seg), seg.frame_rate)
+        assert -21 < loudness <= -20
+
+
+def test_normalize_master_reaches_the_target():
+    t = np.arange(5 * FRAME_RATE) / FRAME_RATE
+    samples = 0.05 * np.sin(2 * np.pi * 440 * t)
+    final_mix = array_to_segment(np.stack([samples, samples], axis=1), FRAME_RATE)
+
+    normalized = generate_audio.normalize_master(final_mix, -16.0)
+
+    loudness = integrated_loudness(segment_samples(normalized), FRAME_RATE)
+    assert loudness == pytest.approx(-16.0, abs=0.1)
+
+
+def test_get_normalize_mode_rejects_unknown_modes(monkeypatch):
+    monkeypatch.setenv("MIXER_NORMALIZE", "rms")
+    with pytest.raises(UnknownNormalizeModeError):
+        generate_audio.get_normalize_mode()
+
+
+def test_trim_silence_shortens_memos_and_reports_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_audio, "VOICE_DIR", tmp_path)
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+    monkeypatch.setenv("MIXER_TRIM_SILENCE", "1")
+    monkeypatch.setenv("MIXER_TRIM_PAD_MS", "100")
+    t = np.arange(FRAME_RATE, dtype=np.float32) / FRAME_RATE
+    speech = 0.2 * np.sin(2 * np.pi * 220 * t)
+    silence = np.zeros(2 * FRAME_RATE, dtype=np.float32)
+    samples = np.concatenate([silence, speech, silence])[:, np.newaxis]
+    array_to_segment(samples, FRAME_RATE).export(tmp_path / "memo.wav", format="wav")
+    report = generate_audio.start_run()
+
+    voice_segs = load_voice_memos()
+
+    # 1s of speech plus 100ms on either side
+    assert [len(seg) for seg in voice_segs] == [1200]
+    assert report.to_dict()["files"][0]["counters"]["trimmed_ms"] == 3800
+
+
+def test_trim_pad_may_be_zero(monkeypatch):
+    monkeypatch.setenv("MIXER_TRIM_SILENCE", "1")
+    monkeypatch.setenv("MIXER_TRIM_PAD_MS", "0")
+    assert generate_audio.get_trim_settings()["pad_ms"] == 0
+
+    monkeypatch.setenv("MIXER_TRIM_PAD_MS", "-1")
+    with pytest.raises(ValueError, match="must not be negative"):
+        generate_audio.get_trim_settings()
+
+
+def test_trim_is_reported_on_a_stem_cache_hit(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_audio, "VOICE_DIR", tmp_path)
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+    monkeypatch.setenv("MIXER_TRIM_SILENCE", "1")
+    monkeypatch.setenv("MIXER_TRIM_PAD_MS", "100")
+    t = np.arange(FRAME_RATE, dtype=np.float32) / FRAME_RATE
+    speech = 0.2 * np.sin(2 * np.pi * 220 * t)
+    silence = np.zeros(2 * FRAME_RATE, dtype=np.float32)
+    samples = np.concatenate([silence, speech, silence])[:, np.newaxis]
+    array_to_segment(samples, FRAME_RATE).export(tmp_path / "memo.wav", format="wav")
+    load_voice_memos()
+    report = generate_audio.start_run()
+
+    voice_segs = load_voice_memos()
+
+    counters = report.to_dict()["files"][0]["counters"]
+    assert counters["stem_cache_hit_bytes"] > 0
+    assert counters["trimmed_ms"] == 3800
+    assert [len(seg) for seg in voice_segs] == [1200]
+
+
+def test_planned_durations_need_every_sidecar(voice_dir):
+    voice_files = generate_audio.list_voice_files()
+    index_file(voice_files[0])
+    assert planned_durations_ms(read_voice_metadata(voice_files)) is None
+
+    for path in voice_files:
+        index_file(path)
+    assert planned_durations_ms(read_voice_metadata(voice_files)) == [1000, 1500, 2000]
+
+
+def test_index_directory_skips_current_sidecars(voice_dir):
+    assert index_directory(voice_dir) == 3
+    assert index_directory(voice_dir) == 0
+    assert index_directory(voice_dir, force=True) == 3
+
+
+def test_load_voice_memos_empty_dir_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_audio, "VOICE_DIR", tmp_path)
+    with pytest.raises(NoVoiceMemosFoundError):
+        load_voice_memos()
+
+
+def test_get_decode_workers_rejects_invalid_values(monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "0")
+    with pytest.raises(ValueError):
+        get_decode_workers()
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "many")
+    with pytest.raises(ValueError):
+        get_decode_workers()
+
+
+@pytest.fixture
+def music_dir(tmp_path, monkeypatch):
+    music_path = tmp_path / "music"
+    music_path.mkdir()
+    monkeypatch.setattr(generate_audio, "MUSIC_DIR", music_path)
+    for name, seconds in [("a.wav", 2.0), ("b.wav", 3.0), ("c.wav", 4.0)]:
+        write_memo(music_path / name, seconds, 440)
+    # Keep the playlist order stable and skip ffprobe
+    monkeypatch.setattr(generate_audio.random, "shuffle", lambda files: files.sort())
+    durations = {"a.wav": 2000, "b.wav": 3000, "c.wav": 4000}
+    monkeypatch.setattr(
+        generate_audio, "probe_duration_ms", lambda path: durations[path.name]
+    )
+    return music_path
+
+
+def test_load_background_music_decodes_only_needed_tracks(music_dir, monkeypatch):
+    decoded = []
+    original_decode_segment = generate_audio.decode_segment
+
+    def tracking_decode_segment(path):
+        decoded.append(path.name)
+        return original_decode_segment(path)
+
+    monkeypatch.setattr(generate_audio, "decode_segment", tracking_decode_segment)
+    bg = load_background_music(min_length_ms=4500)
+
+    assert decoded == ["a.wav", "b.wav"]
+    assert len(bg) == 5000
+
+
+def test_load_background_music_without_limit_loads_everything(music_dir):
+    assert len(load_background_music()) == 9000
+
+
+def test_music_length_needed_adds_margin():
+    assert music_length_needed(10_000) == 11_000
+
+
+def build_voice_track_by_concatenation(voice_segs):
+    """The original build_voice_track: grow the show with += and append."""
+    show = AudioSegment.silent(INTRO_MS)
+    for idx, seg in enumerate(voice_segs):
+        if idx:
+            show += AudioSegment.silent(GAP_MS)
+        show = show.append(seg, crossfade=CROSSFADE_MS)
+    return show + AudioSegment.silent(OUTRO_MS)
+
+
+@pytest.mark.parametrize("frame_rate", [11025, 44100])
+def test_build_voice_track_matches_concatenation(frame_rate):
+    voice_segs = [
+        array_to_segment(
+            0.3 * np.sin(np.arange(duration * frame_rate // 1000) / 10)[:, None],
+            frame_rate,
+        )
+        for duration in (1234, 2500, 3001)
+    ]
+
+    voice_track, gap_ranges = build_voice_track(voice_segs)
+    expected = build_voice_track_by_concatenation(voice_segs)
+
+    assert gap_ranges[0] == (0, INTRO_MS)
+    assert len(gap_ranges) == len(voice_segs) + 1
+    assert len(voice_track) == len(expected)
+    actual_samples = segment_to_array(voice_track)
+    expected_samples = segment_to_array(expected)
+    common = min(len(actual_samples), len(expected_samples))
+    assert abs(len(actual_samples) - len(expected_samples)) < frame_rate // 1000
+    assert np.array_equal(actual_samples[:common], expected_samples[:common])
+
+
+@pytest.fixture
+def podcast_dir(tmp_path, monkeypatch):
+    podcast_path = tmp_path / "podcast"
+    monkeypatch.setattr(generate_audio, "PODCAST_OUTPUT_DIR", podcast_path)
+
+    def fake_export_segment(segment, outputs):
+        for output in outputs:
+            output["path"].write_bytes(segment.raw_data)
+
+    monkeypatch.setattr(generate_audio, "export_segment", fake_export_segment)
+    return podcast_path
+
+
+def test_produce_audio_mixed_track_writes_run_report(
+    voice_dir, music_dir, podcast_dir, monkeypatch
+):
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+
+    generate_audio.produce_audio_mixed_track()
+
+    report = json.loads((podcast_dir / "voice_memo_mix.report.json").read_text())
+    assert report["status"] == "ok"
+    assert [stage["name"] for stage in report["stages"]] == [
+        "load_voice_memos",
+        "build_voice_track",
+        "load_background_music",
+        "create_final_mix",
+        "export_mix",
+    ]
+    assert all(stage["wall_s"] >= 0 for stage in report["stages"])
+    assert [f["name"] for f in report["files"]][:3] == sorted(
+        f.name for f in voice_dir.glob("*.wav")
+    )
+    assert report["stages"][0]["counters"]["decoded_bytes"] > 0
+    assert report["output"]["files"][0]["size_bytes"] > 0
+    assert report["total"]["audio_s_per_wall_s"] > 0
+
+
+def test_loudness_mode_normalizes_the_master(
+    voice_dir, music_dir, podcast_dir, monkeypatch
+):
+    monkeypatch.setenv("MIXER_DECODE_WORKERS", "1")
+    monkeypatch.setenv("MIXER_NORMALIZE", "loudness")
+
+    generate_audio.produce_audio_mixed_track()
+
+    report = json.loads((podcast_dir / "voice_memo_mix.report.json").read_text())
+    assert report["status"] == "ok"
+    assert [stage["name"] for stage in report["stages"]][-2:] == [
+        "normalize_master",
+        "export_mix",
+    ]
+
+
+def test_failed_run_still_writes_run_report(tmp_path, podcast_dir, monkeypatch):
+    monkeypatch.setattr(generate_audio, "VOICE_DIR", tmp_path)
+
+    with pytest.raises(NoVoiceMemosFoundError):
+        generate_audio.produce_audio_mixed_track()
+
+    report = json.loads((podcast_dir / "voice_memo_mix.report.json").read_text())
+    assert report["status"] == "failed"
+    assert "NoVoiceMemosFoundError" in report["error"]
@@ -0,0 +1,32 @@
+"""Tests for the shared file hashing helpers."""
+
+import hashlib
+
+from src.utils import hashing
+from src.utils.hashing import file_sha256, hash_file
+
+
+def test_file_sha256_matches_hashlib(tmp_path, monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_CHUNK_BYTES", 4)  # several chunks
+    path = tmp_path / "memo.wav"
+    path.write_bytes(b"voice memo content")
+
+    assert file_sha256(path) == hashlib.sha256(b"voice memo content").hexdigest()
+
+
+def test_file_sha256_changes_with_content(tmp_path):
+    path = tmp_path / "memo.wav"
+    path.write_bytes(b"one")
+    first = file_sha256(path)
+    path.write_bytes(b"two")
+    assert file_sha256(path) != first
+
+
+def test_hash_file_continues_a_digest(tmp_path):
+    path = tmp_path / "memo.partial"
+    path.write_bytes(b"first half")
+
+    digest = hash_file(path)
+    digest.update(b", second half")
+
+    assert digest.hexdigest() == hashlib.sha256(b"first half, second half").hexdigest()
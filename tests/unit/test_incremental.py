@@ -0,0 +1,264 @@
+"""Tests for incremental episode rendering."""
+
+import numpy as np
+import pytest
+
+from src.mixer import generate_audio
+from src.mixer.engine import (
+    array_to_segment,
+    ducking_gains,
+    float_to_pcm,
+    ms_to_frames,
+    render_mix_window,
+    voice_activity,
+)
+from src.mixer.incremental import (
+    build_manifest,
+    find_dirty_spans,
+    is_incremental_enabled,
+    load_manifest,
+    load_previous_mix,
+    reuse_music_order,
+    save_render,
+    splice_render,
+)
+from src.mixer.timeline import plan_voice_track
+
+FRAME_RATE = 8000
+
+SETTINGS = {
+    "intro_ms": 1000,
+    "gap_ms": 500,
+    "outro_ms": 1000,
+    "crossfade_ms": 100,
+    "gap_fade_ms": 200,
+}
+MUSIC = [("a.mp3", "digest-a"), ("b.mp3", "digest-b")]
+
+
+def manifest(memos, music=MUSIC, settings=SETTINGS):
+    return build_manifest(settings, memos, music, FRAME_RATE, 2, 2)
+
+
+def test_unchanged_memos_have_no_dirty_spans():
+    memos = [("1.wav", "x", 2000), ("2.wav", "y", 3000)]
+
+    assert find_dirty_spans(manifest(memos), manifest(memos)) == []
+
+
+def test_replaced_memo_of_same_length_dirties_only_its_span():
+    old = [("1.wav", "x", 2000), ("2.wav", "y", 3000), ("3.wav", "z", 1000)]
+    new = [("1.wav", "x", 2000), ("2.wav", "y2", 3000), ("3.wav", "z", 1000)]
+    starts, _, _ = plan_voice_track([2000, 3000, 1000], 1000, 500, 1000, 100)
+
+    spans = find_dirty_spans(manifest(old), manifest(new))
+
+    assert spans == [(starts[1], starts[1] + 3000)]
+
+
+def test_voice_ducking_widens_dirty_spans():
+    ducking = {"threshold_db": -45, "attack_ms": 300, "release_ms": 700, "hold_ms": 200}
+    settings = {**SETTINGS, "ducking": ducking}
+    old = [("1.wav", "x", 2000), ("2.wav", "y", 3000), ("3.wav", "z", 1000)]
+    new = [("1.wav", "x", 2000), ("2.wav", "y2", 3000), ("3.wav", "z", 1000)]
+    starts, _, _ = plan_voice_track([2000, 3000, 1000], 1000, 500, 1000, 100)
+
+    spans = find_dirty_spans(
+        manifest(old, settings=settings), manifest(new, settings=settings)
+    )
+
+    assert spans == [(starts[1] - 1210, starts[1] + 3000 + 1210)]
+
+
+def test_appended_memo_dirties_from_the_end_of_the_old_episode():
+    old = [("1.wav", "x", 2000)]
+    new = [("1.wav", "x", 2000), ("2.wav", "y", 3000)]
+    _, old_gaps, _ = plan_voice_track([2000], 1000, 500, 1000, 100)
+    _, _, new_total = plan_voice_track([2000, 3000], 1000, 500, 1000, 100)
+
+    spans = find_dirty_spans(manifest(old), manifest(new))
+
+    assert spans == [(old_gaps[1][0] - SETTINGS["gap_fade_ms"], new_total)]
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [
+        {"settings": {**SETTINGS, "gap_ms": 600}},
+        {"music": list(reversed(MUSIC))},
+    ],
+)
+def test_changed_settings_or_music_need_a_full_render(changed):
+    memos = [("1.wav", "x", 2000)]
+
+    assert find_dirty_spans(manifest(memos), manifest(memos, **changed)) is None
+
+
+def test_reuse_music_order_keeps_previous_shuffle():
+    previous = manifest([("1.wav", "x", 2000)], music=list(reversed(MUSIC)))
+
+    assert reuse_music_order(MUSIC, ["1.wav", "2.wav"], previous) == [
+        "b.mp3",
+        "a.mp3",
+    ]
+    assert reuse_music_order(MUSIC + [("c.mp3", "c")], ["1.wav"], previous) == [
+        "a.mp3",
+        "b.mp3",
+        "c.mp3",
+    ]
+    assert reuse_music_order(MUSIC, ["1.wav"], None) == ["a.mp3", "b.mp3"]
+
+
+def test_new_episode_gets_a_fresh_music_shuffle():
+    previous = manifest([("1.wav", "x", 2000)], music=list(reversed(MUSIC)))
+
+    assert reuse_music_order(MUSIC, ["2.wav", "3.wav"], previous) == [
+        "a.mp3",
+        "b.mp3",
+    ]
+
+
+def test_splice_render_matches_full_render(tmp_path):
+    durations = [2000, 3000, 1000]
+    starts, gap_ranges, total_ms = plan_voice_track(durations, 1000, 500, 1000, 100)
+    num_frames = ms_to_frames(total_ms, FRAME_RATE)
+    rng = np.random.default_rng(7)
+    music = rng.uniform(-0.5, 0.5, (num_frames, 2)).astype(np.float32)
+
+    def voice_track(seed):
+        voice = np.zeros((num_frames, 1), dtype=np.float32)
+        for idx, (start_ms, duration_ms) in enumerate(
+            zip(starts, durations, strict=True)
+        ):
+            start = ms_to_frames(start_ms, FRAME_RATE)
+            end = start + ms_to_frames(duration_ms, FRAME_RATE)
+            memo_rng = np.random.default_rng(seed if idx == 1 else idx)
+            voice[start:end] = memo_rng.uniform(-0.3, 0.3, (end - start, 1))
+        return voice
+
+    def render(voice, start, end):
+        return render_mix_window(
+            voice, music, FRAME_RATE, gap_ranges, 200, -10, -40, start, end
+        )
+
+    old_voice, new_voice = voice_track(100), voice_track(200)
+    save_render(
+        tmp_path,
+        manifest([]),
+        float_to_pcm(render(old_voice, 0, num_frames)),
+    )
+    spans = [(starts[1], starts[1] + durations[1])]
+
+    spliced = splice_render(
+        load_previous_mix(tmp_path),
+        num_frames,
+        FRAME_RATE,
+        spans,
+        lambda start, end: render(new_voice, start, end),
+    )
+
+    expected = float_to_pcm(render(new_voice, 0, num_frames))
+    assert np.array_equal(float_to_pcm(spliced), expected)
+    assert load_manifest(tmp_path) == manifest([])
+
+
+def test_spliced_ducked_render_matches_full_render(tmp_path):
+    ducking = {"threshold_db": -45, "attack_ms": 300, "release_ms": 700, "hold_ms": 600}
+    settings = {**SETTINGS, "ducking": ducking}
+    durations = [2000, 3000, 1000]
+    starts, gap_ranges, total_ms = plan_voice_track(durations, 1000, 500, 1000, 100)
+    num_frames = ms_to_frames(total_ms, FRAME_RATE)
+    rng = np.random.default_rng(7)
+    music = rng.uniform(-0.5, 0.5, (num_frames, 2)).astype(np.float32)
+
+    def voice_track(middle_voiced_ms):
+        voice = np.zeros((num_frames, 1), dtype=np.float32)
+        for idx, (start_ms, duration_ms) in enumerate(
+            zip(starts, durations, strict=True)
+        ):
+            if idx == 1:
+                duration_ms = middle_voiced_ms
+            start = ms_to_frames(start_ms, FRAME_RATE)
+            end = start + ms_to_frames(duration_ms, FRAME_RATE)
+            memo_rng = np.random.default_rng(idx)
+            voice[start:end] = memo_rng.uniform(-0.3, 0.3, (end - start, 1))
+        return voice
+
+    def render(voice, start, end):
+        gains = ducking_gains(
+            voice_activity(voice, FRAME_RATE, ducking["threshold_db"]),
+            FRAME_RATE,
+            ducking,
+            -10,
+            -40,
+        )
+        return render_mix_window(
+            voice, music, FRAME_RATE, gap_ranges, 200, -10, -40, start, end, gains
+        )
+
+    # The new take of the middle memo has voice where the old one was silent,
+    # which bridges the pauses to its neighbours and moves the ramps
+    old_voice, new_voice = voice_track(0), voice_track(3000)
+    old = [("1.wav", "x", 2000), ("2.wav", "y", 3000), ("3.wav", "z", 1000)]
+    new = [("1.wav", "x", 2000), ("2.wav", "y2", 3000), ("3.wav", "z", 1000)]
+    save_render(tmp_path, manifest(old), float_to_pcm(render(old_voice, 0, num_frames)))
+    spans = find_dirty_spans(
+        manifest(old, settings=settings), manifest(new, settings=settings)
+    )
+
+    spliced = splice_render(
+        load_previous_mix(tmp_path),
+        num_frames,
+        FRAME_RATE,
+        spans,
+        lambda start, end: render(new_voice, start, end),
+    )
+
+    expected = float_to_pcm(render(new_voice, 0, num_frames))
+    assert np.array_equal(float_to_pcm(spliced), expected)
+
+
+def test_processed_memos_come_from_the_stem_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("MIXER_DECODE_CACHE_DIR", str(tmp_path / "decode"))
+    monkeypatch.setenv("MIXER_STEM_CACHE_DIR", str(tmp_path / "stems"))
+    memo = tmp_path / "memo.wav"
+    t = np.arange(FRAME_RATE, dtype=np.float32) / FRAME_RATE
+    samples = 0.2 * np.sin(2 * np.pi * 220 * t)
+    array_to_segment(samples[:, np.newaxis], FRAME_RATE).export(memo, format="wav")
+
+    first, _ = generate_audio.decode_voice_memo(memo)
+    monkeypatch.setattr(generate_audio, "decode_segment", pytest.fail)
+    second, _ = generate_audio.decode_voice_memo(memo)
+
+    assert second.raw_data == first.raw_data
+
+
+def test_incremental_rendering_is_opt_in(monkeypatch):
+    monkeypatch.delenv("MIXER_INCREMENTAL", raising=False)
+    assert not is_incremental_enabled()
+    monkeypatch.setenv("MIXER_INCREMENTAL", "1")
+    assert is_incremental_enabled()
+
+
+def test_new_episode_does_not_load_the_previous_mix(tmp_path, monkeypatch):
+    render_dir = tmp_path / "render"
+    monkeypatch.setenv("MIXER_RENDER_CACHE_DIR", str(render_dir))
+    monkeypatch.delenv("MIXER_DUCKING", raising=False)
+    save_render(
+        render_dir,
+        manifest([("old.wav", "x", 1000)]),
+        np.zeros((FRAME_RATE, 2), dtype=np.int16),
+    )
+    memo = tmp_path / "new.wav"
+    t = np.arange(FRAME_RATE, dtype=np.float32) / FRAME_RATE
+    voice = array_to_segment((0.2 * np.sin(2 * np.pi * 220 * t))[:, None], FRAME_RATE)
+    voice.export(memo, format="wav")
+    music = array_to_segment(np.zeros((FRAME_RATE, 2), dtype=np.float32), FRAME_RATE)
+    monkeypatch.setattr(generate_audio, "load_previous_mix", pytest.fail)
+
+    mixed = generate_audio.create_final_mix_incremental(
+        [memo], [voice], MUSIC, voice, music, []
+    )
+
+    assert len(mixed) == len(voice)
+    assert load_manifest(render_dir)["memos"][0][0] == "new.wav"
@@ -0,0 +1,145 @@
+import sys
+import wave
+
+import pytest
+from pydub import AudioSegment  # type: ignore[import]
+
+from src.file_downloader import ingest
+from src.file_downloader.ingest import (
+    Ingester,
+    get_ingest_settings,
+    transcode,
+)
+from src.mixer import generate_audio
+from src.utils.audio_metadata import read_sidecar, sidecar_path
+
+# Stands in for ffmpeg. Decoding (-nostdin) prints 0.2s of PCM at the
+# requested rate and channels, silent but for one sample at half scale, or
+# fails for inputs named "broken". Encoding copies stdin to the output file
+# (the last argument).
+FAKE_FFMPEG = f"""#!{sys.executable}
+import pathlib, sys
+args = sys.argv[1:]
+if "-nostdin" in args:
+    if "broken" in args[args.index("-i") + 1]:
+        sys.stderr.write("invalid data")
+        sys.exit(1)
+    rate = int(args[args.index("-ar") + 1])
+    channels = int(args[args.index("-ac") + 1])
+    sys.stdout.buffer.write(b"\\x00\\x40" + bytes(rate // 5 * channels * 2 - 2))
+else:
+    pathlib.Path(args[-1]).write_bytes(sys.stdin.buffer.read())
+"""
+
+
+@pytest.fixture(autouse=True)
+def fake_ffmpeg(tmp_path, monkeypatch):
+    script = tmp_path / "ffmpeg"
+    script.write_text(FAKE_FFMPEG)
+    script.chmod(0o755)
+    monkeypatch.setattr(ingest, "FFMPEG_BINARY", str(script))
+
+
+def settings(output_format="wav", channels=1):
+    return {
+        "format": output_format,
+        "sample_rate": 22050,
+        "channels": channels,
+        "workers": 2,
+    }
+
+
+def test_get_ingest_settings(monkeypatch):
+    monkeypatch.delenv("INGEST_FORMAT", raising=False)
+    monkeypatch.delenv("INGEST_INDEX", raising=False)
+    assert get_ingest_settings() is None
+
+    monkeypatch.setenv("INGEST_INDEX", "1")
+    assert get_ingest_settings()["format"] is None
+
+    monkeypatch.setenv("INGEST_FORMAT", "FLAC")
+    monkeypatch.setenv("INGEST_CHANNELS", "2")
+    assert get_ingest_settings()["format"] == "flac"
+    assert get_ingest_settings()["channels"] == 2
+
+    monkeypatch.setenv("INGEST_FORMAT", "mp3")
+    with pytest.raises(ValueError):
+        get_ingest_settings()
+
+
+def test_transcode_to_wav_writes_duration_sidecar(tmp_path):
+    source = tmp_path / "2025-01-01_00-00-00-memo.m4a"
+    source.write_bytes(b"m4a")
+
+    output = transcode(source, tmp_path, settings(channels=2))
+
+    assert output.name == "2025-01-01_00-00-00-memo.wav"
+    with wave.open(str(output)) as f:
+        assert (f.getframerate(), f.getnchannels(), f.getnframes()) == (22050, 2, 4410)
+    metadata = read_sidecar(output)
+    assert metadata["source"] == source.name
+    assert metadata["duration_ms"] == 200
+    assert (metadata["sample_rate"], metadata["channels"]) == (22050, 2)
+    assert metadata["peak"] == 0.5
+    assert metadata["peak_dbfs"] == pytest.approx(-6.02, abs=0.01)
+    # No partial files left behind
+    assert not list(tmp_path.glob(".*"))
+
+
+def test_transcode_to_flac(tmp_path):
+    source = tmp_path / "memo.ogg"
+    source.write_bytes(b"ogg")
+
+    output = transcode(source, tmp_path, settings("flac"))
+
+    assert output.name == "memo.flac"
+    assert output.stat().st_size == 4410 * 2
+    assert read_sidecar(output)["duration_ms"] == 200
+
+
+@pytest.mark.parametrize("output_format", ["wav", "flac"])
+def test_transcoded_memos_are_listed_by_the_mixer(tmp_path, monkeypatch, output_format):
+    originals = tmp_path / "originals"
+    originals.mkdir()
+    source = originals / "memo.m4a"
+    source.write_bytes(b"m4a")
+    monkeypatch.setattr(generate_audio, "VOICE_DIR", tmp_path)
+
+    output = transcode(source, tmp_path, settings(output_format))
+
+    assert generate_audio.list_voice_files() == [output]
+
+
+@pytest.mark.asyncio
+async def test_failed_transcode_keeps_original(tmp_path):
+    originals = tmp_path / "originals"
+    originals.mkdir()
+    good = originals / "good.mp3"
+    broken = originals / "broken.mp3"
+    good.write_bytes(b"mp3")
+    broken.write_bytes(b"mp3")
+
+    ingester = Ingester(settings())
+    try:
+        outputs = await ingester.ingest([good, broken], tmp_path)
+    finally:
+        ingester.close()
+
+    assert [p.name for p in outputs] == ["good.wav", "broken.mp3"]
+    assert (tmp_path / "broken.mp3").read_bytes() == b"mp3"
+    assert not sidecar_path(tmp_path / "broken.mp3").exists()
+
+
+@pytest.mark.asyncio
+async def test_index_only_writes_sidecar_in_place(tmp_path):
+    memo = tmp_path / "memo.wav"
+    AudioSegment.silent(duration=1500, frame_rate=8000).export(memo, format="wav")
+
+    ingester = Ingester(settings(output_format=None))
+    try:
+        [output] = await ingester.ingest([memo], tmp_path)
+    finally:
+        ingester.close()
+
+    assert output == memo
+    assert read_sidecar(memo)["duration_ms"] == 1500
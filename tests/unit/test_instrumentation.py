@@ -0,0 +1,57 @@
+"""Tests for mixer run instrumentation."""
+
+import json
+import pathlib
+
+from src.mixer.instrumentation import RunReport, count, measure_call
+
+
+def decode(amount):
+    count("decoded_bytes", amount)
+    return amount
+
+
+def test_stage_records_counters_of_calls_in_this_process():
+    report = RunReport()
+
+    with report.stage("load"):
+        result, stats = measure_call(decode, 100)
+        report.add_file(pathlib.Path("a.wav"), stats)
+
+    assert result == 100
+    assert stats["counters"] == {"decoded_bytes": 100}
+    assert report.stages[0]["counters"] == {"decoded_bytes": 100}
+    assert report.files[0]["stage"] == "load"
+    assert "pid" not in report.files[0]
+
+
+def test_stage_merges_counters_from_worker_processes():
+    report = RunReport()
+    worker_stats = {"wall_s": 0.1, "cpu_s": 0.1, "peak_rss_bytes": 1, "pid": -1}
+
+    with report.stage("load"):
+        report.add_file(
+            pathlib.Path("a.wav"), {**worker_stats, "counters": {"decoded_bytes": 7}}
+        )
+        report.add_file(
+            pathlib.Path("b.wav"), {**worker_stats, "counters": {"decoded_bytes": 5}}
+        )
+
+    assert report.stages[0]["counters"] == {"decoded_bytes": 12}
+    assert report.to_dict()["counters"] == {"decoded_bytes": 12}
+
+
+def test_write_report(tmp_path):
+    report = RunReport(engine="numpy")
+    output = tmp_path / "mix.mp3"
+    output.write_bytes(b"\0" * 10)
+    with report.stage("export_mix"):
+        pass
+    report.set_output([output], duration_ms=5000)
+
+    report.write(tmp_path / "report.json")
+
+    written = json.loads((tmp_path / "report.json").read_text())
+    assert written["engine"] == "numpy"
+    assert written["output"]["files"] == [{"path": str(output), "size_bytes": 10}]
+    assert written["stages"][0]["name"] == "export_mix"
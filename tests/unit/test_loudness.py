@@ -0,0 +1,105 @@
+"""Tests for the EBU R128 integrated loudness measurement."""
+
+import numpy as np
+import pytest
+
+from src.utils import loudness
+from src.utils.loudness import (
+    SILENCE_DB,
+    LoudnessMeter,
+    integrated_loudness,
+    k_weighting_filters,
+    loudness_gain_db,
+)
+
+SAMPLE_RATE = 48000
+
+
+def sine(seconds, amplitude, frequency=997.0, sample_rate=SAMPLE_RATE):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t))[:, np.newaxis]
+
+
+def test_k_weighting_matches_the_bs1770_coefficients():
+    (shelf_b, shelf_a), (high_pass_b, high_pass_a) = k_weighting_filters(48000)
+
+    np.testing.assert_allclose(
+        shelf_b, [1.53512485958697, -2.69169618940638, 1.19839281085285]
+    )
+    np.testing.assert_allclose(shelf_a, [1.0, -1.69065929318241, 0.73248077421585])
+    np.testing.assert_allclose(high_pass_b, [1.0, -2.0, 1.0])
+    np.testing.assert_allclose(high_pass_a, [1.0, -1.99004745483398, 0.99007225036621])
+
+
+@pytest.mark.parametrize("sample_rate", [22050, 44100, 48000])
+def test_full_scale_sine_in_one_channel_reads_minus_3_lufs(sample_rate):
+    samples = sine(5, 1.0, sample_rate=sample_rate)
+
+    assert integrated_loudness(samples, sample_rate) == pytest.approx(-3.01, abs=0.05)
+
+
+def test_channels_add_up():
+    mono = sine(5, 0.1)
+
+    stereo = integrated_loudness(np.hstack([mono, mono]), SAMPLE_RATE)
+
+    assert stereo == pytest.approx(
+        integrated_loudness(mono, SAMPLE_RATE) + 3.01, abs=0.01
+    )
+
+
+def test_gating_ignores_silence_and_quiet_passages():
+    tone = sine(5, 0.1)
+    expected = integrated_loudness(tone, SAMPLE_RATE)
+
+    padded = np.vstack([np.zeros((SAMPLE_RATE * 5, 1)), tone, sine(5, 0.001)])
+
+    # Ungated, the padding would pull it down by 4.8dB; only the blocks
+    # straddling the edges of the tone still count
+    assert integrated_loudness(padded, SAMPLE_RATE) == pytest.approx(expected, abs=0.5)
+
+
+def test_silence_measures_silence_db():
+    assert integrated_loudness(np.zeros((SAMPLE_RATE, 2)), SAMPLE_RATE) == SILENCE_DB
+    assert integrated_loudness(np.zeros((0, 1)), SAMPLE_RATE) == SILENCE_DB
+
+
+def test_audio_shorter_than_a_block_is_measured_whole():
+    short = integrated_loudness(sine(0.3, 1.0), SAMPLE_RATE)
+
+    assert short == pytest.approx(-3.01, abs=0.1)
+
+
+def test_chunked_measurement_matches_whole(monkeypatch):
+    rng = np.random.default_rng(0)
+    samples = (
+        rng.standard_normal((SAMPLE_RATE * 6, 2))
+        * np.linspace(0.01, 0.3, 6)[np.arange(SAMPLE_RATE * 6) // SAMPLE_RATE][
+            :, np.newaxis
+        ]
+    )
+    whole = integrated_loudness(samples, SAMPLE_RATE)
+
+    monkeypatch.setattr(loudness, "FFT_SIZE", 2**14)
+    meter = LoudnessMeter(SAMPLE_RATE, 2)
+    for start in range(0, len(samples), 7919):
+        meter.add(samples[start : start + 7919])
+
+    assert meter.integrated() == pytest.approx(whole, abs=1e-6)
+
+
+def test_integer_pcm_is_measured_with_its_full_scale():
+    samples = sine(2, 0.5)
+    pcm = np.round(samples * 2**15).astype(np.int16)
+
+    assert integrated_loudness(pcm, SAMPLE_RATE, full_scale=2**15) == pytest.approx(
+        integrated_loudness(samples, SAMPLE_RATE), abs=0.01
+    )
+
+
+def test_loudness_gain_is_capped_by_the_peak_ceiling():
+    assert loudness_gain_db(-30.0, 0.1, -18.0, -1.0) == pytest.approx(12.0)
+    # A 12dB boost would push a -6dBFS peak past -1dBFS
+    assert loudness_gain_db(-30.0, 0.5, -18.0, -1.0) == pytest.approx(5.02, abs=0.01)
+    assert loudness_gain_db(-10.0, 0.9, -18.0, -1.0) == pytest.approx(-8.0)
+    assert loudness_gain_db(SILENCE_DB, 0.0, -18.0, -1.0) == 0.0
@@ -0,0 +1,198 @@
+"""Tests for the NumPy mixing engine."""
+
+import numpy as np
+import pytest
+
+from src.mixer.engine import (
+    array_to_segment,
+    build_music_envelope,
+    db_to_gain,
+    ducking_amount,
+    ducking_envelope,
+    ducking_gains,
+    fade_envelope,
+    fill_short_pauses,
+    loop_to_length,
+    render_final_mix,
+    segment_to_array,
+    silence_trim_mask,
+    voice_activity,
+)
+from src.mixer.generate_audio import (
+    UnknownMixerEngineError,
+    build_voice_track,
+    create_final_mix,
+    create_final_mix_pydub,
+)
+
+
+def make_tone(seconds, frequency, channels=1, amplitude=0.3, frame_rate=44100):
+    t = np.arange(int(seconds * frame_rate), dtype=np.float32) / frame_rate
+    samples = (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+    return array_to_segment(
+        np.repeat(samples[:, np.newaxis], channels, axis=1), frame_rate
+    )
+
+
+def test_segment_array_round_trip():
+    segment = make_tone(0.5, 440, channels=2)
+    samples = segment_to_array(segment)
+
+    assert samples.shape == (22050, 2)
+    assert samples.dtype == np.float32
+    assert array_to_segment(samples, 44100).raw_data == segment.raw_data
+
+
+def test_array_to_segment_clips():
+    samples = np.array([[2.0], [-2.0]], dtype=np.float32)
+    clipped = segment_to_array(array_to_segment(samples, 8000))
+    assert clipped.max() <= 1.0
+    assert clipped.min() >= -1.0
+
+
+def test_loop_to_length():
+    samples = np.arange(3, dtype=np.float32).reshape(-1, 1)
+    looped = loop_to_length(samples, 7)
+    assert looped[:, 0].tolist() == [0, 1, 2, 0, 1, 2, 0]
+
+
+@pytest.mark.parametrize("num_frames", [4, 9, 10, 11])
+def test_loop_to_length_matches_tiling_stereo(num_frames):
+    samples = np.arange(6, dtype=np.int16).reshape(-1, 2)
+    looped = loop_to_length(samples, num_frames)
+    assert looped.dtype == np.int16
+    assert np.array_equal(looped, np.tile(samples, (4, 1))[:num_frames])
+
+
+def test_fade_envelope():
+    envelope = fade_envelope(10, 4, 2)
+    assert envelope[0] == 0.0
+    assert envelope[4:8].tolist() == [1.0] * 4
+    assert envelope[-1] == pytest.approx(0.5)
+
+
+def test_build_music_envelope_boosts_gaps():
+    envelope = build_music_envelope(
+        num_frames=10_000,
+        frame_rate=1000,
+        gap_ranges=[(4000, 6000)],
+        gap_fade_ms=1000,
+        music_without_voice_db=-10,
+        music_under_voice_db=-40,
+    )
+    assert envelope[0] == pytest.approx(db_to_gain(-40))
+    assert envelope[5000] == pytest.approx(db_to_gain(-40) + db_to_gain(-10))
+
+
+def test_voice_activity_compares_hop_rms_to_threshold():
+    samples = np.zeros((1000, 2), dtype=np.float32)
+    samples[100:300] = 0.1  # -20dBFS
+    samples[500:600] = 0.001  # -60dBFS
+
+    activity = voice_activity(samples, 10_000, threshold_db=-45)
+
+    # 10ms hops of 100 frames
+    assert activity.tolist() == [0, 1, 1, 0, 0, 0, 0, 0, 0, 0]
+
+
+def test_fill_short_pauses():
+    activity = np.array([1, 0, 0, 1, 0, 0, 0, 0, 1, 0], dtype=bool)
+
+    filled = fill_short_pauses(activity, max_pause_hops=3)
+
+    assert filled.astype(int).tolist() == [1, 1, 1, 1, 0, 0, 0, 0, 1, 0]
+
+
+def test_silence_trim_mask_cuts_edges_and_long_pauses():
+    # 1s of silence, 0.5s of voice, a 2s pause, 0.5s of voice,
+    # 1s silence
+    samples = np.zeros((5000, 1), dtype=np.float32)
+    samples[1000:1500] = samples[3500:4000] = 0.3
+    trim = {"threshold_db": -50, "pad_ms": 100, "max_pause_ms": None}
+
+    keep = silence_trim_mask(samples, 1000, trim)
+
+    assert np.flatnonzero(keep).tolist() == list(range(900, 4100))
+
+    keep = silence_trim_mask(samples, 1000, {**trim, "max_pause_ms": 400})
+
+    assert np.count_nonzero(keep) == 100 + 500 + 400 + 500 + 100
+    assert keep[1500:1700].all() and keep[3300:3500].all()
+    assert not keep[1700:3300].any()
+
+
+def test_silence_trim_mask_keeps_silent_memos():
+    trim = {"threshold_db": -50, "pad_ms": 100, "max_pause_ms": None}
+
+    assert silence_trim_mask(np.zeros((500, 2)), 1000, trim).all()
+
+
+def test_ducking_amount_ramps_around_voice():
+    activity = np.zeros(12, dtype=bool)
+    activity[5:7] = True
+
+    amount = ducking_amount(activity, attack_hops=1, release_hops=3)
+
+    assert amount.tolist() == pytest.approx(
+        [0, 0, 0, 0, 0.5, 1, 1, 0.75, 0.5, 0.25, 0, 0]
+    )
+
+
+def test_voice_ducking_brings_music_up_in_pauses_inside_memos():
+    frame_rate = 1000
+    ducking = {"threshold_db": -45, "attack_ms": 100, "release_ms": 500, "hold_ms": 300}
+    # One memo: 2s of speech, a 4s pause, then 2s of speech
+    samples = np.zeros((8000, 1), dtype=np.float32)
+    samples[:2000] = samples[6000:] = 0.3
+    activity = voice_activity(samples, frame_rate, ducking["threshold_db"])
+
+    envelope = ducking_envelope(
+        ducking_gains(activity, frame_rate, ducking, -10, -40), frame_rate, 8000
+    )
+
+    assert envelope[1000] == pytest.approx(db_to_gain(-40))
+    assert envelope[4000] == pytest.approx(db_to_gain(-40) + db_to_gain(-10))
+    assert envelope[7000] == pytest.approx(db_to_gain(-40))
+    # Released over 500ms after the speech, attacked over 100ms before it
+    assert envelope[2250] < envelope[2600] == envelope[5800] > envelope[5950]
+
+
+def test_voice_ducking_matches_gaps_between_memos():
+    voice_segs = [make_tone(3, 220), make_tone(2, 330)]
+    voice_track, gap_ranges = build_voice_track(voice_segs)
+    bg_music = make_tone(15, 440, channels=2, amplitude=0.5)
+    ducking = {"threshold_db": -45, "attack_ms": 300, "release_ms": 300, "hold_ms": 500}
+
+    by_gaps, by_voice = (
+        segment_to_array(
+            render_final_mix(voice_track, bg_music, gap_ranges, 300, -10, -40, mode)
+        )
+        for mode in (None, ducking)
+    )
+
+    # Away from the fades, both put the music up in the gaps, down under voice
+    for start_ms, end_ms in gap_ranges[1:-1]:
+        middle = (start_ms + end_ms) // 2 * 44100 // 1000
+        np.testing.assert_allclose(by_voice[middle], by_gaps[middle], atol=1e-4)
+
+
+def test_numpy_engine_matches_pydub_engine(monkeypatch):
+    voice_segs = [make_tone(3 + i, 220 + 20 * i) for i in range(3)]
+    voice_track, gap_ranges = build_voice_track(voice_segs)
+    bg_music = make_tone(12, 440, channels=2, amplitude=0.5)
+
+    monkeypatch.setenv("MIXER_ENGINE", "numpy")
+    numpy_mix = segment_to_array(create_final_mix(voice_track, bg_music, gap_ranges))
+    pydub_mix = segment_to_array(
+        create_final_mix_pydub(voice_track, bg_music, gap_ranges)
+    )
+
+    assert numpy_mix.shape == pydub_mix.shape
+    error = np.sqrt(np.mean((numpy_mix - pydub_mix) ** 2))
+    assert error < 1e-3 * np.sqrt(np.mean(pydub_mix**2))
+
+
+def test_unknown_mixer_engine_raises(monkeypatch):
+    monkeypatch.setenv("MIXER_ENGINE", "sox")
+    with pytest.raises(UnknownMixerEngineError):
+        create_final_mix(make_tone(1, 440), make_tone(1, 220), [])
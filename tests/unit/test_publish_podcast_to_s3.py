@@ -1,93 +1,241 @@
 """Tests for the publish-podcast-to-s3 service."""
 
+import hashlib
 import os
-import tempfile
+import re
+from datetime import UTC, datetime
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import Mock, patch
 
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import ANY, Stubber
 
-def test_publish_script_exists():
-    """Test that the publish script exists and is executable."""
-    script_path = Path("src/publish-podcast-to-s3/publish.sh")
-    assert script_path.exists(), "publish.sh script should exist"
-    assert os.access(script_path, os.X_OK), "publish.sh should be executable"
+from src.publish_podcast_to_s3.publish import (
+    PublishError,
+    episode_key,
+    find_published_copy,
+    get_transfer_config,
+    main,
+    publish_podcast,
+    upload_episode,
+)
+from src.utils.s3 import NoS3CredentialsError, reset_s3_client
 
+ENV_VARS = {
+    "S3_BUCKET_NAME": "test-bucket",
+    "AWS_ACCESS_KEY_ID": "test-key",
+    "AWS_SECRET_ACCESS_KEY": "test-secret",
+}
 
-def test_input_file_validation():
-    """Test that the script validates input file existence."""
-    import subprocess
 
-    # Get absolute path to the script
-    script_path = Path("src/publish-podcast-to-s3/publish.sh").absolute()
+@pytest.fixture(autouse=True)
+def fresh_client():
+    reset_s3_client()
+    yield
+    reset_s3_client()
 
-    # Create a temporary directory to simulate missing input file
-    with tempfile.TemporaryDirectory() as temp_dir:
-        env = os.environ.copy()
-        env["S3_BUCKET_NAME"] = "test-bucket"
-        env["AWS_ACCESS_KEY_ID"] = "test-key"
-        env["AWS_SECRET_ACCESS_KEY"] = "test-secret"
 
-        # Change to temp directory where input file doesn't exist
-        result = subprocess.run(
-            ["bash", str(script_path)],
-            cwd=temp_dir,
-            env=env,
-            capture_output=True,
-            text=True,
-        )
+@pytest.fixture
+def podcast_file(tmp_path):
+    path = tmp_path / "voice_memo_mix.mp3"
+    path.write_bytes(b"podcast audio")
+    return path
 
-        assert result.returncode != 0, "Script should fail when input file is missing"
-        # Check both stdout and stderr for error message
-        output = result.stdout + result.stderr
-        assert "Input file" in output or "not found" in output
 
+def not_found(operation):
+    return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, operation)
 
-def test_environment_variable_validation():
-    """Test that the script validates required environment variables."""
-    import subprocess
 
-    # Test missing S3_BUCKET_NAME
-    result = subprocess.run(
-        ["bash", "src/publish-podcast-to-s3/publish.sh"],
-        env={},  # Empty environment
-        capture_output=True,
-        text=True,
-    )
+def test_publish_module_exists():
+    """Test that the publisher the entrypoint runs exists."""
+    assert Path("src/publish_podcast_to_s3/publish.py").exists()
 
-    assert result.returncode != 0, "Script should fail when S3_BUCKET_NAME is missing"
 
+def test_input_file_validation(tmp_path):
+    """Test that the publisher validates input file existence."""
+    with patch.dict(os.environ, ENV_VARS):
+        with pytest.raises(PublishError, match="not found"):
+            publish_podcast(tmp_path / "voice_memo_mix.mp3")
 
-@patch("subprocess.run")
-def test_timestamp_format(mock_run):
-    """Test that the timestamp format is correct."""
-    import re
-    from datetime import UTC, datetime
 
-    # Mock the aws s3 cp command
-    mock_run.return_value = MagicMock(returncode=0)
+def test_environment_variable_validation(podcast_file):
+    """Test that the publisher validates required environment variables."""
+    with patch.dict(os.environ, {}, clear=True):
+        with pytest.raises(NoS3CredentialsError):
+            publish_podcast(podcast_file)
 
-    # The timestamp should match ISO 8601 format: YYYY-MM-DDTHHMMSS
-    timestamp_pattern = r"^\d{4}-\d{2}-\d{2}T\d{6}\.mp3$"
 
-    # Generate a timestamp like the script does
-    timestamp = datetime.now(UTC).strftime("%Y-%m-%dT%H%M%S")
-    filename = f"{timestamp}.mp3"
+def test_main_exits_with_an_error(tmp_path):
+    """Test that a failed publish exits non-zero, failing the pipeline."""
+    with patch("src.publish_podcast_to_s3.publish.INPUT_FILE", tmp_path / "missing"):
+        with patch.dict(os.environ, {}, clear=True):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+    assert exc_info.value.code == 1
 
-    assert re.match(timestamp_pattern, filename), (
-        f"Filename {filename} should match ISO 8601 format"
-    )
+
+def test_timestamp_format():
+    """Test that the S3 key has an ISO 8601 timestamp filename."""
+    key = episode_key(Path("voice_memo_mix.mp3"), datetime.now(UTC))
+
+    assert re.match(r"^podcasts/\d{4}-\d{2}-\d{2}T\d{6}\.mp3$", key)
 
 
 def test_s3_destination_format():
-    """Test that the S3 destination path is correctly formatted."""
-    bucket_name = "test-podcast-bucket"
-    timestamp = "2025-01-15T143022"
-    filename = f"{timestamp}.mp3"
-
-    expected_destination = f"s3://{bucket_name}/podcasts/{filename}"
-
-    # This tests the format that should be used in the script
-    assert expected_destination == f"s3://{bucket_name}/podcasts/{filename}"
-    assert "/podcasts/" in expected_destination
-    assert expected_destination.startswith("s3://")
-    assert expected_destination.endswith(".mp3")
+    """Test that the S3 key is correctly formatted."""
+    published_at = datetime(2025, 1, 15, 14, 30, 22, tzinfo=UTC)
+
+    key = episode_key(Path("voice_memo_mix.mp3"), published_at)
+
+    assert key == "podcasts/2025-01-15T143022.mp3"
+
+
+def test_transfer_config():
+    """Test that the multipart settings come from the environment."""
+    env_vars = {"S3_MULTIPART_CHUNK_MB": "16", "S3_UPLOAD_CONCURRENCY": "4"}
+    with patch.dict(os.environ, env_vars):
+        config = get_transfer_config()
+
+    assert config.multipart_chunksize == 16 * 1024 * 1024
+    assert config.multipart_threshold == 16 * 1024 * 1024
+    assert config.max_concurrency == 4
+
+    with patch.dict(os.environ, {"S3_MULTIPART_CHUNK_MB": "4"}):
+        with pytest.raises(ValueError, match="at least 5"):
+            get_transfer_config()
+
+
+def test_upload_episode_in_checksummed_parts(tmp_path):
+    """Test that large files are uploaded in parts, each with a checksum."""
+    path = tmp_path / "voice_memo_mix.mp3"
+    path.write_bytes(os.urandom(12 * 1024 * 1024))
+    client = boto3.client(
+        "s3",
+        region_name="us-east-1",
+        aws_access_key_id="test-key",
+        aws_secret_access_key="test-secret",
+    )
+
+    with Stubber(client) as stubber:
+        stubber.add_response(
+            "create_multipart_upload",
+            {"UploadId": "upload"},
+            {
+                "Bucket": "test-bucket",
+                "Key": "podcasts/episode.mp3",
+                "ContentType": "audio/mpeg",
+                "ChecksumAlgorithm": "SHA256",
+                "Metadata": {"content-sha256": "abc"},
+            },
+        )
+        for _ in range(3):  # 12 MB in 5 MB parts
+            stubber.add_response(
+                "upload_part",
+                {"ETag": '"part"'},
+                {
+                    "Bucket": "test-bucket",
+                    "Key": "podcasts/episode.mp3",
+                    "UploadId": "upload",
+                    "PartNumber": ANY,
+                    "Body": ANY,
+                    "ChecksumAlgorithm": "SHA256",
+                },
+            )
+        stubber.add_response(
+            "complete_multipart_upload",
+            {},
+            {
+                "Bucket": "test-bucket",
+                "Key": "podcasts/episode.mp3",
+                "UploadId": "upload",
+                "MultipartUpload": ANY,
+            },
+        )
+        env_vars = {"S3_MULTIPART_CHUNK_MB": "5", "S3_UPLOAD_CONCURRENCY": "1"}
+        with patch.dict(os.environ, env_vars):
+            upload_episode(client, "test-bucket", path, "podcasts/episode.mp3", "abc")
+        stubber.assert_no_pending_responses()
+
+
+@patch("src.publish_podcast_to_s3.publish.upload_episode")
+@patch("src.publish_podcast_to_s3.publish.get_s3_client")
+def test_publish_podcast_uploads_and_records_checksum(
+    mock_get_client, mock_upload, podcast_file
+):
+    """Test that a new file is uploaded and its checksum recorded."""
+    client = mock_get_client.return_value
+    client.head_object.side_effect = not_found("HeadObject")
+    content_sha256 = hashlib.sha256(b"podcast audio").hexdigest()
+    published_at = datetime(2025, 1, 15, 14, 30, 22, tzinfo=UTC)
+
+    with patch.dict(os.environ, ENV_VARS):
+        key = publish_podcast(podcast_file, published_at)
+
+    assert key == "podcasts/2025-01-15T143022.mp3"
+    mock_upload.assert_called_once_with(
+        client, "test-bucket", podcast_file, key, content_sha256
+    )
+    client.put_object.assert_called_once_with(
+        Bucket="test-bucket",
+        Key=f"checksums/{content_sha256}",
+        Body=b"",
+        Metadata={"episode-key": key},
+    )
+
+
+@patch("src.publish_podcast_to_s3.publish.upload_episode")
+@patch("src.publish_podcast_to_s3.publish.get_s3_client")
+def test_publish_podcast_skips_published_file(
+    mock_get_client, mock_upload, podcast_file
+):
+    """Test that a file already published is not uploaded again."""
+    client = mock_get_client.return_value
+    content_sha256 = hashlib.sha256(b"podcast audio").hexdigest()
+    client.head_object.side_effect = [
+        {"Metadata": {"episode-key": "podcasts/2025-01-14T080000.mp3"}},
+        {"Metadata": {"content-sha256": content_sha256}},
+    ]
+
+    with patch.dict(os.environ, ENV_VARS):
+        key = publish_podcast(podcast_file)
+
+    assert key == "podcasts/2025-01-14T080000.mp3"
+    client.head_object.assert_called_with(
+        Bucket="test-bucket", Key="podcasts/2025-01-14T080000.mp3"
+    )
+    mock_upload.assert_not_called()
+    client.put_object.assert_not_called()
+
+
+def test_find_published_copy_of_replaced_episode():
+    """Test that a marker pointing at a since-replaced episode is ignored."""
+    client = Mock()
+    client.head_object.side_effect = [
+        {"Metadata": {"episode-key": "podcasts/2025-01-14T080000.mp3"}},
+        {"Metadata": {"content-sha256": "other"}},
+    ]
+
+    assert find_published_copy(client, "test-bucket", "abc") is None
+
+
+@patch("src.publish_podcast_to_s3.publish.upload_episode")
+@patch("src.publish_podcast_to_s3.publish.get_s3_client")
+def test_publish_podcast_creates_bucket_on_custom_endpoint(
+    mock_get_client, mock_upload, podcast_file
+):
+    """Test that a missing bucket is created on MinIO, replacing `aws s3 mb`."""
+    client = mock_get_client.return_value
+    client.head_object.side_effect = not_found("HeadObject")
+    mock_upload.side_effect = [
+        ClientError({"Error": {"Code": "NoSuchBucket"}}, "PutObject"),
+        None,
+    ]
+
+    env_vars = {**ENV_VARS, "AWS_ENDPOINT_URL": "http://minio:9000"}
+    with patch.dict(os.environ, env_vars):
+        publish_podcast(podcast_file)
+
+    client.create_bucket.assert_called_once_with(Bucket="test-bucket")
+    assert mock_upload.call_count == 2
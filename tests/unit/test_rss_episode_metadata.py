@@ -0,0 +1,112 @@
+"""Tests for the RSS feed's episode metadata cache."""
+
+import io
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.update_rss_feed.episode_metadata import (
+    get_episode_metadata,
+    id3v2_size,
+    load_episode_cache,
+    mp3_duration,
+)
+
+# MPEG-1 Layer III, 128kbps, 44.1kHz, stereo; frames are 417 bytes
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+FRAME_BYTES = 417
+
+
+def info_frame(frames):
+    """Return a LAME-style Info frame recording the number of audio frames."""
+    body = bytes(32) + b"Info" + (1).to_bytes(4, "big") + frames.to_bytes(4, "big")
+    return (FRAME_HEADER + body).ljust(FRAME_BYTES, b"\0")
+
+
+def id3_tag(payload_bytes):
+    size = bytes((payload_bytes >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x04\x00\x00" + size + bytes(payload_bytes)
+
+
+def test_mp3_duration_from_info_frame():
+    """Test that the Xing/Info frame count gives the exact duration."""
+    data = info_frame(frames=38281) + FRAME_HEADER.ljust(FRAME_BYTES, b"\0")
+
+    # 38281 frames of 1152 samples at 44.1kHz
+    assert mp3_duration(data, size=10_000_000) == pytest.approx(1000.0, abs=0.01)
+
+
+def test_mp3_duration_assumes_constant_bitrate_without_info_frame():
+    """Test that files without an Info frame are estimated from their bitrate."""
+    data = b"junk" + FRAME_HEADER.ljust(FRAME_BYTES, b"\0")
+
+    # 16000 bytes of audio at 128kbps past a 1000 byte tag and 4 bytes of junk
+    duration = mp3_duration(data, size=17004, audio_start=1000)
+
+    assert duration == pytest.approx(1.0)
+
+
+def test_mp3_duration_without_frames():
+    assert mp3_duration(b"not an mp3 at all", size=17) is None
+
+
+def test_id3v2_size():
+    tag = id3_tag(300)
+
+    assert id3v2_size(tag + info_frame(1)) == len(tag)
+    assert id3v2_size(info_frame(1)) == 0
+
+
+def fake_s3_client(files):
+    """Return an S3 client whose get_object serves ranges of in-memory files."""
+    client = Mock()
+
+    def get_object(Bucket, Key, Range):
+        start, end = map(int, Range.removeprefix("bytes=").split("-"))
+        return {"Body": io.BytesIO(files[Key][start : end + 1])}
+
+    client.get_object.side_effect = get_object
+    return client
+
+
+def listed(key, data, etag="abc"):
+    return {"key": key, "size": len(data), "etag": etag}
+
+
+def test_get_episode_metadata_probes_only_new_or_changed_files(tmp_path):
+    """Test that cached durations are reused until the object changes."""
+    files = {
+        "podcasts/a.mp3": id3_tag(100_000) + info_frame(frames=3828),
+        "podcasts/b.mp3": info_frame(frames=7656),
+    }
+    client = fake_s3_client(files)
+    cache_path = tmp_path / "rss" / "episodes.json"
+    podcast_files = [listed(key, data) for key, data in files.items()]
+
+    with patch.dict(os.environ, {"S3_BUCKET_NAME": "test-bucket"}):
+        metadata = get_episode_metadata(client, podcast_files, cache_path)
+        # The ID3 tag is longer than the first range, so a.mp3 takes two reads
+        assert client.get_object.call_count == 3
+        assert metadata["podcasts/a.mp3"]["duration_s"] == pytest.approx(100, 0.01)
+        assert metadata["podcasts/b.mp3"]["duration_s"] == pytest.approx(200, 0.01)
+        assert set(load_episode_cache(cache_path)) == set(files)
+
+        client.get_object.reset_mock()
+        assert get_episode_metadata(client, podcast_files, cache_path) == metadata
+        client.get_object.assert_not_called()
+
+        podcast_files[1]["etag"] = "replaced"
+        get_episode_metadata(client, podcast_files, cache_path)
+        assert client.get_object.call_count == 1
+
+
+def test_get_episode_metadata_skips_probing_other_formats(tmp_path):
+    client = Mock()
+    podcast_files = [listed("podcasts/a.m4a", bytes(100))]
+
+    with patch.dict(os.environ, {"S3_BUCKET_NAME": "test-bucket"}):
+        metadata = get_episode_metadata(client, podcast_files, tmp_path / "e.json")
+
+    assert metadata["podcasts/a.m4a"]["duration_s"] is None
+    client.get_object.assert_not_called()
@@ -0,0 +1,55 @@
+"""Tests for the RSS feed state used by incremental updates."""
+
+from src.update_rss_feed.feed_state import (
+    load_feed_state,
+    read_spliceable_feed,
+    save_feed_state,
+)
+
+CHANNEL = {"title": "WaffleBot Podcast"}
+FEED = "<rss>feed</rss>\n"
+
+
+def test_save_feed_state_tracks_the_last_key(tmp_path):
+    state_path = tmp_path / "feed-state.json"
+    files = [
+        {"key": "podcasts/2025-01-16T091545.mp3"},
+        {"key": "podcasts/2025-01-15T143022.mp3"},
+    ]
+
+    state = save_feed_state(state_path, FEED, files, CHANNEL)
+    assert state["last_key"] == "podcasts/2025-01-16T091545.mp3"
+    assert load_feed_state(state_path) == state
+
+    state = save_feed_state(
+        state_path, FEED, [{"key": "podcasts/2025-01-17T080000.mp3"}], CHANNEL, state
+    )
+    assert state["last_key"] == "podcasts/2025-01-17T080000.mp3"
+    assert state["episodes"] == 3
+
+
+def test_read_spliceable_feed(tmp_path):
+    feed_path = tmp_path / "podcast.xml"
+    feed_path.write_text(FEED, encoding="utf-8")
+    state = save_feed_state(
+        tmp_path / "feed-state.json", FEED, [{"key": "podcasts/a.mp3"}], CHANNEL
+    )
+
+    assert read_spliceable_feed(state, feed_path, CHANNEL) == FEED
+    assert read_spliceable_feed(None, feed_path, CHANNEL) is None
+    # Changed channel metadata needs a full rebuild
+    assert read_spliceable_feed(state, feed_path, {"title": "Other"}) is None
+    # So does a local feed that isn't the one that was published
+    feed_path.write_text("<rss>edited</rss>\n", encoding="utf-8")
+    assert read_spliceable_feed(state, feed_path, CHANNEL) is None
+    feed_path.unlink()
+    assert read_spliceable_feed(state, feed_path, CHANNEL) is None
+
+
+def test_load_feed_state_ignores_invalid_files(tmp_path):
+    state_path = tmp_path / "feed-state.json"
+    assert load_feed_state(state_path) is None
+    state_path.write_text("not json", encoding="utf-8")
+    assert load_feed_state(state_path) is None
+    state_path.write_text('{"version": 0}', encoding="utf-8")
+    assert load_feed_state(state_path) is None
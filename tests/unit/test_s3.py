@@ -0,0 +1,72 @@
+"""Tests for the shared S3 client."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.utils.s3 import get_s3_client, reset_s3_client, s3_error
+
+ENV_VARS = {
+    "AWS_ACCESS_KEY_ID": "test-key",
+    "AWS_SECRET_ACCESS_KEY": "test-secret",
+    "S3_BUCKET_NAME": "test-bucket",
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_client():
+    reset_s3_client()
+    yield
+    reset_s3_client()
+
+
+@patch("boto3.Session")
+def test_client_config(mock_session):
+    """Test the pool, retry and keepalive settings of the shared client."""
+    env_vars = {
+        **ENV_VARS,
+        "S3_MAX_POOL_CONNECTIONS": "32",
+        "AWS_ENDPOINT_URL": "http://minio:9000",
+    }
+    with patch.dict(os.environ, env_vars):
+        get_s3_client()
+
+    kwargs = mock_session.return_value.client.call_args.kwargs
+    assert kwargs["endpoint_url"] == "http://minio:9000"
+    config = kwargs["config"]
+    assert config.max_pool_connections == 32
+    assert config.retries == {"mode": "adaptive", "max_attempts": 5}
+    assert config.tcp_keepalive is True
+
+
+@patch("boto3.Session")
+def test_client_is_shared_until_settings_change(mock_session):
+    with patch.dict(os.environ, ENV_VARS):
+        first = get_s3_client()
+        assert get_s3_client() is first
+    with patch.dict(os.environ, {**ENV_VARS, "AWS_REGION": "eu-west-1"}):
+        get_s3_client()
+
+    assert mock_session.call_count == 2
+
+
+def test_invalid_pool_size():
+    with patch.dict(os.environ, {**ENV_VARS, "S3_MAX_POOL_CONNECTIONS": "0"}):
+        with pytest.raises(ValueError, match="S3_MAX_POOL_CONNECTIONS"):
+            get_s3_client()
+
+
+@pytest.mark.parametrize(
+    "code, message",
+    [
+        ("InvalidAccessKeyId", "Access denied"),
+        ("NoSuchBucket", "bucket not found"),
+        ("SlowDown", "Failed to upload"),
+    ],
+)
+def test_s3_error(code, message):
+    error = ClientError({"Error": {"Code": code, "Message": "..."}}, "PutObject")
+
+    assert message in str(s3_error("upload the feed", error))
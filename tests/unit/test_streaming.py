@@ -0,0 +1,235 @@
+"""Tests for the streaming render mode of the mixer."""
+
+import numpy as np
+import pytest
+from pydub.effects import normalize  # type: ignore[import]
+
+from src.mixer import streaming
+from src.mixer.engine import (
+    array_to_segment,
+    ducking_gains,
+    fade_envelope,
+    ms_to_frames,
+    place_voice_activity,
+    render_final_mix,
+    segment_to_array,
+    voice_activity,
+)
+from src.mixer.generate_audio import (
+    CROSSFADE_MS,
+    GAP_FADE_MS,
+    GAP_MS,
+    INTRO_MS,
+    MUSIC_UNDER_VOICE_DB,
+    MUSIC_WITHOUT_VOICE_DB,
+    OUTRO_MS,
+    build_voice_track,
+)
+from src.mixer.streaming import (
+    MusicStream,
+    MusicStreamExhaustedError,
+    prepare_voice_stem,
+    render_blocks,
+)
+from src.mixer.timeline import plan_voice_track
+from src.utils.loudness import integrated_loudness
+
+# pydub builds silence at 11025Hz, so use that to keep both paths aligned
+FRAME_RATE = 11025
+
+
+def make_tone(seconds, frequency, channels=2, amplitude=0.3):
+    t = np.arange(int(seconds * FRAME_RATE), dtype=np.float32) / FRAME_RATE
+    samples = (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+    return np.repeat(samples[:, np.newaxis], channels, axis=1)
+
+
+class ArrayMusic:
+    """Music source that loops an in-memory array."""
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.position = 0
+
+    def read(self, num_frames):
+        indices = (self.position + np.arange(num_frames)) % len(self.samples)
+        self.position += num_frames
+        return self.samples[indices]
+
+
+def test_plan_voice_track_matches_build_voice_track():
+    segs = [array_to_segment(make_tone(s, 300), FRAME_RATE) for s in (2, 3.5, 1)]
+    voice_track, gap_ranges = build_voice_track(segs)
+
+    _, planned_gaps, total_ms = plan_voice_track(
+        [len(seg) for seg in segs], INTRO_MS, GAP_MS, OUTRO_MS, CROSSFADE_MS
+    )
+
+    assert planned_gaps == gap_ranges
+    assert total_ms == len(voice_track)
+
+
+def test_prepare_voice_stem_matches_pydub_processing():
+    samples = make_tone(2, 300, amplitude=0.2)
+    expected = segment_to_array(
+        normalize(array_to_segment(samples, FRAME_RATE)).fade_in(200).fade_out(200)
+    )
+
+    stem = prepare_voice_stem(samples, FRAME_RATE, 60_000, 200, crossfade_ms=0)
+
+    assert np.abs(stem).max() == pytest.approx(np.abs(expected).max(), abs=1e-3)
+    assert np.sqrt(np.mean((stem - expected) ** 2)) < 1e-3
+
+
+def test_prepare_voice_stem_normalizes_loudness():
+    samples = make_tone(4, 300, amplitude=0.02)
+
+    stem = prepare_voice_stem(
+        samples, FRAME_RATE, 60_000, 0, crossfade_ms=0, target_lufs=-20.0
+    )
+
+    assert integrated_loudness(stem, FRAME_RATE) == pytest.approx(-20.0, abs=0.01)
+
+
+def test_prepare_voice_stem_trims_silence():
+    silence = np.zeros((FRAME_RATE, 2), dtype=np.float32)
+    samples = np.concatenate([silence, make_tone(2, 300), silence])
+    trim = {"threshold_db": -50, "pad_ms": 200, "max_pause_ms": None}
+
+    stem = prepare_voice_stem(samples, FRAME_RATE, 60_000, 0, 0, trim=trim)
+
+    assert abs(len(stem) - 2.4 * FRAME_RATE) < ms_to_frames(10, FRAME_RATE)
+
+
+def test_prepare_voice_stem_truncates():
+    stem = prepare_voice_stem(make_tone(2, 300), FRAME_RATE, 1000, 200, 500)
+    assert len(stem) == FRAME_RATE
+
+
+def test_render_blocks_matches_in_memory_engine():
+    memos = [make_tone(s, 200 + 50 * i) for i, s in enumerate((2, 3, 1.5))]
+    music = make_tone(7, 440, amplitude=0.5)
+
+    # In-memory reference: memos already carry their crossfade fade-in, so
+    # both paths see identical stems
+    crossfade_frames = ms_to_frames(CROSSFADE_MS, FRAME_RATE)
+    stems = [m * fade_envelope(len(m), crossfade_frames, 0)[:, None] for m in memos]
+    segs = [array_to_segment(m, FRAME_RATE) for m in memos]
+    voice_track, gap_ranges = build_voice_track(segs)
+    expected = segment_to_array(
+        render_final_mix(
+            voice_track,
+            array_to_segment(music, FRAME_RATE),
+            gap_ranges,
+            GAP_FADE_MS,
+            MUSIC_WITHOUT_VOICE_DB,
+            MUSIC_UNDER_VOICE_DB,
+        )
+    )
+
+    starts_ms, planned_gaps, total_ms = plan_voice_track(
+        [len(seg) for seg in segs], INTRO_MS, GAP_MS, OUTRO_MS, CROSSFADE_MS
+    )
+    blocks = render_blocks(
+        stems,
+        [ms_to_frames(start, FRAME_RATE) for start in starts_ms],
+        ArrayMusic(music),
+        planned_gaps,
+        ms_to_frames(total_ms, FRAME_RATE),
+        FRAME_RATE,
+        2,
+        block_frames=3001,
+        gap_fade_ms=GAP_FADE_MS,
+        music_without_voice_db=MUSIC_WITHOUT_VOICE_DB,
+        music_under_voice_db=MUSIC_UNDER_VOICE_DB,
+    )
+    rendered = np.concatenate(list(blocks))
+
+    assert rendered.shape == expected.shape
+    assert np.abs(rendered - expected).max() < 1e-3
+
+
+def test_render_blocks_ducks_voice_like_in_memory_engine():
+    memos = [make_tone(s, 200 + 50 * i) for i, s in enumerate((2, 3))]
+    music = make_tone(7, 440, amplitude=0.5)
+    ducking = {"threshold_db": -45, "attack_ms": 300, "release_ms": 800, "hold_ms": 500}
+
+    crossfade_frames = ms_to_frames(CROSSFADE_MS, FRAME_RATE)
+    stems = [m * fade_envelope(len(m), crossfade_frames, 0)[:, None] for m in memos]
+    segs = [array_to_segment(m, FRAME_RATE) for m in memos]
+    voice_track, gap_ranges = build_voice_track(segs)
+    expected = segment_to_array(
+        render_final_mix(
+            voice_track,
+            array_to_segment(music, FRAME_RATE),
+            gap_ranges,
+            GAP_FADE_MS,
+            MUSIC_WITHOUT_VOICE_DB,
+            MUSIC_UNDER_VOICE_DB,
+            ducking,
+        )
+    )
+
+    starts_ms, planned_gaps, total_ms = plan_voice_track(
+        [len(seg) for seg in segs], INTRO_MS, GAP_MS, OUTRO_MS, CROSSFADE_MS
+    )
+    starts = [ms_to_frames(start, FRAME_RATE) for start in starts_ms]
+    total_frames = ms_to_frames(total_ms, FRAME_RATE)
+    activity = place_voice_activity(
+        [voice_activity(stem, FRAME_RATE, ducking["threshold_db"]) for stem in stems],
+        starts,
+        total_frames,
+        FRAME_RATE,
+    )
+    blocks = render_blocks(
+        stems,
+        starts,
+        ArrayMusic(music),
+        planned_gaps,
+        total_frames,
+        FRAME_RATE,
+        2,
+        block_frames=3001,
+        gap_fade_ms=GAP_FADE_MS,
+        music_without_voice_db=MUSIC_WITHOUT_VOICE_DB,
+        music_under_voice_db=MUSIC_UNDER_VOICE_DB,
+        music_gains=ducking_gains(
+            activity,
+            FRAME_RATE,
+            ducking,
+            MUSIC_WITHOUT_VOICE_DB,
+            MUSIC_UNDER_VOICE_DB,
+        ),
+    )
+    rendered = np.concatenate(list(blocks))
+
+    # Stems land on the 10ms activity hops to within a hop, which can shift
+    # the ducking ramps by as much
+    assert rendered.shape == expected.shape
+    assert np.abs(rendered - expected).max() < 0.02
+
+
+def test_music_stream_loops_playlist(monkeypatch, tmp_path):
+    decoded = {
+        "a.mp3": np.full((5, 2), 1.0, dtype=np.float32),
+        "b.mp3": np.full((3, 2), 2.0, dtype=np.float32),
+    }
+
+    def fake_iter_decoded_blocks(path, frame_rate, channels, block_frames):
+        samples = decoded[path.name]
+        for start in range(0, len(samples), block_frames):
+            yield samples[start : start + block_frames]
+
+    monkeypatch.setattr(streaming, "iter_decoded_blocks", fake_iter_decoded_blocks)
+    music = MusicStream([tmp_path / "a.mp3", tmp_path / "b.mp3"], FRAME_RATE, 2, 2)
+
+    assert music.read(6)[:, 0].tolist() == [1, 1, 1, 1, 1, 2]
+    assert music.read(6)[:, 0].tolist() == [2, 2, 1, 1, 1, 1]
+
+
+def test_music_stream_without_audio_raises(monkeypatch, tmp_path):
+    monkeypatch.setattr(streaming, "iter_decoded_blocks", lambda *args: iter([]))
+    music = MusicStream([tmp_path / "silent.mp3"], FRAME_RATE, 2, 2)
+
+    with pytest.raises(MusicStreamExhaustedError):
+        music.read(1)
@@ -1,7 +1,10 @@
 """Tests for the update-rss-feed service."""
 
+import gzip
+import hashlib
 import os
 import tempfile
+import xml.etree.ElementTree as ET
 from datetime import datetime, timezone
 from pathlib import Path
 from unittest.mock import Mock, patch
@@ -11,6 +14,7 @@ import pytest
 from src.update_rss_feed.generate_rss import (
     NoS3CredentialsError,
     S3AccessError,
+    build_episode_item,
     generate_rss_feed_content,
     get_s3_client,
     list_podcast_files,
@@ -18,6 +22,7 @@ from src.update_rss_feed.generate_rss import (
     update_rss_feed,
     upload_rss_feed,
 )
+from src.utils.s3 import reset_s3_client
 
 
 def test_module_imports():
@@ -30,6 +35,12 @@ def test_module_imports():
 class TestS3Client:
     """Tests for S3 client creation and validation."""
 
+    @pytest.fixture(autouse=True)
+    def fresh_client(self):
+        reset_s3_client()
+        yield
+        reset_s3_client()
+
     def test_missing_credentials_raises_error(self):
         """Test that missing AWS credentials raise appropriate error."""
         with patch.dict(os.environ, {}, clear=True):
@@ -39,11 +50,10 @@ class TestS3Client:
 
     @patch("boto3.Session")
     def test_successful_s3_client_creation(self, mock_session):
-        """Test successful S3 client creation with valid credentials."""
+        """Test that the client is created once, without a validation request."""
         # Mock the session and client
         mock_client = Mock()
         mock_session.return_value.client.return_value = mock_client
-        mock_client.head_bucket.return_value = {}
 
         env_vars = {
             "AWS_ACCESS_KEY_ID": "test-key",
@@ -55,19 +65,23 @@ class TestS3Client:
         with patch.dict(os.environ, env_vars):
             client = get_s3_client()
             assert client == mock_client
-            mock_client.head_bucket.assert_called_once_with(Bucket="test-bucket")
+            assert get_s3_client() is client
+            mock_session.assert_called_once()
+            mock_client.head_bucket.assert_not_called()
 
     @patch("boto3.Session")
     def test_s3_access_denied_raises_error(self, mock_session):
-        """Test that S3 access denied raises appropriate error."""
+        """Test that S3 access denied surfaces on the first real request."""
         from botocore.exceptions import ClientError
 
         mock_client = Mock()
         mock_session.return_value.client.return_value = mock_client
 
         # Mock access denied error
-        error_response = {"Error": {"Code": "403", "Message": "Access Denied"}}
-        mock_client.head_bucket.side_effect = ClientError(error_response, "HeadBucket")
+        error_response = {"Error": {"Code": "AccessDenied", "Message": "Denied"}}
+        mock_client.get_paginator.return_value.paginate.side_effect = ClientError(
+            error_response, "ListObjectsV2"
+        )
 
         env_vars = {
             "AWS_ACCESS_KEY_ID": "test-key",
@@ -76,8 +90,9 @@ class TestS3Client:
         }
 
         with patch.dict(os.environ, env_vars):
+            client = get_s3_client()
             with pytest.raises(S3AccessError) as exc_info:
-                get_s3_client()
+                list_podcast_files(client)
             assert "Access denied" in str(exc_info.value)
 
 
@@ -122,6 +137,20 @@ class TestListPodcastFiles:
         assert "url" in files[0]
         assert "test-bucket" in files[0]["url"]
 
+    def test_list_podcast_files_start_after(self):
+        """Test that only keys after the given one are listed."""
+        mock_s3_client = Mock()
+        mock_paginator = Mock()
+        mock_s3_client.get_paginator.return_value = mock_paginator
+        mock_paginator.paginate.return_value = [{}]
+
+        with patch.dict(os.environ, {"S3_BUCKET_NAME": "test-bucket"}):
+            list_podcast_files(mock_s3_client, start_after="podcasts/a.mp3")
+
+        mock_paginator.paginate.assert_called_once_with(
+            Bucket="test-bucket", Prefix="podcasts/", StartAfter="podcasts/a.mp3"
+        )
+
     def test_list_podcast_files_empty_bucket(self):
         """Test listing files from empty bucket."""
         mock_s3_client = Mock()
@@ -163,30 +192,99 @@ class TestListPodcastFiles:
         assert files[0]["filename"] == "episode1.mp3"
 
 
+ITUNES = "{http://www.itunes.com/dtds/podcast-1.0.dtd}"
+
+
+def podcast_file(filename, size=1024000, last_modified=None):
+    return {
+        "key": f"podcasts/{filename}",
+        "filename": filename,
+        "last_modified": last_modified or datetime.now(timezone.utc),
+        "size": size,
+        "url": f"https://test-bucket.s3.amazonaws.com/podcasts/{filename}",
+    }
+
+
 class TestRSSGeneration:
     """Tests for RSS feed generation."""
 
-    def test_generate_rss_feed_content_stub(self):
-        """Test the stub RSS feed generation."""
+    def test_generate_rss_feed_content_items(self):
+        """Test that each podcast file becomes a complete item, newest first."""
         podcast_files = [
-            {"filename": "episode1.mp3", "last_modified": datetime.now(timezone.utc)},
-            {"filename": "episode2.mp3", "last_modified": datetime.now(timezone.utc)},
+            podcast_file("2025-01-15T143022.mp3", size=1000),
+            podcast_file("2025-01-16T091545.mp3", size=2000),
         ]
+        metadata = {"podcasts/2025-01-16T091545.mp3": {"duration_s": 3723.4}}
 
-        rss_content = generate_rss_feed_content(podcast_files)
+        with patch.dict(os.environ, {"S3_BUCKET_NAME": "test-bucket"}):
+            rss_content = generate_rss_feed_content(podcast_files, metadata)
+
+        channel = ET.fromstring(rss_content).find("channel")
+        assert channel.findtext("title") == "WaffleBot Podcast"
+        assert channel.findtext("lastBuildDate") == "Thu, 16 Jan 2025 09:15:45 +0000"
+        items = channel.findall("item")
+        assert [item.findtext("guid") for item in items] == [
+            "podcasts/2025-01-16T091545.mp3",
+            "podcasts/2025-01-15T143022.mp3",
+        ]
+        newest = items[0]
+        assert newest.findtext("title") == "WaffleBot Podcast: January 16, 2025"
+        assert newest.findtext("pubDate") == "Thu, 16 Jan 2025 09:15:45 +0000"
+        assert newest.find("guid").get("isPermaLink") == "false"
+        enclosure = newest.find("enclosure")
+        assert enclosure.get("url") == podcast_files[1]["url"]
+        assert enclosure.get("length") == "2000"
+        assert enclosure.get("type") == "audio/mpeg"
+        assert newest.findtext(f"{ITUNES}duration") == "1:02:03"
+        # Without cached metadata the duration is left out
+        assert items[1].find(f"{ITUNES}duration") is None
+
+    def test_generate_rss_feed_content_escapes_text(self):
+        """Test that channel metadata is escaped."""
+        env_vars = {"S3_BUCKET_NAME": "test-bucket", "RSS_TITLE": "Waffles & <Co>"}
 
-        assert "<?xml version=" in rss_content
-        assert "<rss version=" in rss_content
-        assert "WaffleBot Podcast" in rss_content
-        assert "Found 2 episodes" in rss_content
-        assert "lastBuildDate" in rss_content
+        with patch.dict(os.environ, env_vars):
+            rss_content = generate_rss_feed_content([podcast_file("episode1.mp3")])
+
+        channel = ET.fromstring(rss_content).find("channel")
+        assert channel.findtext("title") == "Waffles & <Co>"
+
+    def test_build_episode_item_without_timestamp(self):
+        """Test that files not named after a timestamp use their upload time."""
+        uploaded = datetime(2025, 2, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+        item = build_episode_item(
+            podcast_file("episode1.m4a", last_modified=uploaded), None, "WaffleBot"
+        )
+
+        assert item["title"] == "episode1"
+        assert item["pub_date"] == "Sat, 01 Feb 2025 08:00:00 +0000"
+        assert item["mime_type"] == "audio/x-m4a"
+        assert item["duration_s"] is None
+
+    def test_splicing_matches_a_full_rebuild(self):
+        """Test that splicing new episodes into a feed equals regenerating it."""
+        old_files = [
+            podcast_file("2025-01-15T143022.mp3"),
+            podcast_file("2025-01-16T091545.mp3"),
+        ]
+        new_files = [podcast_file("2025-01-17T080000.mp3")]
+        metadata = {"podcasts/2025-01-17T080000.mp3": {"duration_s": 60}}
+
+        with patch.dict(os.environ, {"S3_BUCKET_NAME": "test-bucket"}):
+            existing_feed = generate_rss_feed_content(old_files)
+            spliced = generate_rss_feed_content(new_files, metadata, existing_feed)
+            rebuilt = generate_rss_feed_content(old_files + new_files, metadata)
+
+        assert spliced == rebuilt
 
     def test_generate_rss_feed_content_empty_list(self):
         """Test RSS generation with empty podcast list."""
         rss_content = generate_rss_feed_content([])
 
-        assert "<?xml version=" in rss_content
-        assert "Found 0 episodes" in rss_content
+        channel = ET.fromstring(rss_content).find("channel")
+        assert channel.findall("item") == []
+        assert channel.find("lastBuildDate") is None
 
 
 class TestRSSUpload:
@@ -219,6 +317,76 @@ class TestRSSUpload:
         call_args = mock_s3_client.put_object.call_args
         assert call_args[1]["Key"] == "rss/podcast.xml"  # Default name
 
+    def test_upload_rss_feed_skips_unchanged_feed(self):
+        """Test that a feed whose hash matches the object's metadata isn't re-sent."""
+        mock_s3_client = Mock()
+        rss_content = "<rss>test content</rss>"
+        content_sha256 = hashlib.sha256(rss_content.encode("utf-8")).hexdigest()
+        mock_s3_client.head_object.return_value = {
+            "ETag": '"0123"',
+            "Metadata": {"content-sha256": content_sha256},
+        }
+
+        with patch.dict(os.environ, {"S3_BUCKET_NAME": "test-bucket"}):
+            assert not upload_rss_feed(mock_s3_client, rss_content)
+
+        mock_s3_client.head_object.assert_called_once_with(
+            Bucket="test-bucket", Key="rss/podcast.xml"
+        )
+        mock_s3_client.put_object.assert_not_called()
+
+    def test_upload_rss_feed_compares_etag_without_metadata(self):
+        """Test that objects uploaded without a hash are compared by ETag."""
+        mock_s3_client = Mock()
+        rss_content = "<rss>test content</rss>"
+        md5 = hashlib.md5(rss_content.encode("utf-8")).hexdigest()
+        mock_s3_client.head_object.return_value = {"ETag": f'"{md5}"'}
+
+        with patch.dict(os.environ, {"S3_BUCKET_NAME": "test-bucket"}):
+            assert not upload_rss_feed(mock_s3_client, rss_content)
+            mock_s3_client.put_object.assert_not_called()
+
+            mock_s3_client.head_object.return_value = {"ETag": '"0123"'}
+            assert upload_rss_feed(mock_s3_client, rss_content)
+
+        metadata = mock_s3_client.put_object.call_args[1]["Metadata"]
+        assert metadata == {
+            "content-sha256": hashlib.sha256(rss_content.encode("utf-8")).hexdigest()
+        }
+
+    def test_upload_rss_feed_when_missing(self):
+        """Test that a feed is uploaded when the HEAD request finds nothing."""
+        from botocore.exceptions import ClientError
+
+        mock_s3_client = Mock()
+        mock_s3_client.head_object.side_effect = ClientError(
+            {"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject"
+        )
+
+        with patch.dict(os.environ, {"S3_BUCKET_NAME": "test-bucket"}):
+            assert upload_rss_feed(mock_s3_client, "<rss>test content</rss>")
+
+        mock_s3_client.put_object.assert_called_once()
+
+    def test_upload_rss_feed_gzip_variant(self):
+        """Test that RSS_GZIP=1 also uploads a gzip-encoded copy."""
+        mock_s3_client = Mock()
+        mock_s3_client.head_object.return_value = {}
+        rss_content = "<rss>test content</rss>"
+
+        env_vars = {"S3_BUCKET_NAME": "test-bucket", "RSS_GZIP": "1"}
+        with patch.dict(os.environ, env_vars):
+            upload_rss_feed(mock_s3_client, rss_content)
+
+        plain, compressed = [c[1] for c in mock_s3_client.put_object.call_args_list]
+        assert plain["Key"] == "rss/podcast.xml"
+        assert "ContentEncoding" not in plain
+        assert compressed["Key"] == "rss/podcast.xml.gz"
+        assert compressed["ContentEncoding"] == "gzip"
+        assert compressed["ContentType"] == "application/rss+xml"
+        assert gzip.decompress(compressed["Body"]).decode("utf-8") == rss_content
+        assert compressed["Metadata"] == plain["Metadata"]
+
 
 class TestLocalSave:
     """Tests for local RSS feed saving."""
@@ -244,12 +412,14 @@ class TestMainFunction:
     @patch("src.update_rss_feed.generate_rss.upload_rss_feed")
     @patch("src.update_rss_feed.generate_rss.save_rss_feed_locally")
     @patch("src.update_rss_feed.generate_rss.generate_rss_feed_content")
+    @patch("src.update_rss_feed.generate_rss.get_episode_metadata")
     @patch("src.update_rss_feed.generate_rss.list_podcast_files")
     @patch("src.update_rss_feed.generate_rss.get_s3_client")
     def test_update_rss_feed_success(
         self,
         mock_get_client,
         mock_list_files,
+        mock_get_metadata,
         mock_generate_rss,
         mock_save_local,
         mock_upload,
@@ -267,7 +437,10 @@ class TestMainFunction:
         # Verify all steps were called
         mock_get_client.assert_called_once()
         mock_list_files.assert_called_once_with(mock_client)
-        mock_generate_rss.assert_called_once()
+        mock_get_metadata.assert_called_once()
+        mock_generate_rss.assert_called_once_with(
+            mock_list_files.return_value, mock_get_metadata.return_value, None
+        )
         mock_save_local.assert_called_once()
         mock_upload.assert_called_once()
 
@@ -279,6 +452,53 @@ class TestMainFunction:
         with pytest.raises(NoS3CredentialsError):
             update_rss_feed()
 
+    @patch("src.update_rss_feed.generate_rss.upload_rss_feed")
+    @patch("src.update_rss_feed.generate_rss.get_episode_metadata")
+    @patch("src.update_rss_feed.generate_rss.list_podcast_files")
+    @patch("src.update_rss_feed.generate_rss.get_s3_client")
+    def test_update_rss_feed_incremental(
+        self, mock_get_client, mock_list_files, mock_get_metadata, mock_upload
+    ):
+        """Test that incremental runs only list and add episodes since the last."""
+        mock_get_metadata.return_value = {}
+        env_vars = {"S3_BUCKET_NAME": "test-bucket", "RSS_INCREMENTAL": "1"}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            rss_output_path = "src.update_rss_feed.generate_rss.RSS_OUTPUT_DIR"
+            with (
+                patch(rss_output_path, Path(temp_dir)),
+                patch.dict(os.environ, env_vars),
+            ):
+                # No feed state yet: a full rebuild
+                mock_list_files.return_value = [podcast_file("2025-01-15T143022.mp3")]
+                update_rss_feed()
+                mock_list_files.assert_called_with(mock_get_client.return_value)
+
+                mock_list_files.return_value = [podcast_file("2025-01-16T091545.mp3")]
+                update_rss_feed()
+                mock_list_files.assert_called_with(
+                    mock_get_client.return_value,
+                    start_after="podcasts/2025-01-15T143022.mp3",
+                )
+                assert mock_get_metadata.call_args.kwargs["prune"] is False
+
+                # Nothing new: nothing is uploaded
+                mock_list_files.return_value = []
+                update_rss_feed()
+                mock_list_files.assert_called_with(
+                    mock_get_client.return_value,
+                    start_after="podcasts/2025-01-16T091545.mp3",
+                )
+                assert mock_upload.call_count == 2
+
+                feed = (Path(temp_dir) / "podcast.xml").read_text(encoding="utf-8")
+
+        guids = [item.findtext("guid") for item in ET.fromstring(feed).iter("item")]
+        assert guids == [
+            "podcasts/2025-01-16T091545.mp3",
+            "podcasts/2025-01-15T143022.mp3",
+        ]
+
     @patch("src.update_rss_feed.generate_rss.list_podcast_files")
     @patch("src.update_rss_feed.generate_rss.get_s3_client")
     def test_update_rss_feed_no_files(self, mock_get_client, mock_list_files):
@@ -0,0 +1,33 @@
+"""Tests for the mixer's new audio watch mode."""
+
+import os
+
+from src.mixer.watch import render_due, watch_for_new_audio
+from src.utils.new_audio import signal_new_audio
+
+
+def test_render_due():
+    assert not render_due(None, None, now=100, settle_s=10)
+    # Waits for the quiet period
+    assert not render_due(95, None, now=100, settle_s=10)
+    assert render_due(85, None, now=100, settle_s=10)
+    assert render_due(85, 80, now=100, settle_s=10)
+    # Already rendered after the audio arrived
+    assert not render_due(85, 90, now=100, settle_s=10)
+
+
+def test_watch_renders_when_new_audio_arrives(tmp_path):
+    flag = tmp_path / ".new-audio"
+    report = tmp_path / "report.json"
+    report.write_text("{}")
+    os.utime(report, (1000, 1000))
+    signal_new_audio([tmp_path / "memo.mp3"], flag)
+    renders = []
+
+    def render():
+        renders.append(True)
+        report.write_text("{}")
+
+    watch_for_new_audio(render, report, flag, poll_s=0, settle_s=0, max_renders=1)
+
+    assert renders == [True]